@@ -9,4 +9,7 @@ pip install -r requirements.txt
 python manage.py collectstatic --no-input
 
 # 3. Aplicar migraciones a la base de datos de la nube
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+
+# 4. Tabla de la caché compartida (contadores del límite por IP)
+python manage.py createcachetable
\ No newline at end of file
@@ -40,6 +40,9 @@ if RENDER_EXTERNAL_HOSTNAME:
 if RENDER_EXTERNAL_HOSTNAME:
     CSRF_TRUSTED_ORIGINS = [f'https://{RENDER_EXTERNAL_HOSTNAME}']
 
+# Detrás del proxy de Render la IP del cliente llega en X-Forwarded-For (ver reservas.ip_cliente)
+DETRAS_DE_PROXY = bool(RENDER_EXTERNAL_HOSTNAME)
+
 
 # Application definition
 
@@ -65,6 +68,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.FijarPrimarioMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -79,6 +83,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.empresa_activa',
             ],
         },
     },
@@ -108,6 +113,69 @@ db_from_env = dj_database_url.config(conn_max_age=500)
 DATABASES['default'].update(db_from_env)
 
 
+# Pool de conexiones (psycopg 3). Se activa con DB_POOL=1.
+# En vez de una conexión persistente por hilo, los hilos/workers comparten
+# un pool de tamaño acotado. Con pool, Django exige CONN_MAX_AGE = 0.
+DB_POOL = os.environ.get('DB_POOL', '').lower() in ('1', 'true', 'si')
+
+
+def configurar_pool(db):
+    """Agrega las opciones del pool nativo de Django a una base PostgreSQL."""
+    if not DB_POOL or 'postgresql' not in db.get('ENGINE', ''):
+        return db
+
+    db['CONN_MAX_AGE'] = 0
+    # Django verifica cada conexión al sacarla del pool (descarta las que se cortaron)
+    db['CONN_HEALTH_CHECKS'] = True
+    db.setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        # Segundos que una petición espera una conexión libre antes de fallar
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        # Cierra conexiones ociosas y recicla las viejas
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 600)),
+        'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 3600)),
+    }
+    return db
+
+
+configurar_pool(DATABASES['default'])
+
+
+# Réplica de solo lectura para reportes y listados (opcional).
+# Para probar localmente basta con apuntar DATABASE_REPLICA_URL a la misma base
+# (o a otra con los mismos datos): se usan dos alias distintos igual.
+DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(DATABASE_REPLICA_URL, conn_max_age=500)
+    # En los tests la réplica es un espejo de la base de pruebas principal
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    configurar_pool(DATABASES['replica'])
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Segundos que un usuario lee del primario después de escribir (read-your-writes)
+REPLICA_PIN_SEGUNDOS = int(os.environ.get('REPLICA_PIN_SEGUNDOS', 10))
+
+
+# Cachés. 'default' es la de cada proceso: disponibilidad, catálogo y demás se
+# pueden rearmar desde la base. Los contadores del límite por IP de la reserva
+# online (reservas.esperar_limite) tienen que ser los mismos para todos los workers:
+# van a una tabla de la base, que crea `python manage.py createcachetable`.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'limites': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_limites',
+        # Al pasar MAX_ENTRIES Django borra un tercio de las claves, vencidas o no:
+        # con pocas entradas un pico de IPs distintas reiniciaría los contadores
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -172,6 +240,10 @@ MEDIA_URL = '/media/'
 # Carpeta física en  disco duro
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Archivos subidos que esperan a la cola de tareas (ej: foto de un profesional antes de ir a Cloudinary).
+# El worker procesar_tareas tiene que ver esta misma carpeta.
+TAREAS_DIR_ARCHIVOS = os.environ.get('TAREAS_DIR_ARCHIVOS', str(MEDIA_ROOT / 'tareas'))
+
 from django.contrib.messages import constants as messages
 
 MESSAGE_TAGS = {
@@ -202,4 +274,16 @@ STORAGES = {
 
         "BACKEND": "whitenoise.storage.StaticFilesStorage",
     },
-}
\ No newline at end of file
+}
+
+# Correos a clientes (los envía el comando enviar_correos, nunca el request).
+# Para probar en local sin servidor real: python -m aiosmtpd -n -l localhost:1025
+# y EMAIL_HOST=localhost EMAIL_PORT=1025 EMAIL_USE_TLS=0
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', '1').lower() in ('1', 'true', 'si')
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', 20))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'no-responder@beautymanager.com')
@@ -1,34 +1,174 @@
-from django.contrib import admin
-from .models import Empresa, Profesional, Cliente, Servicio, Cita, HorarioAtencion, CategoriaGasto, Gasto
+import json
 
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .models import (
+    Empresa, Profesional, Cliente, Servicio, Cita, HorarioAtencion, CategoriaGasto, Gasto, ReglaComision,
+    TurnoProfesional, AusenciaProfesional,
+)
+
+
+# --- Listados grandes ---
+
+class PaginadorEstimado(Paginator):
+    """
+    En PostgreSQL pregunta al planificador cuántas filas espera la consulta y,
+    si son más de UMBRAL, usa esa estimación en vez de un COUNT(*) que recorre
+    toda la tabla. Por debajo del umbral (o en otras bases) cuenta exacto.
+    """
+    UMBRAL = 10000
+
+    @cached_property
+    def count(self):
+        consulta = self.object_list.order_by()
+        conexion = connections[consulta.db]
+        if conexion.vendor == 'postgresql':
+            sql, params = consulta.query.sql_with_params()
+            with conexion.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimado = int(plan[0]['Plan']['Plan Rows'])
+            if estimado > self.UMBRAL:
+                return estimado
+        return consulta.count()
+
+
+def _empresas_visibles(usuario):
+    """Ids de las empresas que un usuario del staff puede ver: la suya y las que dirige."""
+    ids = list(usuario.empresas_a_cargo.values_list('id', flat=True))
+    profesional = getattr(usuario, 'profesional', None)
+    if profesional:
+        ids.append(profesional.empresa_id)
+    return ids
+
+
+class EmpresaAdminMixin:
+    """
+    Listados sin COUNT exacto y, para el personal que no es superusuario, solo
+    los datos de su propia empresa (también en los autocompletados).
+    """
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(empresa_id__in=_empresas_visibles(request.user))
+
+
+class EmpresaVisibleFilter(admin.RelatedFieldListFilter):
+    """Filtro por empresa que, al personal que no es superusuario, solo le lista las suyas."""
+
+    def field_choices(self, field, request, model_admin):
+        if request.user.is_superuser:
+            return super().field_choices(field, request, model_admin)
+        return field.get_choices(
+            include_blank=False,
+            ordering=self.field_admin_ordering(field, request, model_admin),
+            limit_choices_to={'pk__in': _empresas_visibles(request.user)},
+        )
+
+
+class ProfesionalDeEmpresaFilter(admin.SimpleListFilter):
+    """Filtro por profesional que solo aparece (con los de esa empresa) al elegir una empresa."""
+    title = 'profesional'
+    parameter_name = 'profesional'
+
+    def lookups(self, request, model_admin):
+        empresa_id = request.GET.get('empresa__id__exact')
+        if not empresa_id:
+            return []
+        profesionales = Profesional.objects.filter(empresa_id=empresa_id)
+        # El parámetro lo escribe cualquiera en la URL: no mostrar los de otra empresa
+        if not request.user.is_superuser:
+            profesionales = profesionales.filter(empresa_id__in=_empresas_visibles(request.user))
+        return [
+            (pk, f"{nombre} {apellido}")
+            for pk, nombre, apellido in profesionales
+            .order_by('nombre', 'apellido').values_list('pk', 'nombre', 'apellido')
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(profesional_id=self.value())
+        return queryset
+
+
+@admin.register(Empresa)
+class EmpresaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'telefono', 'activo', 'reserva_online', 'creado_el')
+    list_filter = ('activo', 'reserva_online')
+    search_fields = ('nombre',)
+    filter_horizontal = ('duenos',)
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(pk__in=_empresas_visibles(request.user))
+
+    def get_readonly_fields(self, request, obj=None):
+        # Solo el superusuario asigna dueños
+        return () if request.user.is_superuser else ('duenos',)
 
 
 @admin.register(Profesional)
-class ProfesionalAdmin(admin.ModelAdmin):
+class ProfesionalAdmin(EmpresaAdminMixin, admin.ModelAdmin):
     list_display = ('nombre', 'apellido', 'empresa', 'especialidad', 'porcentaje_comision')
-    list_filter = ('empresa', 'especialidad')
+    list_filter = (('empresa', EmpresaVisibleFilter), 'especialidad')
+    list_select_related = ('empresa',)
     search_fields = ('nombre', 'apellido', 'empresa__nombre')
+    autocomplete_fields = ('empresa',)
+
+
+@admin.register(Cliente)
+class ClienteAdmin(EmpresaAdminMixin, admin.ModelAdmin):
+    list_display = ('nombre', 'apellido', 'ci_ruc', 'telefono', 'empresa')
+    list_filter = (('empresa', EmpresaVisibleFilter),)
+    list_select_related = ('empresa',)
+    # "=" busca el documento exacto (iexact). No usa el índice único empresa + ci_ruc: compara
+    # UPPER(ci_ruc) y, para el superusuario, sin filtrar por empresa (la columna inicial del índice)
+    search_fields = ('=ci_ruc', 'nombre__istartswith', 'apellido__istartswith', 'telefono')
+    autocomplete_fields = ('empresa',)
 
 
+@admin.register(Servicio)
+class ServicioAdmin(EmpresaAdminMixin, admin.ModelAdmin):
+    list_display = ('nombre', 'precio_estimado', 'duracion_minutos', 'empresa')
+    list_filter = (('empresa', EmpresaVisibleFilter),)
+    list_select_related = ('empresa',)
+    search_fields = ('nombre',)
+    autocomplete_fields = ('empresa',)
+
 
 @admin.register(Cita)
-class CitaAdmin(admin.ModelAdmin):
+class CitaAdmin(EmpresaAdminMixin, admin.ModelAdmin):
     # Qué columnas ver en la lista
     list_display = ('fecha', 'hora', 'cliente_nombre', 'servicio', 'profesional', 'estado_color', 'monto_cobrado',
                     'empresa')
 
-    # Filtros laterales
-    list_filter = ('empresa', 'estado', 'fecha', 'profesional')
+    # Trae cliente, servicio, profesional y empresa en la misma consulta del listado
+    list_select_related = ('cliente', 'servicio', 'profesional__empresa', 'empresa')
+
+    # Filtros laterales (el de profesional se limita a la empresa elegida).
+    # El de fecha reemplaza a date_hierarchy, que agrupaba por año/mes toda la tabla.
+    list_filter = (('empresa', EmpresaVisibleFilter), 'estado', 'fecha', ProfesionalDeEmpresaFilter)
 
     # Buscador
-    search_fields = ('cliente__nombre', 'cliente__apellido')
+    search_fields = ('cliente__nombre__istartswith', 'cliente__apellido__istartswith', '=cliente__ci_ruc')
+
+    # Selectores con búsqueda en vez de cargar todos los registros de todas las empresas
+    autocomplete_fields = ('empresa', 'cliente', 'profesional', 'servicio')
 
     # Orden
     ordering = ('-fecha', 'hora')
 
-    # Navegación rápida por fechas arriba
-    date_hierarchy = 'fecha'
-
     # Función para mostrar nombre completo del cliente
     def cliente_nombre(self, obj):
         return f"{obj.cliente.nombre} {obj.cliente.apellido}"
@@ -41,6 +181,10 @@ class CitaAdmin(admin.ModelAdmin):
             return '🟢 Realizado'
         elif obj.estado == 'CANCELADO':
             return '🔴 Cancelado'
+        elif obj.estado == 'NO_ASISTIO':
+            return '⚫ No asistió'
+        elif obj.estado == 'VENCIDO':
+            return '⚪ Vencida'
         elif obj.estado == 'CONFIRMADO':
             return '🔵 Confirmado'
         return '🟡 Pendiente'
@@ -48,9 +192,31 @@ class CitaAdmin(admin.ModelAdmin):
     estado_color.short_description = "Estado"
 
 
-admin.site.register(Empresa)
-admin.site.register(Cliente)
-admin.site.register(Servicio)
+@admin.register(ReglaComision)
+class ReglaComisionAdmin(EmpresaAdminMixin, admin.ModelAdmin):
+    list_display = ('empresa', 'profesional', 'servicio', 'desde_monto', 'porcentaje')
+    list_filter = (('empresa', EmpresaVisibleFilter),)
+    list_select_related = ('empresa', 'profesional__empresa', 'servicio')
+    autocomplete_fields = ('empresa', 'profesional', 'servicio')
+
+
+
+@admin.register(TurnoProfesional)
+class TurnoProfesionalAdmin(EmpresaAdminMixin, admin.ModelAdmin):
+    list_display = ('profesional', 'dia_semana', 'hora_inicio', 'hora_fin')
+    list_filter = (('empresa', EmpresaVisibleFilter), 'dia_semana')
+    list_select_related = ('profesional__empresa',)
+    autocomplete_fields = ('empresa', 'profesional')
+
+
+@admin.register(AusenciaProfesional)
+class AusenciaProfesionalAdmin(EmpresaAdminMixin, admin.ModelAdmin):
+    list_display = ('profesional', 'fecha_desde', 'fecha_hasta', 'hora_desde', 'hora_hasta', 'motivo')
+    list_filter = (('empresa', EmpresaVisibleFilter),)
+    list_select_related = ('profesional__empresa',)
+    autocomplete_fields = ('empresa', 'profesional')
+
+
 admin.site.register(HorarioAtencion)
 admin.site.register(CategoriaGasto)
-admin.site.register(Gasto)
\ No newline at end of file
+admin.site.register(Gasto)
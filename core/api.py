@@ -0,0 +1,139 @@
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Cita, CitaHistorica, Cliente, Gasto, Servicio
+
+# Filas por página si no se pide `limite`, y máximo permitido. Las páginas grandes
+# salen igual en memoria constante: se leen y se escriben de a TAMANO_TANDA filas.
+LIMITE_API = 500
+LIMITE_API_MAXIMO = 50000
+TAMANO_TANDA = 2000
+
+# recurso: modelo, campos disponibles, campos por defecto (sin los textos largos)
+# y si se puede filtrar por rango de `fecha`.
+RECURSOS = {
+    'citas': {
+        'modelo': Cita,
+        'campos': ['id', 'fecha', 'hora', 'estado', 'cliente_id', 'profesional_id', 'servicio_id',
+                   'monto_cobrado', 'metodo_pago', 'notas_adicionales', 'actualizado_el'],
+        'por_defecto': ['id', 'fecha', 'hora', 'estado', 'cliente_id', 'profesional_id', 'servicio_id',
+                        'monto_cobrado', 'metodo_pago', 'actualizado_el'],
+        'por_fecha': True,
+    },
+    'clientes': {
+        'modelo': Cliente,
+        'campos': ['id', 'ci_ruc', 'nombre', 'apellido', 'telefono', 'email', 'actualizado_el'],
+        'por_defecto': ['id', 'ci_ruc', 'nombre', 'apellido', 'telefono', 'email', 'actualizado_el'],
+        'por_fecha': False,
+    },
+    'servicios': {
+        'modelo': Servicio,
+        'campos': ['id', 'nombre', 'descripcion', 'precio_estimado', 'duracion_minutos', 'actualizado_el'],
+        'por_defecto': ['id', 'nombre', 'precio_estimado', 'duracion_minutos', 'actualizado_el'],
+        'por_fecha': False,
+    },
+    'gastos': {
+        'modelo': Gasto,
+        'campos': ['id', 'fecha', 'descripcion', 'monto', 'categoria_id', 'actualizado_el'],
+        'por_defecto': ['id', 'fecha', 'descripcion', 'monto', 'categoria_id', 'actualizado_el'],
+        'por_fecha': True,
+    },
+}
+
+
+def _convertidor(valor):
+    # Montos sin decimales (Gs.) como enteros; fechas y horas en ISO
+    if isinstance(valor, Decimal):
+        return int(valor)
+    if isinstance(valor, (date, datetime, time)):
+        return valor.isoformat()
+    return valor
+
+
+def _entero(texto, nombre, defecto):
+    if texto in (None, ''):
+        return defecto
+    try:
+        return int(texto)
+    except ValueError:
+        raise ValueError(f"'{nombre}' debe ser un número entero.") from None
+
+
+def consulta_api(recurso, empresa, parametros, archivo=False, **filtros):
+    """
+    Arma la consulta de una página: (queryset, campos, límite, cursor de partida).
+    Solo se seleccionan las columnas pedidas en `fields` y se pagina por
+    cursor (id > desde), así cada página cuesta lo mismo sin importar cuán lejos esté.
+    Lanza ValueError con un mensaje para el usuario si algún parámetro no sirve.
+    """
+    definicion = RECURSOS[recurso]
+    modelo = CitaHistorica if archivo else definicion['modelo']
+
+    campos = definicion['por_defecto']
+    if parametros.get('fields'):
+        campos = [c.strip() for c in parametros['fields'].split(',') if c.strip()]
+        desconocidos = [c for c in campos if c not in definicion['campos']]
+        if desconocidos:
+            raise ValueError(
+                f"Campos desconocidos: {', '.join(desconocidos)}. Disponibles: {', '.join(definicion['campos'])}"
+            )
+    # El id siempre viaja: es el cursor
+    if 'id' not in campos:
+        campos = ['id'] + campos
+
+    desde = _entero(parametros.get('desde'), 'desde', 0)
+    limite = _entero(parametros.get('limite'), 'limite', LIMITE_API)
+    if limite < 1:
+        raise ValueError("'limite' debe ser mayor a cero.")
+    limite = min(limite, LIMITE_API_MAXIMO)
+
+    qs = modelo.objects.filter(empresa=empresa, id__gt=desde, **filtros)
+
+    if parametros.get('actualizado_desde'):
+        actualizado = parse_datetime(parametros['actualizado_desde'])
+        if actualizado is None:
+            raise ValueError("'actualizado_desde' debe ser una fecha y hora ISO 8601.")
+        qs = qs.filter(actualizado_el__gte=actualizado)
+
+    if definicion['por_fecha']:
+        for parametro, lookup in (('fecha_desde', 'fecha__gte'), ('fecha_hasta', 'fecha__lte')):
+            if parametros.get(parametro):
+                try:
+                    valor = parse_date(parametros[parametro])
+                except ValueError:
+                    valor = None
+                if valor is None:
+                    raise ValueError(f"'{parametro}' debe ser una fecha AAAA-MM-DD.")
+                qs = qs.filter(**{lookup: valor})
+
+    return qs.order_by('id').values_list(*campos), campos, limite, desde
+
+
+def generar_json(qs, campos, limite, desde):
+    """
+    Escribe la página como JSON a medida que la lee de la base, de a TAMANO_TANDA filas.
+    El cursor y `hay_mas` van al final, cuando ya se sabe cuál fue la última fila.
+    """
+    posicion_id = campos.index('id')
+    cursor = desde
+    enviadas = 0
+    hay_mas = False
+    tanda = []
+
+    yield '{"datos":['
+    for fila in qs[:limite + 1].iterator(chunk_size=TAMANO_TANDA):
+        if enviadas == limite:
+            hay_mas = True
+            break
+        tanda.append(dict(zip(campos, map(_convertidor, fila))))
+        cursor = fila[posicion_id]
+        enviadas += 1
+        if len(tanda) == TAMANO_TANDA:
+            yield (',' if enviadas > len(tanda) else '') + json.dumps(tanda, ensure_ascii=False)[1:-1]
+            tanda = []
+    if tanda:
+        yield (',' if enviadas > len(tanda) else '') + json.dumps(tanda, ensure_ascii=False)[1:-1]
+    yield '],' + json.dumps({'cursor': cursor, 'hay_mas': hay_mas})[1:]
@@ -0,0 +1,94 @@
+from itertools import chain
+from operator import attrgetter
+
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .cache_empresa import invalidar
+from .cambios import marcar_cambio
+from .models import Cita, CitaHistorica
+
+ESTADOS_CERRADOS = ['REALIZADO', 'CANCELADO', 'NO_ASISTIO', 'VENCIDO']
+
+
+def _columnas_comunes():
+    """Columnas que existen en ambas tablas (el archivo puede no tener las nuevas)."""
+    columnas_cita = {f.column for f in Cita._meta.concrete_fields}
+    return [
+        f.column for f in CitaHistorica._meta.concrete_fields
+        if f.column in columnas_cita
+    ]
+
+
+def archivar_lote(fecha_limite, lote=1000):
+    """
+    Mueve al archivo hasta `lote` citas cerradas con fecha anterior a `fecha_limite`.
+    Copia y borra en la misma transacción, con SQL directo (sin cargar filas en Python
+    ni disparar una señal por cita). Devuelve {empresa_id: cantidad movida}.
+    """
+    with transaction.atomic():
+        filas = list(
+            Cita.objects.filter(fecha__lt=fecha_limite, estado__in=ESTADOS_CERRADOS)
+            .order_by('id')
+            .select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+            .values_list('id', 'empresa_id')[:lote]
+        )
+        if not filas:
+            return {}
+
+        ids = [id_cita for id_cita, _ in filas]
+        columnas = ', '.join(_columnas_comunes())
+        marcadores = ', '.join(['%s'] * len(ids))
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {CitaHistorica._meta.db_table} ({columnas}, archivado_el) "
+                f"SELECT {columnas}, %s FROM {Cita._meta.db_table} WHERE id IN ({marcadores})",
+                [timezone.now(), *ids],
+            )
+            cursor.execute(f"DELETE FROM {Cita._meta.db_table} WHERE id IN ({marcadores})", ids)
+
+        por_empresa = {}
+        for _, empresa_id in filas:
+            por_empresa[empresa_id] = por_empresa.get(empresa_id, 0) + 1
+        for empresa_id in por_empresa:
+            marcar_cambio(empresa_id, 'cita')
+
+    for empresa_id in por_empresa:
+        invalidar(empresa_id, 'agenda')
+    return por_empresa
+
+
+def frontera_archivo(empresa):
+    """Fecha más nueva archivada de la empresa (None si no hay archivo)."""
+    return CitaHistorica.objects.filter(empresa=empresa).aggregate(f=Max('fecha'))['f']
+
+
+def citas_en_rango(empresa, fecha_inicio, fecha_fin, **filtros):
+    """
+    Querysets de citas del rango con los mismos filtros: siempre la tabla activa,
+    y la histórica solo si el rango llega a fechas ya archivadas.
+    """
+    querysets = [
+        Cita.objects.filter(empresa=empresa, fecha__range=[fecha_inicio, fecha_fin], **filtros)
+    ]
+    frontera = frontera_archivo(empresa)
+    if frontera and fecha_inicio <= frontera:
+        querysets.append(
+            CitaHistorica.objects.filter(empresa=empresa, fecha__range=[fecha_inicio, fecha_fin], **filtros)
+        )
+    return querysets
+
+
+def sumar(querysets, campo, **filtros):
+    """Suma `campo` en todos los querysets (un aggregate por tabla)."""
+    return sum(
+        qs.filter(**filtros).aggregate(total=Sum(campo))['total'] or 0
+        for qs in querysets
+    )
+
+
+def unir(querysets, *orden, reverso=False):
+    """Lista única de citas de todas las tablas, ordenada por los atributos `orden`."""
+    return sorted(chain.from_iterable(querysets), key=attrgetter(*orden), reverse=reverso)
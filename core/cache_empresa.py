@@ -0,0 +1,31 @@
+import time
+
+from django.core.cache import cache
+
+
+def _clave_version(empresa_id, ambito):
+    return f"version:{ambito}:{empresa_id}"
+
+
+def version(empresa_id, ambito):
+    """
+    Número de versión de los datos cacheados de una empresa.
+    Se incluye en las claves de caché: al invalidar cambia la versión y las
+    entradas viejas simplemente dejan de usarse (expiran solas).
+    """
+    clave = _clave_version(empresa_id, ambito)
+    valor = cache.get(clave)
+    if valor is None:
+        # Arrancamos desde el reloj para no repetir una versión ya usada
+        # si la clave fue desalojada de la caché.
+        cache.add(clave, int(time.time() * 1000), None)
+        valor = cache.get(clave)
+    return valor
+
+
+def invalidar(empresa_id, ambito):
+    clave = _clave_version(empresa_id, ambito)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, int(time.time() * 1000), None)
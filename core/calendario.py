@@ -0,0 +1,173 @@
+from datetime import time, timedelta
+
+from django.core.cache import cache
+
+from .cache_empresa import version
+from .models import Cita, HorarioAtencion, Profesional
+
+# Tamaño de cada fila de la grilla
+SLOT_MINUTOS = 15
+
+# La versión de la clave cambia con cada cita guardada; el TTL solo limita
+# cuánto puede atrasarse otro worker que tenga su propia caché en memoria.
+CACHE_SEGUNDOS = 120
+
+NOMBRES_DIAS = dict(HorarioAtencion.DIAS_SEMANA)
+
+
+def lunes_de(fecha):
+    return fecha - timedelta(days=fecha.weekday())
+
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+
+def _hora(minutos):
+    return time(minutos // 60, minutos % 60)
+
+
+def datos_semana(empresa, lunes):
+    """
+    Citas, profesionales y horarios de la semana que empieza en `lunes`,
+    como datos planos (listos para cachear). Se arma con tres consultas y se
+    guarda en caché hasta que cambie algo de la agenda de la empresa.
+    """
+    clave = f"calendario:{empresa.pk}:{lunes.isoformat()}:{version(empresa.pk, 'agenda')}"
+    datos = cache.get(clave)
+    if datos is not None:
+        return datos
+
+    citas = (
+        Cita.objects.filter(empresa=empresa, fecha__range=[lunes, lunes + timedelta(days=6)])
+        .exclude(estado='CANCELADO')
+        .select_related('cliente', 'servicio')
+        .only(
+            'id', 'profesional_id', 'fecha', 'hora', 'estado',
+            'cliente__nombre', 'cliente__apellido',
+            'servicio__nombre', 'servicio__duracion_minutos',
+        )
+        .order_by('fecha', 'hora')
+    )
+
+    datos = {
+        'profesionales': [
+            (p.pk, f"{p.nombre} {p.apellido}")
+            for p in Profesional.objects.filter(empresa=empresa).only('id', 'nombre', 'apellido')
+        ],
+        'horarios': {
+            h.dia_semana: (_minutos(h.hora_inicio), _minutos(h.hora_fin)) if h.abierto else None
+            for h in HorarioAtencion.objects.filter(empresa=empresa)
+        },
+        'citas': [
+            {
+                'id': c.pk,
+                'profesional_id': c.profesional_id,
+                'dia': (c.fecha - lunes).days,
+                'inicio': _minutos(c.hora),
+                'duracion': c.servicio.duracion_minutos or SLOT_MINUTOS,
+                'cliente': f"{c.cliente.nombre} {c.cliente.apellido}",
+                'servicio': c.servicio.nombre,
+                'estado': c.estado,
+            }
+            for c in citas
+        ],
+    }
+    cache.set(clave, datos, CACHE_SEGUNDOS)
+    return datos
+
+
+def armar_grilla(datos, lunes, profesional_id):
+    """
+    Distribuye las citas de un profesional en filas de SLOT_MINUTOS x 7 días.
+
+    Cada celda es:
+      - dict con 'citas' y 'rowspan' donde empieza una cita,
+      - dict con 'cerrado' si está libre,
+      - None si la tapa una cita que empezó más arriba (no se dibuja).
+    Las citas que se pisan quedan juntas en la misma celda, marcadas como solapadas.
+    """
+    citas = [c for c in datos['citas'] if c['profesional_id'] == profesional_id]
+    horarios = datos['horarios']
+
+    abiertos = [h for h in horarios.values() if h]
+    inicio = min([h[0] for h in abiertos] + [c['inicio'] for c in citas], default=8 * 60)
+    fin = max([h[1] for h in abiertos] + [c['inicio'] + c['duracion'] for c in citas], default=20 * 60)
+    inicio -= inicio % SLOT_MINUTOS
+    fin = min(24 * 60, fin + (-fin % SLOT_MINUTOS))
+    n_slots = max(1, (fin - inicio) // SLOT_MINUTOS)
+
+    def cerrado(dia, slot):
+        horario = horarios.get(dia)
+        minuto = inicio + slot * SLOT_MINUTOS
+        return horario is None or not (horario[0] <= minuto < horario[1])
+
+    celdas = [[{'cerrado': cerrado(dia, slot)} for dia in range(7)] for slot in range(n_slots)]
+
+    abierta = {}  # dia -> (celda, slot donde termina)
+    for cita in citas:
+        slot = (cita['inicio'] - inicio) // SLOT_MINUTOS
+        hasta = min(n_slots, slot + -(-cita['duracion'] // SLOT_MINUTOS))
+        cita = dict(cita, hora=_hora(cita['inicio']), fin=_hora(min(cita['inicio'] + cita['duracion'], 24 * 60 - 1)))
+
+        actual = abierta.get(cita['dia'])
+        if actual and slot < actual[1]:
+            celda, hasta_actual = actual
+            celda['citas'].append(cita)
+            celda['solapada'] = True
+            if hasta > hasta_actual:
+                for s in range(hasta_actual, hasta):
+                    celdas[s][cita['dia']] = None
+                celda['rowspan'] += hasta - hasta_actual
+                abierta[cita['dia']] = (celda, hasta)
+            continue
+
+        celda = {'citas': [cita], 'rowspan': hasta - slot, 'solapada': False}
+        celdas[slot][cita['dia']] = celda
+        for s in range(slot + 1, hasta):
+            celdas[s][cita['dia']] = None
+        abierta[cita['dia']] = (celda, hasta)
+
+    dias = [
+        {
+            'fecha': lunes + timedelta(days=d),
+            'nombre': NOMBRES_DIAS[d],
+            'cerrado': horarios.get(d) is None,
+        }
+        for d in range(7)
+    ]
+    filas = [
+        {'hora': _hora(inicio + s * SLOT_MINUTOS), 'celdas': celdas[s]}
+        for s in range(n_slots)
+    ]
+    return {'dias': dias, 'filas': filas, 'total_citas': len(citas)}
+
+
+def citas_solapadas(empresa_id, fechas, profesional_ids=None):
+    """
+    Pares de citas no canceladas del mismo profesional que se pisan en el tiempo
+    (según la duración del servicio), en las `fechas` dadas.
+    Devuelve tuplas (cita_a, cita_b) con la de inicio más temprano primero.
+    """
+    citas = (
+        Cita.objects.filter(empresa_id=empresa_id, fecha__in=fechas)
+        .exclude(estado='CANCELADO')
+        .select_related('servicio')
+        .only('id', 'profesional_id', 'fecha', 'hora', 'servicio__duracion_minutos')
+        .order_by('profesional_id', 'fecha', 'hora', 'id')
+    )
+    if profesional_ids:
+        citas = citas.filter(profesional_id__in=profesional_ids)
+
+    pares = []
+    anterior = None  # la cita que termina más tarde del grupo actual
+    for cita in citas:
+        inicio = _minutos(cita.hora)
+        fin = inicio + (cita.servicio.duracion_minutos or SLOT_MINUTOS)
+        if anterior and (anterior[0].profesional_id, anterior[0].fecha) == (cita.profesional_id, cita.fecha):
+            if inicio < anterior[1]:
+                pares.append((anterior[0], cita))
+            if fin <= anterior[1]:
+                continue
+        anterior = (cita, fin)
+    return pares
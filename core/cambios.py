@@ -0,0 +1,80 @@
+from django.utils import timezone
+
+from .models import CambioCita, MarcaCambio
+
+
+def marcar_cambio(empresa_id, modelo):
+    """
+    Registra que `modelo` cambió en la empresa. Se ejecuta dentro de la misma
+    transacción que la escritura, así la marca y los datos se ven juntos.
+    """
+    if not empresa_id:
+        return
+    ahora = timezone.now()
+    if not MarcaCambio.objects.filter(empresa_id=empresa_id, modelo=modelo).update(actualizado_el=ahora):
+        MarcaCambio.objects.get_or_create(empresa_id=empresa_id, modelo=modelo, defaults={'actualizado_el': ahora})
+
+
+def ultimos_cambios(empresa, modelos):
+    """Lista ordenada de (modelo, fecha del último cambio), en una sola consulta."""
+    return list(
+        MarcaCambio.objects.filter(empresa=empresa, modelo__in=modelos)
+        .order_by('modelo')
+        .values_list('modelo', 'actualizado_el')
+    )
+
+
+def foto_cita(cita):
+    """Datos de la cita que viajan en el feed de cambios."""
+    return {
+        'id': cita.pk,
+        'fecha': cita.fecha.isoformat(),
+        'hora': cita.hora.strftime('%H:%M'),
+        'estado': cita.estado,
+        'profesional_id': cita.profesional_id,
+        'profesional': f"{cita.profesional.nombre} {cita.profesional.apellido}",
+        'cliente_id': cita.cliente_id,
+        'cliente': f"{cita.cliente.nombre} {cita.cliente.apellido}",
+        'servicio_id': cita.servicio_id,
+        'servicio': cita.servicio.nombre,
+        'duracion_minutos': cita.servicio.duracion_minutos,
+        'monto_cobrado': int(cita.monto_cobrado) if cita.monto_cobrado is not None else None,
+    }
+
+
+def _evento(cita, tipo):
+    return CambioCita(
+        empresa_id=cita.empresa_id,
+        cita=cita,
+        profesional_id=cita.profesional_id,
+        tipo=tipo,
+        datos=foto_cita(cita),
+    )
+
+
+def _turno_feed(empresa_id):
+    """
+    El feed se lee por id: un evento que confirma después de otro con id mayor
+    quedaría atrás del cursor del cliente. Antes de tomar id, la transacción bloquea
+    la marca de cambio de 'cita' de la empresa (el UPDATE la retiene hasta el commit):
+    dentro de una empresa los ids se toman y se confirman en el mismo orden.
+    """
+    marcar_cambio(empresa_id, 'cita')
+
+
+def registrar_cambio_cita(cita, tipo):
+    """
+    Agrega un evento al feed. Llamarla dentro del mismo transaction.atomic()
+    que guarda la cita: si la escritura se revierte, el evento también.
+    """
+    _turno_feed(cita.empresa_id)
+    evento = _evento(cita, tipo)
+    evento.save()
+    return evento
+
+
+def registrar_cambios_citas(citas, tipo):
+    """Lo mismo para muchas citas, en un solo INSERT (para cambios hechos con update())."""
+    for empresa_id in sorted({cita.empresa_id for cita in citas}):
+        _turno_feed(empresa_id)
+    return CambioCita.objects.bulk_create([_evento(cita, tipo) for cita in citas])
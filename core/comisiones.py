@@ -0,0 +1,105 @@
+from django.db import connections
+from django.db.models.functions import TruncMonth
+
+from .archivo import citas_en_rango
+from .models import Profesional, ReglaComision
+from .resultados import inicio_mes
+
+COLUMNAS_BASE = ('id', 'profesional_id', 'servicio_id', 'fecha', 'hora', 'mes', 'monto_cobrado')
+
+
+def reglas_de(empresa):
+    """Reglas en el orden en que se evalúan: la más específica y el escalón más alto primero."""
+    reglas = ReglaComision.objects.filter(empresa=empresa).select_related('profesional', 'servicio')
+    return sorted(reglas, key=lambda r: (-r.especificidad, -r.desde_monto))
+
+
+def _caso_porcentaje(reglas):
+    """
+    CASE con una rama por regla. `previo` es lo que el profesional ya facturó en el mes
+    antes de la cita: una regla con escalón rige desde que ese acumulado lo alcanza.
+    Si ninguna aplica, queda el porcentaje general del profesional.
+    """
+    ramas = []
+    params = []
+    for regla in reglas:
+        condiciones = []
+        if regla.profesional_id:
+            condiciones.append('c.profesional_id = %s')
+            params.append(regla.profesional_id)
+        if regla.servicio_id:
+            condiciones.append('c.servicio_id = %s')
+            params.append(regla.servicio_id)
+        condiciones.append('c.previo >= %s')
+        # Montos enteros (Gs.) y el porcentaje como texto casteado: comparan y multiplican igual en todas las bases
+        params.extend([int(regla.desde_monto), str(regla.porcentaje)])
+        ramas.append(f"WHEN {' AND '.join(condiciones)} THEN CAST(%s AS NUMERIC)")
+    if not ramas:
+        return 'p.porcentaje_comision', []
+    return f"CASE {' '.join(ramas)} ELSE p.porcentaje_comision END", params
+
+
+def _consulta(empresa, fecha_inicio, fecha_fin, profesional=None):
+    """
+    SQL (y parámetros) con una fila por cita realizada del rango: id, profesional_id,
+    monto y porcentaje. El acumulado del mes sale de una función de ventana
+    sobre las citas activas y las archivadas juntas (desde el día 1 del mes de
+    `fecha_inicio`, para que el escalón cuente lo facturado antes del rango), y el
+    porcentaje de un CASE armado con las reglas de la empresa.
+    """
+    filtros = {'estado': 'REALIZADO'}
+    if profesional:
+        filtros['profesional'] = profesional
+    partes = [
+        qs.order_by().annotate(mes=TruncMonth('fecha')).values_list(*COLUMNAS_BASE)
+        for qs in citas_en_rango(empresa, inicio_mes(fecha_inicio), fecha_fin, **filtros)
+    ]
+    base = partes[0].union(*partes[1:], all=True) if len(partes) > 1 else partes[0]
+    sql_base, params_base = base.query.sql_with_params()
+
+    porcentaje, params_porcentaje = _caso_porcentaje(reglas_de(empresa))
+    sql = f"""
+        SELECT c.id, c.profesional_id, c.monto, {porcentaje} AS porcentaje
+        FROM (
+            SELECT b.id, b.profesional_id, b.servicio_id, b.fecha, COALESCE(b.monto_cobrado, 0) AS monto,
+                   COALESCE(SUM(COALESCE(b.monto_cobrado, 0)) OVER (
+                       PARTITION BY b.profesional_id, b.mes
+                       ORDER BY b.fecha, b.hora, b.id
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                   ), 0) AS previo
+            FROM ({sql_base}) b
+        ) c
+        JOIN {Profesional._meta.db_table} p ON p.id = c.profesional_id
+        WHERE c.fecha >= %s
+    """
+    return sql, [*params_porcentaje, *params_base, fecha_inicio], base.db
+
+
+def _ejecutar(sql, params, alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def liquidar(empresa, fecha_inicio, fecha_fin, profesional=None):
+    """
+    Totales por profesional del rango: {profesional_id: {'citas', 'total', 'comision'}}.
+    Una sola consulta para todo el equipo, sin recorrer las citas en Python.
+    """
+    sql, params, alias = _consulta(empresa, fecha_inicio, fecha_fin, profesional)
+    filas = _ejecutar(
+        f"SELECT t.profesional_id, COUNT(*), SUM(t.monto), SUM(t.monto * t.porcentaje / 100.0) "
+        f"FROM ({sql}) t GROUP BY t.profesional_id",
+        params, alias,
+    )
+    return {
+        profesional_id: {'citas': citas, 'total': int(total or 0), 'comision': round(comision or 0)}
+        for profesional_id, citas, total, comision in filas
+    }
+
+
+def comision_por_cita(empresa, fecha_inicio, fecha_fin, profesional=None):
+    """{cita_id: (porcentaje, comisión)} del rango, para mostrar el detalle."""
+    sql, params, alias = _consulta(empresa, fecha_inicio, fecha_fin, profesional)
+    filas = _ejecutar(f"SELECT t.id, t.porcentaje, t.monto * t.porcentaje / 100.0 FROM ({sql}) t", params, alias)
+    return {cita_id: (porcentaje, round(comision or 0)) for cita_id, porcentaje, comision in filas}
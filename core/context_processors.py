@@ -0,0 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
+from .views import obtener_mi_empresa
+
+
+def empresa_activa(request):
+    """Empresa con la que está trabajando el usuario (se consulta solo si la plantilla la usa)."""
+    return {'empresa_activa': SimpleLazyObject(lambda: obtener_mi_empresa(request))}
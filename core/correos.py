@@ -0,0 +1,159 @@
+import logging
+from datetime import timedelta
+from email.utils import formataddr
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Cita, CorreoSaliente
+
+logger = logging.getLogger(__name__)
+
+ASUNTOS = {
+    'CONFIRMACION': "Tu cita quedó agendada",
+    'MODIFICACION': "Tu cita cambió de horario",
+    'RECORDATORIO': "Recordatorio de tu cita",
+    'CANCELACION': "Tu cita fue cancelada",
+    'LUGAR_LIBRE': "Se liberó un lugar para vos",
+}
+
+MAX_INTENTOS = 5
+# Espera antes del reintento n: REINTENTO_SEGUNDOS * 2^(n-1)
+REINTENTO_SEGUNDOS = 60
+
+
+def _clave(cita, tipo):
+    if tipo == 'CANCELACION':
+        return f"{tipo}:{cita.pk}"
+    # Un aviso por cada fecha/hora que tuvo la cita
+    return f"{tipo}:{cita.pk}:{cita.fecha.isoformat()}:{cita.hora:%H:%M}"
+
+
+def encolar_correos(citas, tipo):
+    """
+    Agrega a la bandeja de salida un correo de `tipo` por cada cita cuyo cliente
+    tenga email. Un solo INSERT; los avisos ya encolados (misma clave) se ignoran.
+    Llamarla dentro de la transacción que guarda las citas.
+    """
+    correos = []
+    for cita in citas:
+        email = cita.cliente.email
+        if not email:
+            continue
+        empresa = cita.empresa
+        correos.append(CorreoSaliente(
+            empresa_id=cita.empresa_id,
+            cita=cita,
+            tipo=tipo,
+            clave=_clave(cita, tipo),
+            remitente=formataddr((empresa.nombre, settings.DEFAULT_FROM_EMAIL)),
+            destinatario=email,
+            asunto=f"{ASUNTOS[tipo]} - {empresa.nombre}",
+            cuerpo=render_to_string('core/correos/cita.txt', {'cita': cita, 'empresa': empresa, 'tipo': tipo}),
+        ))
+    if correos:
+        CorreoSaliente.objects.bulk_create(correos, ignore_conflicts=True)
+    return len(correos)
+
+
+def encolar_aviso_espera(espera, horario, cuerpo):
+    """
+    Ofrece por email a un cliente en lista de espera el `horario` que quedó libre
+    (una cita sin guardar con fecha, hora y profesional). Un aviso por horario.
+    """
+    empresa = horario.empresa
+    clave = f"LUGAR_LIBRE:{espera.pk}:{horario.profesional_id}:{horario.fecha.isoformat()}:{horario.hora:%H:%M}"
+    CorreoSaliente.objects.bulk_create([CorreoSaliente(
+        empresa_id=empresa.pk,
+        tipo='LUGAR_LIBRE',
+        clave=clave,
+        remitente=formataddr((empresa.nombre, settings.DEFAULT_FROM_EMAIL)),
+        destinatario=espera.cliente.email,
+        asunto=f"{ASUNTOS['LUGAR_LIBRE']} - {empresa.nombre}",
+        cuerpo=cuerpo,
+    )], ignore_conflicts=True)
+
+
+def encolar_recordatorios(fecha):
+    """Encola el recordatorio de todas las citas activas de `fecha` (las ya avisadas se saltan)."""
+    citas = (
+        Cita.objects.filter(fecha=fecha, estado__in=['PENDIENTE', 'CONFIRMADO'])
+        .exclude(cliente__email__isnull=True).exclude(cliente__email='')
+        .select_related('empresa', 'cliente', 'servicio', 'profesional')
+    )
+    return encolar_correos(citas, 'RECORDATORIO')
+
+
+def _tomar_lote(lote):
+    ahora = timezone.now()
+    with transaction.atomic():
+        correos = list(
+            CorreoSaliente.objects.filter(estado='PENDIENTE', proximo_intento__lte=ahora)
+            .order_by('proximo_intento', 'id')
+            .select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)[:lote]
+        )
+        # Se corre el próximo intento para que otro despachador no los tome mientras se envían
+        CorreoSaliente.objects.filter(id__in=[c.id for c in correos]).update(
+            proximo_intento=ahora + timedelta(minutes=10)
+        )
+    return correos
+
+
+def despachar(lote=50):
+    """
+    Envía hasta `lote` correos pendientes por una única conexión SMTP.
+    Devuelve (enviados, fallidos); los que fallan se reintentan más tarde.
+    """
+    correos = _tomar_lote(lote)
+    if not correos:
+        return 0, 0
+
+    conexion = get_connection()
+    try:
+        conexion.open()
+    except Exception as e:
+        # Sin conexión al servidor: todo el lote vuelve a la cola
+        logger.warning("Sin conexión al servidor de correo: %s", e)
+        for correo in correos:
+            _registrar_fallo(correo, e)
+        return 0, len(correos)
+
+    enviados = fallidos = 0
+    try:
+        for correo in correos:
+            mensaje = EmailMessage(
+                subject=correo.asunto,
+                body=correo.cuerpo,
+                from_email=correo.remitente,
+                to=[correo.destinatario],
+                connection=conexion,
+                headers={'X-Clave-Aviso': correo.clave},
+            )
+            try:
+                mensaje.send()
+            except Exception as e:
+                fallidos += 1
+                _registrar_fallo(correo, e)
+                logger.warning("No se pudo enviar el correo %s: %s", correo.id, e)
+            else:
+                enviados += 1
+                correo.estado = 'ENVIADO'
+                correo.intentos += 1
+                correo.enviado_el = timezone.now()
+                correo.error = ''
+                correo.save(update_fields=['estado', 'intentos', 'enviado_el', 'error'])
+    finally:
+        conexion.close()
+    return enviados, fallidos
+
+
+def _registrar_fallo(correo, error):
+    correo.intentos += 1
+    correo.error = str(error)
+    if correo.intentos >= MAX_INTENTOS:
+        correo.estado = 'FALLIDO'
+    correo.proximo_intento = timezone.now() + timedelta(seconds=REINTENTO_SEGUNDOS * 2 ** (correo.intentos - 1))
+    correo.save(update_fields=['estado', 'intentos', 'error', 'proximo_intento'])
@@ -0,0 +1,219 @@
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from .cache_empresa import version
+from .models import AusenciaProfesional, Cita, HorarioAtencion, Profesional, TurnoProfesional
+
+# Un día son 288 casillas de 5 minutos; la casilla i es el bit i de un entero.
+# "Trabaja" y "ocupado" de cada profesional son dos de esos enteros, y las
+# preguntas de disponibilidad se responden con AND / OR sobre ellos.
+MINUTOS_SLOT = 5
+SLOTS_DIA = 24 * 60 // MINUTOS_SLOT
+DIA_COMPLETO = (1 << SLOTS_DIA) - 1
+
+CACHE_SEGUNDOS = 10 * 60
+
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+
+def _bits(desde, hasta):
+    """Casillas [desde, hasta) encendidas."""
+    desde, hasta = max(desde, 0), min(hasta, SLOTS_DIA)
+    if hasta <= desde:
+        return 0
+    return ((1 << (hasta - desde)) - 1) << desde
+
+
+def mascara_ocupa(hora, minutos):
+    """Casillas que toca algo que empieza a `hora` y dura `minutos` (las partidas cuentan enteras)."""
+    inicio = _minutos(hora)
+    return _bits(inicio // MINUTOS_SLOT, -(-(inicio + minutos) // MINUTOS_SLOT))
+
+
+def mascara_franja(hora_inicio, hora_fin):
+    """Casillas enteras dentro de la franja [hora_inicio, hora_fin) (hora_fin 00:00 = fin del día)."""
+    fin = _minutos(hora_fin) or 24 * 60
+    return _bits(-(-_minutos(hora_inicio) // MINUTOS_SLOT), fin // MINUTOS_SLOT)
+
+
+def _clave(empresa_id, fecha):
+    return f"disponibilidad:{empresa_id}:{fecha.isoformat()}:{version(empresa_id, 'disponibilidad')}"
+
+
+# Contador de cambios de citas de cada día. El día cacheado guarda el valor con el
+# que quedó al día: si no coincide con el contador, le falta algún cambio y se rearma.
+def _clave_cambios(empresa_id, fecha):
+    return f"disponibilidad:cambios:{empresa_id}:{fecha.isoformat()}"
+
+
+def _cambios(empresa_id, fecha):
+    clave = _clave_cambios(empresa_id, fecha)
+    valor = cache.get(clave)
+    if valor is None:
+        # Desde el reloj, como cache_empresa.version: si la clave se desaloja no se repite un valor
+        cache.add(clave, int(time.time() * 1000), CACHE_SEGUNDOS * 2)
+        valor = cache.get(clave)
+    return valor
+
+
+def _contar_cambio(empresa_id, fecha):
+    try:
+        return cache.incr(_clave_cambios(empresa_id, fecha))
+    except ValueError:
+        return _cambios(empresa_id, fecha)
+
+
+def _armar_dia(empresa_id, fecha):
+    """
+    Compila el día desde la base (5 consultas, sin importar cuántas citas haya):
+      trabaja: {profesional_id: bits} = turnos ∩ horario del salón − ausencias
+      citas:   {cita_id: (profesional_id, bits)} de las citas no canceladas
+      ocupado: {profesional_id: bits} = OR de sus citas
+    """
+    dia_semana = fecha.weekday()
+    horario = HorarioAtencion.objects.filter(empresa_id=empresa_id, dia_semana=dia_semana, abierto=True).first()
+    salon = mascara_franja(horario.hora_inicio, horario.hora_fin) if horario else 0
+
+    profesionales = list(Profesional.objects.filter(empresa_id=empresa_id).values_list('id', flat=True))
+    con_turnos = set(
+        TurnoProfesional.objects.filter(empresa_id=empresa_id).values_list('profesional_id', flat=True).distinct()
+    )
+    turnos = defaultdict(int)
+    for profesional_id, hora_inicio, hora_fin in TurnoProfesional.objects.filter(
+        empresa_id=empresa_id, dia_semana=dia_semana
+    ).values_list('profesional_id', 'hora_inicio', 'hora_fin'):
+        turnos[profesional_id] |= mascara_franja(hora_inicio, hora_fin)
+
+    # Quien no cargó turnos atiende en todo el horario del salón
+    trabaja = {p: salon & (turnos[p] if p in con_turnos else DIA_COMPLETO) for p in profesionales}
+
+    for profesional_id, hora_desde, hora_hasta in AusenciaProfesional.objects.filter(
+        empresa_id=empresa_id, fecha_desde__lte=fecha, fecha_hasta__gte=fecha
+    ).values_list('profesional_id', 'hora_desde', 'hora_hasta'):
+        if profesional_id not in trabaja:
+            continue
+        if hora_desde and hora_hasta:
+            trabaja[profesional_id] &= ~mascara_ocupa(hora_desde, _minutos(hora_hasta) - _minutos(hora_desde))
+        else:
+            trabaja[profesional_id] = 0
+
+    citas = {
+        cita_id: (profesional_id, mascara_ocupa(hora, duracion))
+        for cita_id, profesional_id, hora, duracion in Cita.objects.filter(empresa_id=empresa_id, fecha=fecha)
+        .exclude(estado='CANCELADO')
+        .values_list('id', 'profesional_id', 'hora', 'servicio__duracion_minutos')
+    }
+    return {'trabaja': trabaja, 'citas': citas, 'ocupado': _ocupado(citas)}
+
+
+def _ocupado(citas, excluir=None):
+    ocupado = defaultdict(int)
+    for cita_id, (profesional_id, bits) in citas.items():
+        if cita_id != excluir:
+            ocupado[profesional_id] |= bits
+    return dict(ocupado)
+
+
+def dia(empresa_id, fecha, fresco=False):
+    """
+    El día compilado, desde la caché o armado si no está. Con `fresco` se arma
+    desde la base sin mirar la caché (para validar una reserva ya bloqueada).
+    """
+    if fresco:
+        return _armar_dia(empresa_id, fecha)
+    clave = _clave(empresa_id, fecha)
+    datos = cache.get(clave)
+    cambios = _cambios(empresa_id, fecha)
+    if datos is not None and datos['cambios'] == cambios:
+        return datos
+
+    # El contador se lee antes que la base: si una cita se confirma mientras se arma
+    # el día, el contador cambia y lo armado se usa pero no se guarda
+    datos = _armar_dia(empresa_id, fecha)
+    datos['cambios'] = cambios
+    if _cambios(empresa_id, fecha) == cambios:
+        cache.set(clave, datos, CACHE_SEGUNDOS)
+    return datos
+
+
+def parchar_citas(empresa_id, cambios):
+    """
+    Aplica a los días ya compilados los cambios de citas, sin recompilarlos:
+    `cambios` son (cita_id, fechas afectadas, (profesional_id, fecha, hora, minutos) o None
+    si dejó de ocupar lugar). Cada cambio cuenta en el contador del día aunque el día
+    no esté en caché; si el cacheado no venía del cambio anterior (otro parche en
+    paralelo), se borra y se arma completo la próxima vez que se pida.
+    """
+    por_fecha = defaultdict(list)
+    for cita_id, fechas, ocupa in cambios:
+        for fecha in fechas:
+            por_fecha[fecha].append((cita_id, ocupa))
+
+    for fecha, citas in por_fecha.items():
+        cambios = _contar_cambio(empresa_id, fecha)
+        clave = _clave(empresa_id, fecha)
+        datos = cache.get(clave)
+        if datos is None:
+            continue
+        if datos['cambios'] != cambios - 1:
+            cache.delete(clave)
+            continue
+        for cita_id, ocupa in citas:
+            datos['citas'].pop(cita_id, None)
+            if ocupa and ocupa[1] == fecha:
+                profesional_id, _, hora, minutos = ocupa
+                datos['citas'][cita_id] = (profesional_id, mascara_ocupa(hora, minutos))
+        datos['ocupado'] = _ocupado(datos['citas'])
+        datos['cambios'] = cambios
+        cache.set(clave, datos, CACHE_SEGUNDOS)
+
+
+def _libre(datos, profesional_id, necesita, excluir_cita=None):
+    ocupado = (
+        _ocupado(datos['citas'], excluir_cita) if excluir_cita in datos['citas'] else datos['ocupado']
+    ).get(profesional_id, 0)
+    return (datos['trabaja'].get(profesional_id, 0) & ~ocupado & necesita) == necesita
+
+
+def motivo_no_disponible(empresa_id, profesional_id, fecha, hora, minutos, excluir_cita=None, fresco=False):
+    """
+    None si el profesional puede tomar un servicio de `minutos` a esa hora;
+    si no, 'NO_TRABAJA' (fuera de su turno o ausente) u 'OCUPADO' (se superpone con otra cita).
+    """
+    datos = dia(empresa_id, fecha, fresco)
+    necesita = mascara_ocupa(hora, minutos)
+    if (datos['trabaja'].get(profesional_id, 0) & necesita) != necesita:
+        return 'NO_TRABAJA'
+    if not _libre(datos, profesional_id, necesita, excluir_cita):
+        return 'OCUPADO'
+    return None
+
+
+def puede_atender(empresa_id, profesional_id, fecha, hora, minutos, excluir_cita=None):
+    return motivo_no_disponible(empresa_id, profesional_id, fecha, hora, minutos, excluir_cita) is None
+
+
+def libres_en(empresa_id, fecha, hora, minutos, excluir_cita=None, fresco=False):
+    """Ids de los profesionales que pueden tomar un servicio de `minutos` a esa hora."""
+    datos = dia(empresa_id, fecha, fresco)
+    necesita = mascara_ocupa(hora, minutos)
+    return [p for p in datos['trabaja'] if _libre(datos, p, necesita, excluir_cita)]
+
+
+def inicios_libres(empresa_id, profesional_id, fecha, minutos, paso=15):
+    """
+    Minutos del día (múltiplos de `paso`) en los que el profesional puede empezar un
+    servicio de `minutos`. Una casilla sirve de inicio si ella y las n-1 siguientes
+    están libres: se calcula para todo el día con n desplazamientos del entero.
+    """
+    datos = dia(empresa_id, fecha)
+    libre = datos['trabaja'].get(profesional_id, 0) & ~datos['ocupado'].get(profesional_id, 0)
+    inicios = libre
+    for desplazamiento in range(1, -(-minutos // MINUTOS_SLOT)):
+        inicios &= libre >> desplazamiento
+    cada = max(paso // MINUTOS_SLOT, 1)
+    return [s * MINUTOS_SLOT for s in range(0, SLOTS_DIA, cada) if inicios >> s & 1]
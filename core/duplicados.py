@@ -0,0 +1,221 @@
+import re
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache_empresa import invalidar
+from .cambios import marcar_cambio, registrar_cambios_citas
+from .estadisticas import recalcular_cliente
+from .models import Cita, CitaHistorica, Cliente, DuplicadoCliente, EsperaCita
+
+# Puntaje desde el que un par se sugiere como duplicado (0 a 1)
+UMBRAL = 0.75
+
+# Un bloque más grande que esto es una clave sin información (ej: teléfono "0000000")
+# y compararlo entero sería cuadrático: se saltea.
+MAX_BLOQUE = 200
+
+
+def _sin_acentos(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def normalizar_nombre(nombre, apellido):
+    return ' '.join(re.sub(r'[^a-z ]', ' ', _sin_acentos(f"{nombre} {apellido}")).split())
+
+
+def normalizar_telefono(telefono):
+    """Solo los dígitos, sin prefijo de país ni cero inicial: '+595 981 123-456' -> '981123456'."""
+    digitos = re.sub(r'\D', '', telefono or '')
+    if digitos.startswith('595'):
+        digitos = digitos[3:]
+    digitos = digitos.lstrip('0')
+    return digitos if len(digitos) >= 6 else ''
+
+
+def normalizar_ci(ci_ruc):
+    # Los "sin C.I." se cargan como 0, 1, x...: no sirven para comparar
+    digitos = re.sub(r'[^0-9a-z]', '', _sin_acentos(ci_ruc))
+    return digitos if len(digitos) >= 5 else ''
+
+
+def _ficha(id_cliente, ci_ruc, nombre, apellido, telefono, email):
+    return {
+        'id': id_cliente,
+        'nombre': normalizar_nombre(nombre, apellido),
+        'telefono': normalizar_telefono(telefono),
+        'ci': normalizar_ci(ci_ruc),
+        'email': (email or '').strip().lower(),
+    }
+
+
+def claves_bloqueo(ficha):
+    """Claves baratas: solo se comparan entre sí los clientes que comparten alguna."""
+    claves = []
+    if ficha['telefono']:
+        claves.append(f"tel:{ficha['telefono']}")
+    if ficha['ci']:
+        claves.append(f"ci:{ficha['ci']}")
+    if ficha['email']:
+        claves.append(f"email:{ficha['email']}")
+    partes = ficha['nombre'].split()
+    if len(partes) >= 2:
+        # Primer nombre + última palabra (apellido), tolera segundos nombres de más o de menos
+        claves.append(f"nom:{partes[0]}:{partes[-1]}")
+    return claves
+
+
+def _parecido(a, b, minimo):
+    """ratio() de difflib, salvo que sus cotas baratas ya muestren que no llega a `minimo` (da 0)."""
+    comparador = SequenceMatcher(None, a, b)
+    if comparador.real_quick_ratio() < minimo or comparador.quick_ratio() < minimo:
+        return 0.0
+    return comparador.ratio()
+
+
+def similitud(a, b, umbral=0.0):
+    """
+    Puntaje de 0 a 1 de que `a` y `b` sean la misma persona, y los motivos.
+    Primero suma las coincidencias exactas; si con lo que falta no puede llegar
+    a `umbral`, devuelve (0, []) sin hacer las comparaciones de texto.
+    """
+    motivos = []
+    puntaje = 0.0
+    if a['telefono'] and a['telefono'] == b['telefono']:
+        puntaje += 0.3
+        motivos.append('mismo teléfono')
+    if a['email'] and a['email'] == b['email']:
+        puntaje += 0.2
+        motivos.append('mismo email')
+    ci_parecida = bool(a['ci'] and b['ci'])
+    if ci_parecida and a['ci'] == b['ci']:
+        puntaje += 0.3
+        motivos.append('misma C.I. con otro formato')
+        ci_parecida = False
+
+    # Lo máximo que todavía pueden sumar el nombre (0.6) y una C.I. parecida (0.15)
+    if puntaje + 0.6 + (0.15 if ci_parecida else 0) < umbral:
+        return 0.0, []
+    if ci_parecida and _parecido(a['ci'], b['ci'], 0.8) >= 0.8:
+        puntaje += 0.15
+        motivos.append('C.I. parecida')
+
+    parecido = _parecido(a['nombre'], b['nombre'], (umbral - puntaje) / 0.6)
+    puntaje += parecido * 0.6
+    if parecido >= 0.9:
+        motivos.insert(0, 'nombre casi igual')
+    return min(puntaje, 1.0), motivos
+
+
+def buscar_duplicados(empresa_id, umbral=UMBRAL):
+    """
+    Pares (id_menor, id_mayor, puntaje, motivos) de clientes de la empresa que
+    superan `umbral`. Solo se comparan clientes del mismo bloque, así el costo
+    crece con el tamaño de los bloques y no con el cuadrado de los clientes.
+    """
+    fichas = {}
+    bloques = defaultdict(list)
+    filas = (
+        Cliente.objects.filter(empresa_id=empresa_id)
+        .values_list('id', 'ci_ruc', 'nombre', 'apellido', 'telefono', 'email')
+        .iterator(chunk_size=5000)
+    )
+    for fila in filas:
+        ficha = _ficha(*fila)
+        fichas[ficha['id']] = ficha
+        for clave in claves_bloqueo(ficha):
+            bloques[clave].append(ficha['id'])
+
+    vistos = set()
+    pares = []
+    for ids in bloques.values():
+        if len(ids) < 2 or len(ids) > MAX_BLOQUE:
+            continue
+        for id_a, id_b in combinations(sorted(ids), 2):
+            if (id_a, id_b) in vistos:
+                continue
+            vistos.add((id_a, id_b))
+            puntaje, motivos = similitud(fichas[id_a], fichas[id_b], umbral)
+            if puntaje >= umbral:
+                pares.append((id_a, id_b, puntaje, motivos))
+    return pares
+
+
+def guardar_duplicados(empresa_id, pares):
+    """
+    Reemplaza las sugerencias pendientes de la empresa por `pares`.
+    Los pares que el usuario ya descartó no se vuelven a sugerir.
+    """
+    with transaction.atomic():
+        DuplicadoCliente.objects.filter(empresa_id=empresa_id, descartado=False).delete()
+        descartados = set(
+            DuplicadoCliente.objects.filter(empresa_id=empresa_id, descartado=True).values_list('cliente_id', 'otro_id')
+        )
+        nuevos = [
+            DuplicadoCliente(
+                empresa_id=empresa_id, cliente_id=id_a, otro_id=id_b,
+                puntaje=round(puntaje, 3), motivos=', '.join(motivos)[:200],
+            )
+            for id_a, id_b, puntaje, motivos in pares
+            if (id_a, id_b) not in descartados
+        ]
+        DuplicadoCliente.objects.bulk_create(nuevos, batch_size=1000)
+    return len(nuevos)
+
+
+def fusionar_clientes(empresa_id, principal_id, duplicado_id):
+    """
+    Pasa todo el historial de `duplicado_id` a `principal_id` y borra el duplicado.
+    Las citas (y las archivadas) se reasignan con un UPDATE cada una, todo en una
+    sola transacción. Devuelve (principal, cantidad de citas movidas).
+    """
+    if principal_id == duplicado_id:
+        raise ValueError("No se puede fusionar un cliente consigo mismo.")
+
+    with transaction.atomic():
+        clientes = {
+            c.pk: c for c in Cliente.objects.select_for_update()
+            .filter(empresa_id=empresa_id, pk__in=[principal_id, duplicado_id]).order_by('pk')
+        }
+        if len(clientes) != 2:
+            raise ValueError("Alguno de los clientes ya no existe.")
+        principal, duplicado = clientes[principal_id], clientes[duplicado_id]
+
+        ids_citas = list(Cita.objects.filter(cliente_id=duplicado.pk).values_list('id', flat=True))
+        # update() no toca auto_now ni dispara señales: se hace a mano abajo
+        Cita.objects.filter(id__in=ids_citas).update(
+            cliente_id=principal.pk, actualizado_el=timezone.now(), version=F('version') + 1
+        )
+        archivadas = CitaHistorica.objects.filter(cliente_id=duplicado.pk).update(cliente_id=principal.pk)
+        # La lista de espera se borraría en cascada con el duplicado
+        EsperaCita.objects.filter(cliente_id=duplicado.pk).update(cliente_id=principal.pk)
+
+        # Se completa lo que le falte al principal con lo del duplicado
+        completar = [
+            campo for campo in ('email', 'telefono')
+            if not getattr(principal, campo) and getattr(duplicado, campo)
+        ]
+        for campo in completar:
+            setattr(principal, campo, getattr(duplicado, campo))
+
+        # Su estadística y sus sugerencias de duplicado se borran en cascada
+        duplicado.delete()
+        if completar:
+            principal.save(update_fields=completar)
+        recalcular_cliente(principal.pk, empresa_id)
+
+        if ids_citas:
+            registrar_cambios_citas(
+                Cita.objects.filter(id__in=ids_citas).select_related('cliente', 'profesional', 'servicio'),
+                'MODIFICADA',
+            )
+            marcar_cambio(empresa_id, 'cita')
+            transaction.on_commit(lambda: invalidar(empresa_id, 'agenda'))
+
+    return principal, len(ids_citas) + archivadas
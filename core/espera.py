@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import EsperaCita
+
+ESTADOS_VIGENTES = ['ESPERANDO', 'AVISADO']
+
+# Candidatos que se muestran por horario liberado
+LIMITE_CANDIDATOS = 5
+
+
+def intervalo(cita):
+    """(inicio, fin) del horario que ocupa la cita."""
+    fin = datetime.combine(cita.fecha, cita.hora) + timedelta(minutes=cita.servicio.duracion_minutos)
+    # Un servicio que pasa la medianoche no existe en un salón: se recorta al día
+    if fin.date() != cita.fecha:
+        fin = datetime.combine(cita.fecha, datetime.max.time())
+    return cita.hora, fin.time()
+
+
+def candidatos_para(cita, limite=LIMITE_CANDIDATOS):
+    """
+    Esperas vigentes que caben en el horario que deja libre `cita`: misma fecha
+    dentro de su ventana, un servicio que entra en la duración liberada, la franja
+    horaria que aceptan y el profesional (o cualquiera). Una sola consulta sobre el
+    índice parcial de esperas vigentes; primero las que esperan hace más tiempo.
+    """
+    inicio, fin = intervalo(cita)
+    return (
+        EsperaCita.objects.filter(
+            empresa_id=cita.empresa_id,
+            estado__in=ESTADOS_VIGENTES,
+            fecha_desde__lte=cita.fecha,
+            fecha_hasta__gte=cita.fecha,
+            servicio__duracion_minutos__lte=cita.servicio.duracion_minutos,
+        )
+        .filter(Q(hora_desde__isnull=True) | Q(hora_desde__lte=inicio))
+        .filter(Q(hora_hasta__isnull=True) | Q(hora_hasta__gte=fin))
+        .filter(Q(profesionales__isnull=True) | Q(profesionales=cita.profesional_id))
+        .exclude(cliente_id=cita.cliente_id)
+        .select_related('cliente', 'servicio')
+        .order_by('creado_el', 'id')[:limite]
+    )
+
+
+def esperas_en_fechas(empresa_id, fechas):
+    """Cuántas esperas vigentes aceptan alguna de las `fechas` (para avisar tras una cancelación masiva)."""
+    if not fechas:
+        return 0
+    filtro = Q()
+    for fecha in set(fechas):
+        filtro |= Q(fecha_desde__lte=fecha, fecha_hasta__gte=fecha)
+    return EsperaCita.objects.filter(filtro, empresa_id=empresa_id, estado__in=ESTADOS_VIGENTES).count()
+
+
+def mensaje_aviso(espera, cita):
+    """Texto listo para mandar por WhatsApp o email ofreciendo el horario liberado."""
+    return render_to_string('core/correos/lugar_libre.txt', {'espera': espera, 'cita': cita, 'empresa': cita.empresa})
+
+
+def marcar_avisado(espera):
+    espera.estado = 'AVISADO'
+    espera.avisado_el = timezone.now()
+    espera.save(update_fields=['estado', 'avisado_el'])
+
+
+def marcar_agendados(cita):
+    """Si el cliente consiguió turno dentro de la ventana que esperaba, su espera de ese servicio se cierra."""
+    return EsperaCita.objects.filter(
+        empresa_id=cita.empresa_id, cliente_id=cita.cliente_id, servicio_id=cita.servicio_id,
+        estado__in=ESTADOS_VIGENTES, fecha_desde__lte=cita.fecha, fecha_hasta__gte=cita.fecha,
+    ).update(estado='AGENDADO')
@@ -0,0 +1,127 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .models import Cita, CitaHistorica, EstadisticaCliente
+
+# Estados que cuentan como "no vino"
+ESTADOS_AUSENCIA = ['CANCELADO', 'NO_ASISTIO']
+
+DIAS_INACTIVO = 60
+
+CAMPOS = ['empresa', 'primera_visita', 'ultima_visita', 'visitas', 'total_gastado', 'cancelaciones']
+
+
+def _aplicar(cliente_id, empresa_id, **cambios):
+    # Un UPDATE con sumas; la fila se crea la primera vez que el cliente cierra una cita
+    if not EstadisticaCliente.objects.filter(cliente_id=cliente_id).update(**cambios):
+        EstadisticaCliente.objects.get_or_create(cliente_id=cliente_id, defaults={'empresa_id': empresa_id})
+        EstadisticaCliente.objects.filter(cliente_id=cliente_id).update(**cambios)
+
+
+def actualizar_estadistica(cita, estado_anterior, monto_anterior=None):
+    """
+    Ajusta la estadística del cliente después de cambiar el estado (o el monto) de
+    una cita. Los casos comunes son un solo UPDATE; deshacer una visita ya cobrada
+    no se puede restar (primera/última visita) y recalcula al cliente.
+    """
+    if estado_anterior == 'REALIZADO' and cita.estado != 'REALIZADO':
+        recalcular_cliente(cita.cliente_id, cita.empresa_id)
+        return
+
+    cambios = {}
+    monto = cita.monto_cobrado or 0
+    if cita.estado == 'REALIZADO':
+        if estado_anterior == 'REALIZADO':
+            if monto != (monto_anterior or 0):
+                cambios['total_gastado'] = F('total_gastado') + (monto - (monto_anterior or 0))
+        else:
+            fecha = Value(cita.fecha)
+            cambios.update(
+                visitas=F('visitas') + 1,
+                total_gastado=F('total_gastado') + monto,
+                primera_visita=Least(Coalesce('primera_visita', fecha), fecha),
+                ultima_visita=Greatest(Coalesce('ultima_visita', fecha), fecha),
+            )
+
+    ausente_antes = estado_anterior in ESTADOS_AUSENCIA
+    ausente_ahora = cita.estado in ESTADOS_AUSENCIA
+    if ausente_antes != ausente_ahora:
+        cambios['cancelaciones'] = F('cancelaciones') + (1 if ausente_ahora else -1)
+
+    if cambios:
+        _aplicar(cita.cliente_id, cita.empresa_id, **cambios)
+
+
+def sumar_ausencias(empresa_id, cliente_ids):
+    """
+    actualizar_estadistica() en lote para citas activas que pasan a un estado de
+    ausencia: dos consultas sin importar cuántos clientes haya.
+    """
+    conteo = Counter(cliente_ids)
+    if not conteo:
+        return
+    EstadisticaCliente.objects.bulk_create(
+        [EstadisticaCliente(cliente_id=cliente_id, empresa_id=empresa_id) for cliente_id in conteo],
+        ignore_conflicts=True,
+    )
+    EstadisticaCliente.objects.filter(cliente_id__in=conteo).update(
+        cancelaciones=F('cancelaciones') + Case(
+            *[When(cliente_id=cliente_id, then=Value(n)) for cliente_id, n in conteo.items()],
+            default=Value(0), output_field=IntegerField(),
+        )
+    )
+
+
+def calcular(empresa_id, **filtros):
+    """Estadísticas desde cero ({cliente_id: EstadisticaCliente}), activas más archivadas."""
+    realizada = Q(estado='REALIZADO')
+    filas = {}
+    for modelo in (Cita, CitaHistorica):
+        agregados = (
+            modelo.objects.filter(empresa_id=empresa_id, **filtros)
+            .values('cliente_id')
+            .annotate(
+                primera=Min('fecha', filter=realizada),
+                ultima=Max('fecha', filter=realizada),
+                visitas=Count('id', filter=realizada),
+                total=Sum('monto_cobrado', filter=realizada),
+                cancelaciones=Count('id', filter=Q(estado__in=ESTADOS_AUSENCIA)),
+            )
+            .order_by()
+        )
+        for r in agregados:
+            e = filas.setdefault(
+                r['cliente_id'], EstadisticaCliente(cliente_id=r['cliente_id'], empresa_id=empresa_id)
+            )
+            if r['primera'] and (not e.primera_visita or r['primera'] < e.primera_visita):
+                e.primera_visita = r['primera']
+            if r['ultima'] and (not e.ultima_visita or r['ultima'] > e.ultima_visita):
+                e.ultima_visita = r['ultima']
+            e.visitas += r['visitas']
+            e.total_gastado += r['total'] or 0
+            e.cancelaciones += r['cancelaciones']
+    return filas
+
+
+def guardar(filas):
+    EstadisticaCliente.objects.bulk_create(
+        filas, batch_size=1000,
+        update_conflicts=True, unique_fields=['cliente'], update_fields=CAMPOS,
+    )
+
+
+def recalcular_cliente(cliente_id, empresa_id):
+    fila = calcular(empresa_id, cliente_id=cliente_id).get(cliente_id)
+    guardar([fila or EstadisticaCliente(cliente_id=cliente_id, empresa_id=empresa_id)])
+
+
+def recalcular_empresa(empresa_id):
+    """Reconstruye las estadísticas de todos los clientes de la empresa. Devuelve cuántas filas quedaron."""
+    filas = calcular(empresa_id)
+    with transaction.atomic():
+        EstadisticaCliente.objects.filter(empresa_id=empresa_id).exclude(cliente_id__in=list(filas)).delete()
+        guardar(list(filas.values()))
+    return len(filas)
@@ -1,10 +1,32 @@
 from django import forms
 from django.core.exceptions import ValidationError
-from .models import Cita, Servicio, Cliente, Profesional, HorarioAtencion, Gasto, CategoriaGasto
-from datetime import date, datetime
+from .disponibilidad import libres_en, motivo_no_disponible
+from .models import (
+    Cita, Servicio, Cliente, Profesional, HorarioAtencion, Gasto, CategoriaGasto, EsperaCita, ReglaComision,
+    TurnoProfesional, AusenciaProfesional
+)
+from datetime import date, datetime, timedelta
+
+
+class VersionadoForm(forms.ModelForm):
+    """
+    Lleva en un campo oculto la versión del registro que se mostró. Si alguien lo
+    modificó mientras el formulario estaba abierto, al guardar se lanza
+    RegistroDesactualizado en vez de pisar sus cambios.
+    """
+    version = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['version'].initial = self.instance.version
+
+    def save(self, commit=True):
+        if self.cleaned_data.get('version'):
+            self.instance.version = self.cleaned_data['version']
+        return super().save(commit)
 
 
-class CitaForm(forms.ModelForm):
+class CitaForm(VersionadoForm):
     class Meta:
         model = Cita
         fields = ['cliente', 'profesional', 'servicio', 'fecha', 'hora']
@@ -76,24 +98,91 @@ class CitaForm(forms.ModelForm):
             )
 
         # --- VALIDACIÓN 2: DISPONIBILIDAD  ---
-        citas_coincidentes = Cita.objects.filter(
-            empresa=self.empresa,
-            profesional=profesional,
-            fecha=fecha,
-            hora=hora
-        ).exclude(estado='CANCELADO')
+        # Turnos, ausencias y citas del profesional, contando la duración del servicio.
+        # Acá con el día cacheado; la vista lo vuelve a confirmar contra la base al guardar.
+        if cleaned_data.get('servicio'):
+            self._validar_disponibilidad()
+
+    def _validar_disponibilidad(self, fresco=False):
+        profesional = self.cleaned_data['profesional']
+        fecha, hora = self.cleaned_data['fecha'], self.cleaned_data['hora']
+        minutos = self.cleaned_data['servicio'].duracion_minutos
+        empresa_id = profesional.empresa_id
+        excluir = self.instance.pk
+        motivo = motivo_no_disponible(empresa_id, profesional.pk, fecha, hora, minutos, excluir_cita=excluir, fresco=fresco)
+        if not motivo:
+            return
+
+        fin = (datetime.combine(fecha, hora) + timedelta(minutes=minutos)).time()
+        if motivo == 'NO_TRABAJA':
+            error = f"El profesional {profesional} no atiende de {hora.strftime('%H:%M')} a {fin.strftime('%H:%M')} ese día."
+        else:
+            error = f"El profesional {profesional} ya tiene una cita entre las {hora.strftime('%H:%M')} y las {fin.strftime('%H:%M')}."
+        # Las sugerencias son orientativas: alcanza con el día cacheado
+        libres = Profesional.objects.filter(
+            pk__in=libres_en(empresa_id, fecha, hora, minutos, excluir_cita=excluir)
+        ).exclude(pk=profesional.pk).order_by('nombre')
+        if libres:
+            error += " Libres a esa hora: " + ", ".join(f"{p.nombre} {p.apellido}" for p in libres) + "."
+        raise ValidationError(error)
+
+    def confirmar_disponibilidad(self):
+        """
+        Se llama dentro de la transacción que guarda la cita: bloquea al profesional
+        hasta el commit (como reservas.reservar) y valida contra la base, no contra
+        la caché, que puede ser de otro proceso. ValidationError si ya no está libre.
+        """
+        list(Profesional.objects.select_for_update().filter(pk=self.cleaned_data['profesional'].pk)
+             .values_list('pk', flat=True))
+        self._validar_disponibilidad(fresco=True)
+
+
+
+class EsperaCitaForm(forms.ModelForm):
+    class Meta:
+        model = EsperaCita
+        fields = ['cliente', 'servicio', 'profesionales', 'fecha_desde', 'fecha_hasta', 'hora_desde', 'hora_hasta', 'notas']
+        widgets = {
+            'cliente': forms.Select(attrs={'class': 'form-select select2'}),
+            'servicio': forms.Select(attrs={'class': 'form-select select2'}),
+            'profesionales': forms.SelectMultiple(attrs={'class': 'form-select select2'}),
+            'fecha_desde': forms.DateInput(format='%Y-%m-%d', attrs={'type': 'date', 'class': 'form-control'}),
+            'fecha_hasta': forms.DateInput(format='%Y-%m-%d', attrs={'type': 'date', 'class': 'form-control'}),
+            'hora_desde': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
+            'hora_hasta': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
+            'notas': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ej: Prefiere a la tarde'}),
+        }
+        help_texts = {'profesionales': 'Dejalo vacío si le sirve cualquiera.'}
 
-        if self.instance.pk:
-            citas_coincidentes = citas_coincidentes.exclude(pk=self.instance.pk)
+    def __init__(self, *args, **kwargs):
+        self.empresa = kwargs.pop('empresa', None)
+        super().__init__(*args, **kwargs)
 
-        if citas_coincidentes.exists():
-            raise ValidationError(
-                f"El profesional {profesional} ya tiene una cita agendada a las {hora}."
-            )
+        if self.empresa:
+            self.fields['cliente'].queryset = Cliente.objects.filter(empresa=self.empresa).order_by('nombre')
+            self.fields['servicio'].queryset = Servicio.objects.filter(empresa=self.empresa).order_by('nombre')
+            self.fields['profesionales'].queryset = Profesional.objects.filter(empresa=self.empresa).order_by('nombre')
+            self.fields['profesionales'].label_from_instance = lambda obj: f"{obj.nombre} {obj.apellido}"
+
+    def clean(self):
+        cleaned_data = super().clean()
+        fecha_desde = cleaned_data.get('fecha_desde')
+        fecha_hasta = cleaned_data.get('fecha_hasta')
+        hora_desde = cleaned_data.get('hora_desde')
+        hora_hasta = cleaned_data.get('hora_hasta')
 
+        if fecha_desde and fecha_hasta:
+            if fecha_hasta < fecha_desde:
+                raise ValidationError("La fecha 'hasta' no puede ser anterior a la fecha 'desde'.")
+            if fecha_hasta < date.today():
+                raise ValidationError("La ventana de espera ya pasó.")
 
+        if hora_desde and hora_hasta and hora_hasta <= hora_desde:
+            raise ValidationError("La hora 'hasta' tiene que ser posterior a la hora 'desde'.")
+        return cleaned_data
 
-class CobrarCitaForm(forms.ModelForm):
+
+class CobrarCitaForm(VersionadoForm):
     class Meta:
         model = Cita
         fields = ['monto_cobrado', 'metodo_pago']
@@ -162,7 +251,7 @@ class ProfesionalForm(forms.ModelForm):
 
 # Formularios de Gastos
 
-class GastoForm(forms.ModelForm):
+class GastoForm(VersionadoForm):
     class Meta:
         model = Gasto
         fields = ['descripcion', 'monto', 'fecha', 'categoria']
@@ -189,6 +278,54 @@ class CategoriaGastoForm(forms.ModelForm):
         }
 
 
+class ReglaComisionForm(forms.ModelForm):
+    class Meta:
+        model = ReglaComision
+        fields = ['profesional', 'servicio', 'desde_monto', 'porcentaje']
+        widgets = {
+            'profesional': forms.Select(attrs={'class': 'form-select select2'}),
+            'servicio': forms.Select(attrs={'class': 'form-select select2'}),
+            'desde_monto': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
+            'porcentaje': forms.NumberInput(attrs={'class': 'form-control', 'min': 0, 'max': 100, 'step': '0.5'}),
+        }
+        help_texts = {
+            'profesional': 'Vacío = todos los profesionales.',
+            'servicio': 'Vacío = todos los servicios.',
+            'desde_monto': 'Escalón: rige a partir de que el profesional facturó este monto en el mes. 0 = siempre.',
+        }
+
+    def __init__(self, *args, **kwargs):
+        self.empresa = kwargs.pop('empresa', None)
+        super().__init__(*args, **kwargs)
+        self.fields['profesional'].empty_label = "Todos"
+        self.fields['servicio'].empty_label = "Todos"
+
+        if self.empresa:
+            self.fields['profesional'].queryset = Profesional.objects.filter(empresa=self.empresa).order_by('nombre')
+            self.fields['profesional'].label_from_instance = lambda obj: f"{obj.nombre} {obj.apellido}"
+            self.fields['servicio'].queryset = Servicio.objects.filter(empresa=self.empresa).order_by('nombre')
+
+    def clean_porcentaje(self):
+        porcentaje = self.cleaned_data['porcentaje']
+        if porcentaje < 0 or porcentaje > 100:
+            raise ValidationError("El porcentaje debe estar entre 0 y 100.")
+        return porcentaje
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # unique_together no detecta repetidos con profesional/servicio vacíos (NULL)
+        if self.empresa and cleaned_data.get('desde_monto') is not None:
+            repetida = ReglaComision.objects.filter(
+                empresa=self.empresa,
+                profesional=cleaned_data.get('profesional'),
+                servicio=cleaned_data.get('servicio'),
+                desde_monto=cleaned_data['desde_monto'],
+            ).exclude(pk=self.instance.pk)
+            if repetida.exists():
+                raise ValidationError("Ya hay una regla para ese profesional, servicio y escalón.")
+        return cleaned_data
+
+
 class HorarioForm(forms.ModelForm):
     class Meta:
         model = HorarioAtencion
@@ -197,4 +334,69 @@ class HorarioForm(forms.ModelForm):
             'hora_inicio': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
             'hora_fin': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
             'abierto': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
-        }
\ No newline at end of file
+        }
+
+
+class TurnoProfesionalForm(forms.ModelForm):
+    class Meta:
+        model = TurnoProfesional
+        fields = ['dia_semana', 'hora_inicio', 'hora_fin']
+        widgets = {
+            'dia_semana': forms.Select(attrs={'class': 'form-select'}),
+            'hora_inicio': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
+            'hora_fin': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        hora_inicio = cleaned_data.get('hora_inicio')
+        hora_fin = cleaned_data.get('hora_fin')
+        if hora_inicio and hora_fin and hora_fin <= hora_inicio:
+            raise ValidationError("El turno tiene que terminar después de empezar.")
+        return cleaned_data
+
+
+class AusenciaProfesionalForm(forms.ModelForm):
+    class Meta:
+        model = AusenciaProfesional
+        fields = ['fecha_desde', 'fecha_hasta', 'hora_desde', 'hora_hasta', 'motivo']
+        widgets = {
+            'fecha_desde': forms.DateInput(format='%Y-%m-%d', attrs={'type': 'date', 'class': 'form-control'}),
+            'fecha_hasta': forms.DateInput(format='%Y-%m-%d', attrs={'type': 'date', 'class': 'form-control'}),
+            'hora_desde': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
+            'hora_hasta': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
+            'motivo': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Vacaciones, trámite...'}),
+        }
+        help_texts = {
+            'hora_desde': 'Vacías = todo el día.',
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        fecha_desde = cleaned_data.get('fecha_desde')
+        fecha_hasta = cleaned_data.get('fecha_hasta')
+        hora_desde = cleaned_data.get('hora_desde')
+        hora_hasta = cleaned_data.get('hora_hasta')
+
+        if fecha_desde and fecha_hasta and fecha_hasta < fecha_desde:
+            raise ValidationError("La fecha final no puede ser anterior a la inicial.")
+        if bool(hora_desde) != bool(hora_hasta):
+            raise ValidationError("Indicá las dos horas, o ninguna si falta todo el día.")
+        if hora_desde and hora_hasta and hora_hasta <= hora_desde:
+            raise ValidationError("La hora final tiene que ser posterior a la inicial.")
+        return cleaned_data
+
+
+class ReservaPublicaForm(forms.Form):
+    nombre = forms.CharField(max_length=100, widget=forms.TextInput(attrs={'class': 'form-control'}))
+    apellido = forms.CharField(max_length=100, widget=forms.TextInput(attrs={'class': 'form-control'}))
+    ci_ruc = forms.CharField(max_length=20, label="C.I.", widget=forms.TextInput(attrs={'class': 'form-control'}))
+    telefono = forms.CharField(max_length=20, label="Teléfono", widget=forms.TextInput(attrs={'class': 'form-control', 'type': 'tel'}))
+    email = forms.EmailField(required=False, help_text="Para mandarte la confirmación.",
+                             widget=forms.EmailInput(attrs={'class': 'form-control'}))
+
+    def clean_ci_ruc(self):
+        ci_ruc = self.cleaned_data['ci_ruc'].strip().replace('.', '')
+        if len(ci_ruc) < 5:
+            raise ValidationError("Ingresá tu número de C.I. completo.")
+        return ci_ruc
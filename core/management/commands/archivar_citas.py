@@ -0,0 +1,35 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.archivo import archivar_lote
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve a la tabla histórica las citas cerradas (realizadas, canceladas, sin asistencia, vencidas) "
+        "con más de --dias de antigüedad, por lotes cortos para no bloquear la agenda."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=365, help="Horizonte: se archiva lo anterior a hoy - dias")
+        parser.add_argument('--lote', type=int, default=1000)
+        parser.add_argument('--pausa', type=float, default=0.1, help="Segundos de espera entre lotes")
+
+    def handle(self, *args, **options):
+        fecha_limite = date.today() - timedelta(days=options['dias'])
+        self.stdout.write(f"Archivando citas cerradas anteriores a {fecha_limite}...")
+
+        totales = {}
+        while True:
+            movidas = archivar_lote(fecha_limite, options['lote'])
+            if not movidas:
+                break
+            for empresa_id, cantidad in movidas.items():
+                totales[empresa_id] = totales.get(empresa_id, 0) + cantidad
+            time.sleep(options['pausa'])
+
+        for empresa_id, cantidad in sorted(totales.items()):
+            self.stdout.write(f"  Empresa {empresa_id}: {cantidad} citas archivadas")
+        self.stdout.write(self.style.SUCCESS(f"Total archivado: {sum(totales.values())}"))
@@ -0,0 +1,68 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from core.metricas import estadisticas_pool, percentil
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia y rendimiento de la base con N hilos concurrentes. "
+        "Correrlo con DB_POOL=1 y sin él para comparar el pool contra conexiones persistentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=20)
+        parser.add_argument('--consultas', type=int, default=200, help="Consultas por hilo")
+        parser.add_argument('--alias', default='default')
+
+    def handle(self, *args, **options):
+        alias = options['alias']
+        hilos = options['hilos']
+        consultas = options['consultas']
+        hoy = date.today()
+
+        def trabajador(_):
+            latencias = []
+            errores = 0
+            for _ in range(consultas):
+                inicio = time.perf_counter()
+                try:
+                    with connections[alias].cursor() as cursor:
+                        cursor.execute("SELECT COUNT(*) FROM core_cita WHERE fecha = %s", [hoy])
+                        cursor.fetchone()
+                except Exception:
+                    errores += 1
+                finally:
+                    # Igual que al terminar un request: devuelve la conexión al pool
+                    # (o la conserva, si se usa CONN_MAX_AGE sin pool)
+                    close_old_connections()
+                latencias.append((time.perf_counter() - inicio) * 1000)
+            connections[alias].close()
+            return latencias, errores
+
+        inicio_total = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as executor:
+            resultados = list(executor.map(trabajador, range(hilos)))
+        duracion = time.perf_counter() - inicio_total
+
+        latencias = sorted(l for lat, _ in resultados for l in lat)
+        errores = sum(e for _, e in resultados)
+        total = len(latencias)
+
+        self.stdout.write(f"Hilos: {hilos}  Consultas: {total}  Errores: {errores}")
+        self.stdout.write(f"Rendimiento: {total / duracion:.1f} consultas/s en {duracion:.2f}s")
+        self.stdout.write(
+            f"Latencia ms  p50={percentil(latencias, 50):.2f}  p95={percentil(latencias, 95):.2f}  "
+            f"p99={percentil(latencias, 99):.2f}  max={latencias[-1] if latencias else 0:.2f}"
+        )
+
+        stats = estadisticas_pool(alias)
+        if stats is None:
+            self.stdout.write(self.style.WARNING("Sin pool: cada hilo mantiene su propia conexión."))
+        else:
+            for clave, valor in stats.items():
+                self.stdout.write(f"  {clave}: {valor}")
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.duplicados import UMBRAL, buscar_duplicados, guardar_duplicados
+from core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = (
+        "Busca clientes que parecen la misma persona (teléfono, nombre, C.I. o email parecidos) "
+        "y deja los pares sugeridos para revisar en Clientes > Posibles duplicados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="Solo esta empresa (id)")
+        parser.add_argument('--umbral', type=float, default=UMBRAL, help="Puntaje mínimo, de 0 a 1")
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.filter(activo=True).order_by('id')
+        if options['empresa']:
+            empresas = empresas.filter(pk=options['empresa'])
+
+        total = 0
+        for empresa in empresas:
+            inicio = time.perf_counter()
+            pares = buscar_duplicados(empresa.pk, umbral=options['umbral'])
+            cantidad = guardar_duplicados(empresa.pk, pares)
+            total += cantidad
+            self.stdout.write(f"  {empresa}: {cantidad} pares ({time.perf_counter() - inicio:.1f}s)")
+
+        self.stdout.write(self.style.SUCCESS(f"Posibles duplicados: {total}"))
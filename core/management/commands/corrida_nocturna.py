@@ -0,0 +1,79 @@
+import os
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.models import Empresa
+from core.nocturno import TRABAJOS, correr, pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        "Corrida nocturna de todas las empresas activas: vence citas, recalcula estadísticas, "
+        "cierra la caja del día, guarda métricas de uso y busca duplicados. Reparte las empresas "
+        "entre varios procesos; si se corta, al relanzarla sigue desde donde quedó."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help="Día que se cierra, AAAA-MM-DD (por defecto, ayer)")
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                            help="Procesos en paralelo (1 = todo en este proceso)")
+        parser.add_argument('--trabajos', help=f"Separados por coma. Disponibles: {', '.join(TRABAJOS)}")
+        parser.add_argument('--empresa', type=int, help="Solo esta empresa (id)")
+        parser.add_argument('--forzar', action='store_true', help="Repite también los trabajos ya hechos esa fecha")
+
+    def handle(self, *args, **options):
+        fecha = date.today() - timedelta(days=1)
+        if options['fecha']:
+            fecha = parse_date(options['fecha'])
+            if fecha is None:
+                raise CommandError("--fecha debe ser AAAA-MM-DD.")
+
+        trabajos = list(TRABAJOS)
+        if options['trabajos']:
+            trabajos = [t.strip() for t in options['trabajos'].split(',') if t.strip()]
+            desconocidos = [t for t in trabajos if t not in TRABAJOS]
+            if desconocidos:
+                raise CommandError(f"Trabajos desconocidos: {', '.join(desconocidos)}")
+            # Siempre en el orden de TRABAJOS
+            trabajos = [t for t in TRABAJOS if t in trabajos]
+
+        por_empresa = pendientes(fecha, trabajos, options['empresa'], options['forzar'])
+        if not por_empresa:
+            self.stdout.write(self.style.SUCCESS(f"Nada pendiente para {fecha}."))
+            return
+
+        procesos = max(1, min(options['procesos'], len(por_empresa)))
+        self.stdout.write(f"Corrida nocturna del {fecha}: {len(por_empresa)} empresas, procesos: {procesos}")
+
+        nombres = dict(Empresa.objects.filter(pk__in=list(por_empresa)).values_list('id', 'nombre'))
+        inicio = time.monotonic()
+        tiempos = []
+        fallidos = 0
+        for empresa_id, duracion_ms, detalle in correr(fecha, por_empresa, procesos):
+            tiempos.append((duracion_ms, nombres[empresa_id]))
+            partes = []
+            for trabajo, estado, ms, _ in detalle:
+                partes.append(f"{trabajo} {ms} ms" if estado == 'HECHO' else f"{trabajo} FALLÓ")
+            errores = [(trabajo, info) for trabajo, estado, _, info in detalle if estado != 'HECHO']
+            fallidos += len(errores)
+            estilo = self.style.WARNING if errores else (lambda texto: texto)
+            self.stdout.write(estilo(f"  {nombres[empresa_id]} ({duracion_ms} ms): {', '.join(partes)}"))
+            for trabajo, info in errores:
+                self.stdout.write(self.style.ERROR(f"    {trabajo}: {info}"))
+
+        duracion = time.monotonic() - inicio
+        self.stdout.write(
+            f"{len(tiempos)} empresas en {duracion:.1f}s ({len(tiempos) / duracion:.1f} empresas/s)"
+        )
+        lentas = sorted(tiempos, reverse=True)[:5]
+        self.stdout.write("Más lentas: " + ", ".join(f"{nombre} ({ms} ms)" for ms, nombre in lentas))
+
+        if fallidos:
+            self.stdout.write(self.style.WARNING(
+                f"Trabajos con error: {fallidos}. Al relanzar se reintentan solo esos."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("Corrida nocturna completa."))
@@ -0,0 +1,41 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.correos import despachar, encolar_recordatorios
+
+
+class Command(BaseCommand):
+    help = (
+        "Vacía la bandeja de salida de correos por lotes, reutilizando una conexión SMTP por lote. "
+        "Con --recordatorios encola antes los avisos de las citas de mañana."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50)
+        parser.add_argument('--recordatorios', action='store_true', help="Encola los recordatorios de mañana")
+        parser.add_argument('--continuo', action='store_true', help="Sigue esperando correos nuevos")
+        parser.add_argument('--espera', type=float, default=10, help="Segundos entre pasadas en modo continuo")
+
+    def handle(self, *args, **options):
+        if options['recordatorios']:
+            cantidad = encolar_recordatorios(date.today() + timedelta(days=1))
+            self.stdout.write(f"Recordatorios encolados: {cantidad}")
+
+        total_enviados = total_fallidos = 0
+        try:
+            while True:
+                enviados, fallidos = despachar(options['lote'])
+                total_enviados += enviados
+                total_fallidos += fallidos
+                if enviados or fallidos:
+                    self.stdout.write(f"  Lote: {enviados} enviados, {fallidos} con error")
+                if enviados + fallidos < options['lote']:
+                    if not options['continuo']:
+                        break
+                    time.sleep(options['espera'])
+        except KeyboardInterrupt:
+            self.stdout.write("Deteniendo...")
+
+        self.stdout.write(self.style.SUCCESS(f"Enviados: {total_enviados}, con error: {total_fallidos}"))
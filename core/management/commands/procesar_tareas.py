@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from core.tareas import ejecutar, purgar_hechas, rescatar_colgadas, tomar_lote
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de la cola de tareas: toma las tareas vencidas y las ejecuta en un pool de hilos, "
+        "con reintentos y tiempos por tarea."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=4)
+        parser.add_argument('--espera', type=float, default=2, help="Segundos entre consultas con la cola vacía")
+        parser.add_argument('--una-vez', action='store_true', help="Vacía la cola y termina (para cron)")
+        parser.add_argument('--purgar-dias', type=int, default=7, help="Borra al iniciar las tareas hechas más viejas")
+
+    def handle(self, *args, **options):
+        hilos = options['hilos']
+        borradas = purgar_hechas(options['purgar_dias'])
+        self.stdout.write(f"Worker iniciado con {hilos} hilos ({borradas} tareas viejas purgadas)")
+
+        procesadas = fallidas = 0
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            try:
+                while True:
+                    rescatar_colgadas()
+                    tareas = tomar_lote(hilos * 2)
+                    if not tareas:
+                        if options['una_vez']:
+                            break
+                        time.sleep(options['espera'])
+                        continue
+
+                    for tarea in pool.map(ejecutar, tareas):
+                        procesadas += 1
+                        estilo = self.style.SUCCESS if tarea.estado == 'HECHA' else self.style.WARNING
+                        if tarea.estado != 'HECHA':
+                            fallidas += 1
+                        self.stdout.write(estilo(
+                            f"  #{tarea.id} {tarea.funcion}: {tarea.estado} "
+                            f"({tarea.duracion_ms} ms, esperó {tarea.espera_ms} ms)"
+                        ))
+            except KeyboardInterrupt:
+                self.stdout.write("Deteniendo worker...")
+
+        self.stdout.write(self.style.SUCCESS(f"Procesadas: {procesadas}, con error: {fallidas}"))
@@ -0,0 +1,216 @@
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import requests
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.calendario import SLOT_MINUTOS, citas_solapadas
+from core.metricas import percentil
+from core.models import Cita, Cliente, HorarioAtencion, Servicio
+from core.resultados import inicio_mes, sumar_meses
+
+OPERACIONES = ('reserva', 'agenda', 'reporte')
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga contra un servidor en marcha (runserver, gunicorn...). Mezcla ráfagas de "
+        "reservas sobre un mismo profesional, consultas a la agenda y reportes de cierre de mes. "
+        "Informa rendimiento, latencias p50/p95/p99, errores y las citas solapadas que hayan pasado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Servidor a probar")
+        parser.add_argument('--usuario', required=True, help="Usuario dueño de una empresa (con permisos de caja)")
+        parser.add_argument('--clave', required=True)
+        parser.add_argument('--hilos', type=int, default=10, help="Usuarios simultáneos")
+        parser.add_argument('--duracion', type=int, default=30, help="Segundos de prueba")
+        parser.add_argument('--mezcla', default='reserva=5,agenda=4,reporte=1',
+                            help="Peso de cada operación, ej: reserva=8,agenda=2")
+        parser.add_argument('--profesional', type=int, help="Profesional de la ráfaga (por defecto el del usuario)")
+        parser.add_argument('--slots', type=int, default=8, help="Cantidad de horarios que se disputan las reservas")
+        parser.add_argument('--timeout', type=float, default=10)
+        parser.add_argument('--limpiar', action='store_true', help="Borra al final las citas creadas por la prueba")
+
+    def handle(self, *args, **options):
+        usuario = User.objects.filter(username=options['usuario']).select_related('profesional__empresa').first()
+        if not usuario or not hasattr(usuario, 'profesional'):
+            raise CommandError("El usuario no existe o no tiene una empresa asignada.")
+        empresa = usuario.profesional.empresa
+        profesional_id = options['profesional'] or usuario.profesional.pk
+
+        mezcla = self._leer_mezcla(options['mezcla'])
+        fecha, horas = self._horarios_en_disputa(empresa, options['slots'])
+        clientes = list(Cliente.objects.filter(empresa=empresa).values_list('id', flat=True)[:100])
+        servicios = list(Servicio.objects.filter(empresa=empresa).values_list('id', flat=True))
+        if not clientes or not servicios:
+            raise CommandError("La empresa necesita al menos un cliente y un servicio.")
+
+        id_inicial = Cita.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        base = options['url'].rstrip('/')
+        hoy = date.today()
+        mes_anterior = sumar_meses(inicio_mes(hoy), -1)
+        rango_reporte = {'fecha_inicio': mes_anterior.isoformat(),
+                         'fecha_fin': (inicio_mes(hoy) - timedelta(days=1)).isoformat()}
+
+        self.stdout.write(
+            f"{options['hilos']} hilos durante {options['duracion']}s contra {base}; "
+            f"reservas del profesional {profesional_id} el {fecha} en {len(horas)} horarios"
+        )
+
+        def trabajador(_):
+            sesion = requests.Session()
+            resultados = []
+            etags = {}
+            try:
+                self._iniciar_sesion(sesion, base, options)
+            except Exception as e:
+                return [('login', 0, 'error')], str(e)
+
+            def reservar():
+                datos = {
+                    'cliente': random.choice(clientes),
+                    'profesional': profesional_id,
+                    'servicio': random.choice(servicios),
+                    'fecha': fecha.isoformat(),
+                    'hora': random.choice(horas),
+                    'csrfmiddlewaretoken': sesion.cookies.get('csrftoken'),
+                }
+                r = sesion.post(f"{base}/agendar/", data=datos, headers={'Referer': f"{base}/agendar/"},
+                                allow_redirects=False, timeout=options['timeout'])
+                # 302: cita creada; 200: el formulario la rechazó (horario ocupado, etc.)
+                return {302: 'ok', 200: 'rechazada'}.get(r.status_code, 'error')
+
+            def agenda():
+                # Igual que un navegador: reenvía el ETag y acepta el 304
+                url = random.choice([f"{base}/", f"{base}/citas/"])
+                cabeceras = {'If-None-Match': etags[url]} if url in etags else {}
+                r = sesion.get(url, headers=cabeceras, timeout=options['timeout'])
+                if 'ETag' in r.headers:
+                    etags[url] = r.headers['ETag']
+                return 'ok' if r.status_code in (200, 304) else 'error'
+
+            def reporte():
+                url = random.choice([f"{base}/caja/", f"{base}/caja/resultados/"])
+                r = sesion.get(url, params=rango_reporte, timeout=options['timeout'])
+                return 'ok' if r.status_code == 200 else 'error'
+
+            acciones = {'reserva': reservar, 'agenda': agenda, 'reporte': reporte}
+            nombres = list(mezcla)
+            pesos = [mezcla[n] for n in nombres]
+            fin = time.monotonic() + options['duracion']
+            while time.monotonic() < fin:
+                operacion = random.choices(nombres, pesos)[0]
+                inicio = time.perf_counter()
+                try:
+                    resultado = acciones[operacion]()
+                except requests.RequestException:
+                    resultado = 'error'
+                resultados.append((operacion, (time.perf_counter() - inicio) * 1000, resultado))
+            return resultados, None
+
+        inicio_total = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['hilos']) as executor:
+            salidas = list(executor.map(trabajador, range(options['hilos'])))
+        duracion = time.perf_counter() - inicio_total
+
+        errores_login = {e for _, e in salidas if e}
+        for error in errores_login:
+            self.stdout.write(self.style.ERROR(f"No se pudo iniciar sesión: {error}"))
+
+        self._informe([r for resultados, _ in salidas for r in resultados], duracion)
+
+        creadas = Cita.objects.filter(id__gt=id_inicial, empresa=empresa, fecha=fecha, profesional_id=profesional_id)
+        self.stdout.write(f"Citas creadas por la prueba: {creadas.count()}")
+
+        solapadas = citas_solapadas(empresa.pk, [fecha], [profesional_id])
+        if solapadas:
+            self.stdout.write(self.style.ERROR(f"Citas solapadas: {len(solapadas)} pares"))
+            for a, b in solapadas[:10]:
+                self.stdout.write(f"  #{a.pk} {a.hora:%H:%M} ({a.servicio.duracion_minutos} min) pisa a #{b.pk} {b.hora:%H:%M}")
+        else:
+            self.stdout.write(self.style.SUCCESS("Sin citas solapadas"))
+
+        if options['limpiar']:
+            borradas = 0
+            for cita in creadas:
+                cita.delete()
+                borradas += 1
+            self.stdout.write(f"Citas de la prueba borradas: {borradas}")
+
+    def _leer_mezcla(self, texto):
+        mezcla = {}
+        for parte in texto.split(','):
+            nombre, _, peso = parte.partition('=')
+            nombre = nombre.strip()
+            if nombre not in OPERACIONES or not peso.strip().isdigit():
+                raise CommandError(f"Mezcla inválida: '{parte}'. Operaciones: {', '.join(OPERACIONES)}")
+            if int(peso):
+                mezcla[nombre] = int(peso)
+        if not mezcla:
+            raise CommandError("La mezcla no tiene ninguna operación con peso.")
+        return mezcla
+
+    def _horarios_en_disputa(self, empresa, cantidad):
+        """Próximo día abierto (desde mañana) y sus primeros `cantidad` horarios."""
+        horarios = {h.dia_semana: h for h in HorarioAtencion.objects.filter(empresa=empresa, abierto=True)}
+        if not horarios:
+            raise CommandError("La empresa no tiene días de atención configurados.")
+        fecha = date.today() + timedelta(days=1)
+        while fecha.weekday() not in horarios:
+            fecha += timedelta(days=1)
+        horario = horarios[fecha.weekday()]
+
+        horas = []
+        actual = datetime.combine(fecha, horario.hora_inicio)
+        while actual.time() < horario.hora_fin and len(horas) < cantidad:
+            horas.append(actual.strftime('%H:%M'))
+            actual += timedelta(minutes=SLOT_MINUTOS)
+        return fecha, horas
+
+    def _iniciar_sesion(self, sesion, base, options):
+        url = f"{base}/accounts/login/"
+        sesion.get(url, timeout=options['timeout']).raise_for_status()
+        r = sesion.post(url, data={
+            'username': options['usuario'],
+            'password': options['clave'],
+            'csrfmiddlewaretoken': sesion.cookies.get('csrftoken'),
+        }, headers={'Referer': url}, allow_redirects=False, timeout=options['timeout'])
+        if r.status_code != 302:
+            raise CommandError(f"login respondió {r.status_code}")
+
+    def _informe(self, resultados, duracion):
+        por_operacion = defaultdict(list)
+        for operacion, ms, resultado in resultados:
+            por_operacion[operacion].append((ms, resultado))
+
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'operación':<10}{'total':>7}{'ok':>7}{'rechaz.':>8}{'error':>7}{'% err':>7}"
+            f"{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}"
+        )
+        for operacion in list(OPERACIONES) + ['login']:
+            filas = por_operacion.get(operacion)
+            if not filas:
+                continue
+            latencias = sorted(ms for ms, _ in filas)
+            conteo = defaultdict(int)
+            for _, resultado in filas:
+                conteo[resultado] += 1
+            self.stdout.write(
+                f"{operacion:<10}{len(filas):>7}{conteo['ok']:>7}{conteo['rechazada']:>8}{conteo['error']:>7}"
+                f"{conteo['error'] * 100 / len(filas):>6.1f}%{len(filas) / duracion:>8.1f}"
+                f"{percentil(latencias, 50):>9.1f}{percentil(latencias, 95):>9.1f}"
+                f"{percentil(latencias, 99):>9.1f}{latencias[-1]:>9.1f}"
+            )
+
+        total = len(resultados)
+        errores = sum(1 for _, _, r in resultados if r == 'error')
+        self.stdout.write(
+            f"Total: {total} pedidos en {duracion:.1f}s ({total / duracion:.1f} req/s), "
+            f"errores {errores} ({errores * 100 / max(total, 1):.1f}%). Latencias en ms."
+        )
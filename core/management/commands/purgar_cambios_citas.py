@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import CambioCita
+
+
+class Command(BaseCommand):
+    help = "Borra del feed de cambios los eventos más viejos que --dias (los clientes ya los sincronizaron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30)
+        parser.add_argument('--lote', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['dias'])
+        total = 0
+        while True:
+            # Por lotes, para no bloquear la tabla mientras se siguen insertando eventos
+            ids = list(
+                CambioCita.objects.filter(creado_el__lt=limite)
+                .order_by('id')
+                .values_list('id', flat=True)[:options['lote']]
+            )
+            if not ids:
+                break
+            total += CambioCita.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f"Eventos borrados: {total}"))
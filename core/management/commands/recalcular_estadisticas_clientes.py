@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.estadisticas import recalcular_empresa
+from core.models import Empresa
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye las estadísticas por cliente (primera/última visita, visitas, total gastado, "
+        "cancelaciones) desde las citas activas y archivadas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help="Solo esta empresa (id)")
+
+    def handle(self, *args, **options):
+        empresas = Empresa.objects.order_by('id')
+        if options['empresa']:
+            empresas = empresas.filter(pk=options['empresa'])
+
+        total = 0
+        for empresa in empresas:
+            cantidad = recalcular_empresa(empresa.pk)
+            total += cantidad
+            self.stdout.write(f"  {empresa}: {cantidad} clientes")
+
+        self.stdout.write(self.style.SUCCESS(f"Estadísticas recalculadas: {total}"))
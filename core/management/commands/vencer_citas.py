@@ -0,0 +1,46 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.models import Cita, Empresa
+from core.transiciones import ESTADOS_ACTIVOS, vencer_lote
+
+
+class Command(BaseCommand):
+    help = (
+        "Pasa a VENCIDO las citas PENDIENTES/CONFIRMADAS de todas las empresas cuya fecha ya pasó "
+        "hace más de --dias, por lotes cortos. Pensado para correr todos los días (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=1, help="Días de gracia para cobrar o cerrar la cita")
+        parser.add_argument('--lote', type=int, default=500)
+        parser.add_argument('--pausa', type=float, default=0.05, help="Segundos de espera entre lotes")
+        parser.add_argument('--simular', action='store_true', help="Solo cuenta, no modifica nada")
+
+    def handle(self, *args, **options):
+        fecha_limite = date.today() - timedelta(days=options['dias'])
+        self.stdout.write(f"Venciendo citas activas anteriores a {fecha_limite}...")
+
+        total = 0
+        for empresa_id, nombre in Empresa.objects.order_by('id').values_list('id', 'nombre'):
+            if options['simular']:
+                cantidad = Cita.objects.filter(
+                    empresa_id=empresa_id, estado__in=ESTADOS_ACTIVOS, fecha__lt=fecha_limite
+                ).count()
+            else:
+                cantidad = 0
+                while True:
+                    movidas = vencer_lote(empresa_id, fecha_limite, options['lote'])
+                    cantidad += movidas
+                    if movidas < options['lote']:
+                        break
+                    time.sleep(options['pausa'])
+
+            if cantidad:
+                self.stdout.write(f"  {nombre}: {cantidad} citas")
+            total += cantidad
+
+        accion = "Se vencerían" if options['simular'] else "Citas vencidas"
+        self.stdout.write(self.style.SUCCESS(f"{accion}: {total}"))
@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.db import connections
+from django.db.models import Avg, Count, Max
+from django.utils import timezone
+
+from .models import Tarea
+
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0
+    indice = min(len(valores_ordenados) - 1, int(round(p / 100 * (len(valores_ordenados) - 1))))
+    return valores_ordenados[indice]
+
+
+def estadisticas_pool(alias='default', reiniciar=False):
+    """
+    Devuelve las métricas del pool de conexiones de la base `alias`.
+    Si la base no usa pool (DB_POOL desactivado o no es PostgreSQL) devuelve None.
+
+    Con reiniciar=True los contadores acumulados (esperas, errores) vuelven a
+    cero después de leerlos, útil para un recolector que consulta cada N segundos.
+    """
+    pool = getattr(connections[alias], 'pool', None)
+    if pool is None:
+        return None
+
+    stats = pool.pop_stats() if reiniciar else pool.get_stats()
+
+    # psycopg_pool omite los contadores que todavía valen cero
+    en_uso = stats.get('pool_size', 0) - stats.get('pool_available', 0)
+    solicitudes = stats.get('requests_num', 0)
+    espera_total_ms = stats.get('requests_wait_ms', 0)
+
+    return {
+        'alias': alias,
+        'min_size': stats.get('pool_min', 0),
+        'max_size': stats.get('pool_max', 0),
+        'conexiones_abiertas': stats.get('pool_size', 0),
+        'conexiones_libres': stats.get('pool_available', 0),
+        'conexiones_en_uso': en_uso,
+        # Proporción del máximo ocupada ahora mismo (1.0 = pool saturado)
+        'saturacion': round(en_uso / stats['pool_max'], 3) if stats.get('pool_max') else 0,
+        'esperando_ahora': stats.get('requests_waiting', 0),
+        'solicitudes': solicitudes,
+        'solicitudes_encoladas': stats.get('requests_queued', 0),
+        'solicitudes_rechazadas': stats.get('requests_errors', 0),
+        'espera_total_ms': espera_total_ms,
+        'espera_promedio_ms': round(espera_total_ms / solicitudes, 2) if solicitudes else 0,
+        'conexiones_descartadas': stats.get('returns_bad', 0) + stats.get('connections_lost', 0),
+        'errores_conexion': stats.get('connections_errors', 0),
+    }
+
+
+def estadisticas_tareas(horas=24):
+    """
+    Resumen de la cola de tareas: cuántas hay en cada estado y, por función, los
+    tiempos de espera y de ejecución de las que terminaron en las últimas `horas`.
+    """
+    desde = timezone.now() - timedelta(hours=horas)
+    por_estado = dict(Tarea.objects.values_list('estado').annotate(n=Count('id')).order_by())
+    vencidas = Tarea.objects.filter(estado='PENDIENTE', ejecutar_desde__lte=timezone.now()).count()
+
+    por_funcion = (
+        Tarea.objects.filter(terminada_el__gte=desde)
+        .values('funcion')
+        .annotate(
+            cantidad=Count('id'),
+            duracion_promedio_ms=Avg('duracion_ms'),
+            duracion_max_ms=Max('duracion_ms'),
+            espera_promedio_ms=Avg('espera_ms'),
+            espera_max_ms=Max('espera_ms'),
+        )
+        .order_by('funcion')
+    )
+    return {
+        'por_estado': por_estado,
+        'vencidas_sin_tomar': vencidas,
+        'por_funcion': [
+            {k: (round(v, 1) if isinstance(v, float) else v) for k, v in fila.items()}
+            for fila in por_funcion
+        ],
+    }
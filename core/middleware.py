@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+
+from .routers import COOKIE_PRIMARIO, hay_replica
+
+
+class FijarPrimarioMiddleware:
+    """
+    Después de cualquier escritura (POST, PUT, DELETE...) deja una cookie que
+    obliga a leer del primario durante unos segundos. Así, tras agendar o cobrar
+    una cita, el listado siguiente no llega desde una réplica atrasada.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if hay_replica() and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            segundos = settings.REPLICA_PIN_SEGUNDOS
+            response.set_cookie(
+                COOKIE_PRIMARIO,
+                str(time.time() + segundos),
+                max_age=segundos,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
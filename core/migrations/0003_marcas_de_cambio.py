@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_cita_notas_adicionales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='actualizado_el',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='actualizado_el',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='gasto',
+            name='actualizado_el',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='profesional',
+            name='actualizado_el',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='servicio',
+            name='actualizado_el',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='MarcaCambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(max_length=50)),
+                ('actualizado_el', models.DateTimeField()),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='marcas_cambio', to='core.empresa')),
+            ],
+            options={
+                'unique_together': {('empresa', 'modelo')},
+            },
+        ),
+    ]
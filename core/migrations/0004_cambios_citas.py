@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_marcas_de_cambio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioCita',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('CREADA', 'Creada'), ('MODIFICADA', 'Modificada'), ('ESTADO', 'Cambio de estado')], max_length=20)),
+                ('datos', models.JSONField()),
+                ('creado_el', models.DateTimeField(auto_now_add=True)),
+                ('cita', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='cambios', to='core.cita')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cambios_citas', to='core.empresa')),
+                ('profesional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cambios_citas', to='core.profesional')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['empresa', 'id'], name='core_cambio_empresa_545c60_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_cambios_citas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CitaHistorica',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha', models.DateField()),
+                ('hora', models.TimeField()),
+                ('monto_cobrado', models.DecimalField(blank=True, decimal_places=0, max_digits=10, null=True)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('CONFIRMADO', 'Confirmado'), ('REALIZADO', 'Realizado'), ('CANCELADO', 'Cancelado')], max_length=20)),
+                ('metodo_pago', models.CharField(choices=[('EFECTIVO', 'Efectivo'), ('TRANSFERENCIA', 'Transferencia / QR'), ('TARJETA', 'Tarjeta de Débito/Crédito'), ('CHEQUE', 'Cheque'), ('OTRO', 'Otro')], max_length=20)),
+                ('notas_adicionales', models.TextField(blank=True, null=True, verbose_name='Detalles / Adicionales')),
+                ('actualizado_el', models.DateTimeField()),
+                ('archivado_el', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Cita Histórica',
+                'verbose_name_plural': 'Citas Históricas',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['empresa', 'fecha'], name='core_cita_empresa_5d58a3_idx'),
+        ),
+        migrations.AddField(
+            model_name='citahistorica',
+            name='cliente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='citas_historicas', to='core.cliente'),
+        ),
+        migrations.AddField(
+            model_name='citahistorica',
+            name='empresa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='citas_historicas', to='core.empresa'),
+        ),
+        migrations.AddField(
+            model_name='citahistorica',
+            name='profesional',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='citas_historicas', to='core.profesional'),
+        ),
+        migrations.AddField(
+            model_name='citahistorica',
+            name='servicio',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='citas_historicas', to='core.servicio'),
+        ),
+        migrations.AddIndex(
+            model_name='citahistorica',
+            index=models.Index(fields=['empresa', 'fecha'], name='core_citahi_empresa_570db0_idx'),
+        ),
+    ]
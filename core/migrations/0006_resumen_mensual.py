@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_citas_historicas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MesPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meses_pendientes', to='core.empresa')),
+            ],
+            options={
+                'unique_together': {('empresa', 'mes')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('dimension', models.CharField(choices=[('servicio', 'Ingresos por servicio'), ('metodo_pago', 'Ingresos por método de pago'), ('categoria', 'Gastos por categoría')], max_length=20)),
+                ('clave', models.CharField(max_length=50)),
+                ('etiqueta', models.CharField(max_length=100)),
+                ('total', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_mensuales', to='core.empresa')),
+            ],
+            options={
+                'unique_together': {('empresa', 'mes', 'dimension', 'clave')},
+            },
+        ),
+    ]
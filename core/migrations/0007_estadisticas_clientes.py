@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_resumen_mensual'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaCliente',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estadistica', serialize=False, to='core.cliente')),
+                ('primera_visita', models.DateField(blank=True, null=True)),
+                ('ultima_visita', models.DateField(blank=True, null=True)),
+                ('visitas', models.PositiveIntegerField(default=0)),
+                ('total_gastado', models.DecimalField(decimal_places=0, default=0, max_digits=14)),
+                ('cancelaciones', models.PositiveIntegerField(default=0)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estadisticas_clientes', to='core.empresa')),
+            ],
+            options={
+                'verbose_name': 'Estadística de Cliente',
+                'verbose_name_plural': 'Estadísticas de Clientes',
+                'indexes': [models.Index(fields=['empresa', 'ultima_visita'], name='core_estadi_empresa_f35248_idx'), models.Index(fields=['empresa', 'total_gastado'], name='core_estadi_empresa_7e106d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_estadisticas_clientes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('funcion', models.CharField(max_length=200)),
+                ('argumentos', models.JSONField(default=dict)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_CURSO', 'En curso'), ('HECHA', 'Hecha'), ('FALLIDA', 'Fallida')], default='PENDIENTE', max_length=20)),
+                ('ejecutar_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('max_intentos', models.PositiveIntegerField(default=3)),
+                ('error', models.TextField(blank=True)),
+                ('creado_el', models.DateTimeField(auto_now_add=True)),
+                ('iniciada_el', models.DateTimeField(blank=True, null=True)),
+                ('terminada_el', models.DateTimeField(blank=True, null=True)),
+                ('espera_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('duracion_ms', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'ejecutar_desde'], name='core_tarea_estado_8357f1_idx')],
+            },
+        ),
+    ]
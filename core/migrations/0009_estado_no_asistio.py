@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_cola_tareas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cita',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('CONFIRMADO', 'Confirmado'), ('REALIZADO', 'Realizado'), ('CANCELADO', 'Cancelado'), ('NO_ASISTIO', 'No asistió')], default='PENDIENTE', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='citahistorica',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('CONFIRMADO', 'Confirmado'), ('REALIZADO', 'Realizado'), ('CANCELADO', 'Cancelado'), ('NO_ASISTIO', 'No asistió')], max_length=20),
+        ),
+    ]
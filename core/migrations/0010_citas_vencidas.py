@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_estado_no_asistio'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cita',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('CONFIRMADO', 'Confirmado'), ('REALIZADO', 'Realizado'), ('CANCELADO', 'Cancelado'), ('NO_ASISTIO', 'No asistió'), ('VENCIDO', 'Vencida sin cerrar')], default='PENDIENTE', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='citahistorica',
+            name='estado',
+            field=models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('CONFIRMADO', 'Confirmado'), ('REALIZADO', 'Realizado'), ('CANCELADO', 'Cancelado'), ('NO_ASISTIO', 'No asistió'), ('VENCIDO', 'Vencida sin cerrar')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(condition=models.Q(('estado__in', ['PENDIENTE', 'CONFIRMADO'])), fields=['empresa', 'fecha'], name='cita_activa_empresa_fecha'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_citas_vencidas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['-fecha', 'hora'], name='cita_fecha_hora'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_admin_indice_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoSaliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('CONFIRMACION', 'Confirmación de reserva'), ('MODIFICACION', 'Cambio de horario'), ('RECORDATORIO', 'Recordatorio'), ('CANCELACION', 'Cancelación')], max_length=20)),
+                ('clave', models.CharField(max_length=120, unique=True)),
+                ('remitente', models.CharField(max_length=200)),
+                ('destinatario', models.EmailField(max_length=254)),
+                ('asunto', models.CharField(max_length=200)),
+                ('cuerpo', models.TextField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIADO', 'Enviado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('error', models.TextField(blank=True)),
+                ('creado_el', models.DateTimeField(auto_now_add=True)),
+                ('enviado_el', models.DateTimeField(blank=True, null=True)),
+                ('cita', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='correos', to='core.cita')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='correos', to='core.empresa')),
+            ],
+            options={
+                'verbose_name': 'Correo Saliente',
+                'verbose_name_plural': 'Correos Salientes',
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='core_correo_estado_994314_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_correos_salientes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empresa',
+            name='duenos',
+            field=models.ManyToManyField(blank=True, related_name='empresas_a_cargo', to=settings.AUTH_USER_MODEL, verbose_name='Dueños'),
+        ),
+    ]
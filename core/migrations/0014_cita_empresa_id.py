@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_empresa_duenos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['empresa', 'id'], name='cita_empresa_id'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_cita_empresa_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicadoCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('puntaje', models.FloatField()),
+                ('motivos', models.CharField(max_length=200)),
+                ('descartado', models.BooleanField(default=False)),
+                ('creado_el', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.cliente')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicados_clientes', to='core.empresa')),
+                ('otro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.cliente')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['empresa', 'descartado', '-puntaje'], name='core_duplic_empresa_2e3fba_idx')],
+                'unique_together': {('cliente', 'otro')},
+            },
+        ),
+    ]
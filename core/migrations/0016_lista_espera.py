@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_duplicados_clientes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='correosaliente',
+            name='tipo',
+            field=models.CharField(choices=[('CONFIRMACION', 'Confirmación de reserva'), ('MODIFICACION', 'Cambio de horario'), ('RECORDATORIO', 'Recordatorio'), ('CANCELACION', 'Cancelación'), ('LUGAR_LIBRE', 'Lugar libre (lista de espera)')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='EsperaCita',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_desde', models.DateField()),
+                ('fecha_hasta', models.DateField()),
+                ('hora_desde', models.TimeField(blank=True, null=True)),
+                ('hora_hasta', models.TimeField(blank=True, null=True)),
+                ('notas', models.CharField(blank=True, max_length=200)),
+                ('estado', models.CharField(choices=[('ESPERANDO', 'Esperando'), ('AVISADO', 'Avisado'), ('AGENDADO', 'Agendado'), ('BAJA', 'Dado de baja')], default='ESPERANDO', max_length=20)),
+                ('avisado_el', models.DateTimeField(blank=True, null=True)),
+                ('creado_el', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='esperas', to='core.cliente')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='esperas', to='core.empresa')),
+                ('profesionales', models.ManyToManyField(blank=True, related_name='esperas', to='core.profesional')),
+                ('servicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='esperas', to='core.servicio')),
+            ],
+            options={
+                'verbose_name': 'Espera de Cita',
+                'verbose_name_plural': 'Lista de Espera',
+                'indexes': [models.Index(condition=models.Q(('estado__in', ['ESPERANDO', 'AVISADO'])), fields=['empresa', 'fecha_desde', 'fecha_hasta'], name='espera_vigente_fechas')],
+            },
+        ),
+    ]
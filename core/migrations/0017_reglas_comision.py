@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_lista_espera'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReglaComision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desde_monto', models.DecimalField(decimal_places=0, default=0, max_digits=12, verbose_name='Desde lo facturado en el mes (Gs.)')),
+                ('porcentaje', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Porcentaje (%)')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reglas_comision', to='core.empresa')),
+                ('profesional', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reglas_comision', to='core.profesional')),
+                ('servicio', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reglas_comision', to='core.servicio')),
+            ],
+            options={
+                'verbose_name': 'Regla de Comisión',
+                'verbose_name_plural': 'Reglas de Comisión',
+                'unique_together': {('empresa', 'profesional', 'servicio', 'desde_monto')},
+            },
+        ),
+    ]
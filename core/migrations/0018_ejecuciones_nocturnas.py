@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_reglas_comision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EjecucionNocturna',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('trabajo', models.CharField(max_length=50)),
+                ('estado', models.CharField(choices=[('HECHO', 'Hecho'), ('FALLIDO', 'Fallido')], max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=1)),
+                ('duracion_ms', models.PositiveIntegerField()),
+                ('resultado', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('terminado_el', models.DateTimeField(auto_now=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ejecuciones_nocturnas', to='core.empresa')),
+            ],
+            options={
+                'verbose_name': 'Ejecución Nocturna',
+                'verbose_name_plural': 'Ejecuciones Nocturnas',
+                'unique_together': {('fecha', 'empresa', 'trabajo')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_ejecuciones_nocturnas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cita',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='gasto',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
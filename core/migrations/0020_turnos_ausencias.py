@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-19 00:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_version_citas_gastos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AusenciaProfesional',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_desde', models.DateField()),
+                ('fecha_hasta', models.DateField()),
+                ('hora_desde', models.TimeField(blank=True, null=True)),
+                ('hora_hasta', models.TimeField(blank=True, null=True)),
+                ('motivo', models.CharField(blank=True, max_length=100)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ausencias', to='core.empresa')),
+                ('profesional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ausencias', to='core.profesional')),
+            ],
+            options={
+                'verbose_name': 'Ausencia de Profesional',
+                'verbose_name_plural': 'Ausencias de Profesionales',
+                'ordering': ['fecha_desde'],
+                'indexes': [models.Index(fields=['empresa', 'fecha_hasta'], name='core_ausenc_empresa_a61032_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TurnoProfesional',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.IntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')])),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turnos', to='core.empresa')),
+                ('profesional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turnos', to='core.profesional')),
+            ],
+            options={
+                'verbose_name': 'Turno de Profesional',
+                'verbose_name_plural': 'Turnos de Profesionales',
+                'ordering': ['dia_semana', 'hora_inicio'],
+                'indexes': [models.Index(fields=['empresa', 'dia_semana'], name='core_turnop_empresa_05c392_idx')],
+            },
+        ),
+    ]
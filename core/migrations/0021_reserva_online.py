@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:02
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def completar_slugs(apps, schema_editor):
+    Empresa = apps.get_model('core', 'Empresa')
+    usados = set()
+    for empresa in Empresa.objects.order_by('id'):
+        slug = slugify(empresa.nombre)[:50] or 'salon'
+        if slug in usados:
+            slug = f"{slug}-{empresa.pk}"
+        usados.add(slug)
+        Empresa.objects.filter(pk=empresa.pk).update(slug=slug)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_turnos_ausencias'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empresa',
+            name='reserva_online',
+            field=models.BooleanField(default=False, verbose_name='Reservas online'),
+        ),
+        migrations.AddField(
+            model_name='empresa',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=60, null=True, unique=True),
+        ),
+        migrations.RunPython(completar_slugs, migrations.RunPython.noop),
+    ]
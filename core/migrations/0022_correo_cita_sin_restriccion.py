@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 01:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_reserva_online'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='correosaliente',
+            name='cita',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='correos', to='core.cita'),
+        ),
+    ]
@@ -1,6 +1,78 @@
 from django.db import models
 from datetime import date
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+class RegistroDesactualizado(Exception):
+    """Otra persona guardó el registro después de que se leyó."""
+
+
+# Control de concurrencia optimista (citas y gastos, que se editan desde varias pantallas
+# a la vez). Guardar una fila existente hace UPDATE solo de los campos que cambiaron desde
+# que se leyó, con WHERE version = <la versión que se tenía>, y sube la versión. Si otro
+# la guardó antes no se pisa nada: se lanza RegistroDesactualizado.
+# Los update() masivos tienen que subir la versión a mano: version=F('version') + 1.
+class ConVersion(models.Model):
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._leido = instancia._valores_actuales()
+        return instancia
+
+    def _valores_actuales(self):
+        # Solo los campos cargados (no dispara consultas por los diferidos)
+        return {
+            f.attname: self.__dict__[f.attname]
+            for f in self._meta.concrete_fields
+            if not f.primary_key and f.attname in self.__dict__
+        }
+
+    def campos_cambiados(self):
+        leido = getattr(self, '_leido', {})
+        return [
+            f.name for f in self._meta.concrete_fields
+            if f.attname in leido and f.name != 'version' and getattr(self, f.attname) != leido[f.attname]
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding or kwargs.get('force_insert'):
+            super().save(*args, **kwargs)
+            self._leido = self._valores_actuales()
+            return
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and hasattr(self, '_leido'):
+            # Los auto_now cambian en cada guardado aunque nadie los toque
+            update_fields = self.campos_cambiados() + [
+                f.name for f in self._meta.concrete_fields if getattr(f, 'auto_now', False)
+            ]
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'version'}
+
+        self._version_leida = self.version
+        self.version += 1
+        try:
+            super().save(*args, **kwargs)
+        except RegistroDesactualizado:
+            self.version = self._version_leida
+            raise
+        self._leido = self._valores_actuales()
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        actualizado = super()._do_update(
+            base_qs.filter(version=self._version_leida), using, pk_val, values, update_fields, forced_update
+        )
+        if not actualizado:
+            raise RegistroDesactualizado(
+                f"{self._meta.verbose_name} {pk_val} cambió o se eliminó desde que se leyó (versión {self._version_leida})."
+            )
+        return actualizado
 
 
 # Crear Empresas.
@@ -10,6 +82,11 @@ class Empresa(models.Model):
     telefono = models.CharField(max_length=20, blank=True, null=True)
     activo = models.BooleanField(default=True)  # Para desactivar clientes que no pagan
     creado_el = models.DateTimeField(auto_now_add=True)
+    # Dueños con acceso a la empresa además de su propio perfil (ej: varios salones)
+    duenos = models.ManyToManyField(User, blank=True, related_name='empresas_a_cargo', verbose_name="Dueños")
+    # Página pública de reservas: /reservar/<slug>/ (solo si reserva_online está activa)
+    slug = models.SlugField(max_length=60, unique=True, null=True, blank=True)
+    reserva_online = models.BooleanField(default=False, verbose_name="Reservas online")
 
     def __str__(self):
         return self.nombre
@@ -33,6 +110,7 @@ class Profesional(models.Model):
         default=50,
         verbose_name="Porcentaje de Comisión (%)"
     )
+    actualizado_el = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.nombre} {self.apellido} ({self.empresa.nombre})"
@@ -59,6 +137,7 @@ class Cliente(models.Model):
     apellido = models.CharField(max_length=100)
     telefono = models.CharField(max_length=20)
     email = models.EmailField(blank=True, null=True)
+    actualizado_el = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
@@ -83,6 +162,7 @@ class Servicio(models.Model):
     descripcion = models.TextField(blank=True, null=True)
     precio_estimado = models.DecimalField(max_digits=10, decimal_places=0)
     duracion_minutos = models.PositiveIntegerField(default=30)
+    actualizado_el = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.nombre} - {self.precio_estimado} Gs"
@@ -95,7 +175,7 @@ class Servicio(models.Model):
         ordering = ['nombre']
 
 
-class Cita(models.Model):
+class Cita(ConVersion):
     METODOS_PAGO = [
         ('EFECTIVO', 'Efectivo'),
         ('TRANSFERENCIA', 'Transferencia / QR'),
@@ -120,12 +200,15 @@ class Cita(models.Model):
             ('PENDIENTE', 'Pendiente'),
             ('CONFIRMADO', 'Confirmado'),
             ('REALIZADO', 'Realizado'),
-            ('CANCELADO', 'Cancelado')
+            ('CANCELADO', 'Cancelado'),
+            ('NO_ASISTIO', 'No asistió'),
+            ('VENCIDO', 'Vencida sin cerrar'),
         ],
         default='PENDIENTE'
     )
     metodo_pago = models.CharField(max_length=20, choices=METODOS_PAGO, default='EFECTIVO')
     notas_adicionales = models.TextField(blank=True, null=True, verbose_name="Detalles / Adicionales")
+    actualizado_el = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Cita: {self.cliente} - {self.fecha} {self.hora}"
@@ -135,6 +218,50 @@ class Cita(models.Model):
             self.monto_cobrado = self.servicio.precio_estimado
         super().save(*args, **kwargs)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'fecha']),
+            # Orden por defecto del listado del admin (todas las empresas)
+            models.Index(fields=['-fecha', 'hora'], name='cita_fecha_hora'),
+            # Paginado por cursor de la API (empresa, id > cursor)
+            models.Index(fields=['empresa', 'id'], name='cita_empresa_id'),
+            # Parcial: solo las citas activas, que son las que recorren la agenda y el barrido de vencidas
+            models.Index(
+                fields=['empresa', 'fecha'],
+                condition=models.Q(estado__in=['PENDIENTE', 'CONFIRMADO']),
+                name='cita_activa_empresa_fecha',
+            ),
+        ]
+
+
+# Citas cerradas (REALIZADO/CANCELADO/NO_ASISTIO/VENCIDO) antiguas, movidas por el comando archivar_citas.
+# Conserva el mismo id que tenían en Cita; la tabla activa queda chica y rápida.
+class CitaHistorica(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="citas_historicas")
+
+    cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, related_name='citas_historicas')
+    profesional = models.ForeignKey(Profesional, on_delete=models.PROTECT, related_name='citas_historicas')
+    servicio = models.ForeignKey(Servicio, on_delete=models.PROTECT, related_name='citas_historicas')
+
+    fecha = models.DateField()
+    hora = models.TimeField()
+    monto_cobrado = models.DecimalField(max_digits=10, decimal_places=0, null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=Cita._meta.get_field('estado').choices)
+    metodo_pago = models.CharField(max_length=20, choices=Cita.METODOS_PAGO)
+    notas_adicionales = models.TextField(blank=True, null=True, verbose_name="Detalles / Adicionales")
+    actualizado_el = models.DateTimeField()
+    archivado_el = models.DateTimeField()
+
+    def __str__(self):
+        return f"Cita archivada: {self.cliente} - {self.fecha} {self.hora}"
+
+    class Meta:
+        verbose_name = "Cita Histórica"
+        verbose_name_plural = "Citas Históricas"
+        indexes = [models.Index(fields=['empresa', 'fecha'])]
+
 
 class HorarioAtencion(models.Model):
 
@@ -159,6 +286,48 @@ class HorarioAtencion(models.Model):
         unique_together = [['empresa', 'dia_semana']]
 
 
+# Turnos semanales de cada profesional. Un corte (ej: almuerzo) son dos turnos el mismo día.
+# Un profesional sin ningún turno cargado trabaja en todo el horario de atención del salón.
+class TurnoProfesional(models.Model):
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="turnos")
+    profesional = models.ForeignKey(Profesional, on_delete=models.CASCADE, related_name='turnos')
+    dia_semana = models.IntegerField(choices=HorarioAtencion.DIAS_SEMANA)
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+
+    def __str__(self):
+        return f"{self.profesional} - {self.get_dia_semana_display()} {self.hora_inicio:%H:%M} a {self.hora_fin:%H:%M}"
+
+    class Meta:
+        verbose_name = "Turno de Profesional"
+        verbose_name_plural = "Turnos de Profesionales"
+        ordering = ['dia_semana', 'hora_inicio']
+        indexes = [models.Index(fields=['empresa', 'dia_semana'])]
+
+
+# Vacaciones, licencias, trámites: días (o un rango de horas de un día) en que no atiende.
+class AusenciaProfesional(models.Model):
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="ausencias")
+    profesional = models.ForeignKey(Profesional, on_delete=models.CASCADE, related_name='ausencias')
+    fecha_desde = models.DateField()
+    fecha_hasta = models.DateField()
+    # Vacías = todo el día
+    hora_desde = models.TimeField(null=True, blank=True)
+    hora_hasta = models.TimeField(null=True, blank=True)
+    motivo = models.CharField(max_length=100, blank=True)
+
+    def __str__(self):
+        return f"{self.profesional} - {self.fecha_desde:%d/%m} a {self.fecha_hasta:%d/%m} {self.motivo}"
+
+    class Meta:
+        verbose_name = "Ausencia de Profesional"
+        verbose_name_plural = "Ausencias de Profesionales"
+        ordering = ['fecha_desde']
+        indexes = [models.Index(fields=['empresa', 'fecha_hasta'])]
+
+
 class CategoriaGasto(models.Model):
 
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="categorias_gasto")
@@ -174,7 +343,7 @@ class CategoriaGasto(models.Model):
         unique_together = [['empresa', 'nombre']]
 
 
-class Gasto(models.Model):
+class Gasto(ConVersion):
 
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="gastos")
 
@@ -182,9 +351,325 @@ class Gasto(models.Model):
     monto = models.DecimalField(max_digits=10, decimal_places=0)
     fecha = models.DateField(default=date.today)
     categoria = models.ForeignKey(CategoriaGasto, on_delete=models.PROTECT)
+    actualizado_el = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.descripcion} - {self.monto} Gs."
 
     class Meta:
-        ordering = ['-fecha', '-id']
\ No newline at end of file
+        ordering = ['-fecha', '-id']
+
+
+# Última modificación de cada tipo de dato por empresa.
+# Las vistas la consultan (una fila por modelo) para responder 304 sin armar la página.
+class MarcaCambio(models.Model):
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="marcas_cambio")
+
+    modelo = models.CharField(max_length=50)
+    actualizado_el = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.empresa} - {self.modelo}: {self.actualizado_el}"
+
+    class Meta:
+        unique_together = [['empresa', 'modelo']]
+
+
+# Registro de solo inserción de los cambios en citas (feed para sincronizar clientes).
+# El id autoincremental hace de cursor: cada cliente pide "lo que vino después de N".
+class CambioCita(models.Model):
+    TIPOS = [
+        ('CREADA', 'Creada'),
+        ('MODIFICADA', 'Modificada'),
+        ('ESTADO', 'Cambio de estado'),
+    ]
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="cambios_citas")
+    # Sin restricción de FK: el registro se conserva aunque la cita se borre
+    cita = models.ForeignKey(Cita, on_delete=models.DO_NOTHING, db_constraint=False, related_name='cambios')
+    profesional = models.ForeignKey(Profesional, on_delete=models.CASCADE, related_name='cambios_citas')
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    # Foto de la cita en el momento del cambio, tal como se envía al cliente
+    datos = models.JSONField()
+    creado_el = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - cita {self.cita_id}"
+
+    class Meta:
+        indexes = [models.Index(fields=['empresa', 'id'])]
+
+
+# Cubo mensual pre-agregado para el estado de resultados (P&L).
+# Una fila por empresa, mes y valor de cada dimensión; se recalcula solo el mes que cambió.
+class ResumenMensual(models.Model):
+    DIMENSIONES = [
+        ('servicio', 'Ingresos por servicio'),
+        ('metodo_pago', 'Ingresos por método de pago'),
+        ('categoria', 'Gastos por categoría'),
+    ]
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="resumenes_mensuales")
+
+    mes = models.DateField()  # Primer día del mes
+    dimension = models.CharField(max_length=20, choices=DIMENSIONES)
+    clave = models.CharField(max_length=50)
+    etiqueta = models.CharField(max_length=100)
+    total = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    cantidad = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.mes:%m/%Y} {self.dimension} {self.etiqueta}: {self.total}"
+
+    class Meta:
+        unique_together = [['empresa', 'mes', 'dimension', 'clave']]
+
+
+# Meses con movimientos nuevos que el cubo todavía no refleja
+class MesPendiente(models.Model):
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="meses_pendientes")
+
+    mes = models.DateField()
+
+    class Meta:
+        unique_together = [['empresa', 'mes']]
+
+
+# Resumen por cliente (recencia, frecuencia y monto) que se ajusta al cobrar o cancelar
+# una cita. Permite ordenar y filtrar el directorio sin recorrer el historial.
+class EstadisticaCliente(models.Model):
+
+    cliente = models.OneToOneField(Cliente, on_delete=models.CASCADE, primary_key=True, related_name='estadistica')
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="estadisticas_clientes")
+
+    primera_visita = models.DateField(null=True, blank=True)
+    ultima_visita = models.DateField(null=True, blank=True)
+    visitas = models.PositiveIntegerField(default=0)
+    total_gastado = models.DecimalField(max_digits=14, decimal_places=0, default=0)
+    cancelaciones = models.PositiveIntegerField(default=0)  # Canceladas o sin asistencia
+
+    def __str__(self):
+        return f"{self.cliente}: {self.visitas} visitas, {self.total_gastado} Gs."
+
+    @property
+    def ticket_promedio(self):
+        return round(self.total_gastado / self.visitas) if self.visitas else 0
+
+    class Meta:
+        verbose_name = "Estadística de Cliente"
+        verbose_name_plural = "Estadísticas de Clientes"
+        indexes = [
+            models.Index(fields=['empresa', 'ultima_visita']),
+            models.Index(fields=['empresa', 'total_gastado']),
+        ]
+
+
+# Cola de tareas en segundo plano guardada en la base (sin servicios externos).
+# Las vistas encolan el trabajo lento y el comando procesar_tareas lo ejecuta.
+class Tarea(models.Model):
+    ESTADOS = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_CURSO', 'En curso'),
+        ('HECHA', 'Hecha'),
+        ('FALLIDA', 'Fallida'),
+    ]
+
+    # Ruta importable de la función, ej: "core.tareas.subir_imagen_profesional"
+    funcion = models.CharField(max_length=200)
+    argumentos = models.JSONField(default=dict)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='PENDIENTE')
+
+    ejecutar_desde = models.DateTimeField(default=timezone.now)
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=3)
+    error = models.TextField(blank=True)
+
+    creado_el = models.DateTimeField(auto_now_add=True)
+    iniciada_el = models.DateTimeField(null=True, blank=True)
+    terminada_el = models.DateTimeField(null=True, blank=True)
+    espera_ms = models.PositiveIntegerField(null=True, blank=True)    # De ejecutar_desde al inicio
+    duracion_ms = models.PositiveIntegerField(null=True, blank=True)  # Del último intento
+
+    def __str__(self):
+        return f"{self.funcion} [{self.estado}]"
+
+    class Meta:
+        indexes = [models.Index(fields=['estado', 'ejecutar_desde'])]
+
+
+# Bandeja de salida de correos a clientes. Las vistas la escriben en la misma transacción
+# que la cita; el comando enviar_correos la vacía por lotes, fuera del request.
+class CorreoSaliente(models.Model):
+    TIPOS = [
+        ('CONFIRMACION', 'Confirmación de reserva'),
+        ('MODIFICACION', 'Cambio de horario'),
+        ('RECORDATORIO', 'Recordatorio'),
+        ('CANCELACION', 'Cancelación'),
+        ('LUGAR_LIBRE', 'Lugar libre (lista de espera)'),
+    ]
+    ESTADOS = [
+        ('PENDIENTE', 'Pendiente'),
+        ('ENVIADO', 'Enviado'),
+        ('FALLIDO', 'Fallido'),
+    ]
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="correos")
+    # Sin restricción de FK: archivar_citas borra citas con SQL directo y el aviso queda en la bandeja
+    cita = models.ForeignKey(
+        Cita, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='correos'
+    )
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    # Evita mandar dos veces el mismo aviso (ej: "CONFIRMACION:15:2025-03-01:10:00")
+    clave = models.CharField(max_length=120, unique=True)
+    remitente = models.CharField(max_length=200)
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=200)
+    cuerpo = models.TextField()
+
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='PENDIENTE')
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)
+    creado_el = models.DateTimeField(auto_now_add=True)
+    enviado_el = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} a {self.destinatario} [{self.estado}]"
+
+    class Meta:
+        verbose_name = "Correo Saliente"
+        verbose_name_plural = "Correos Salientes"
+        indexes = [models.Index(fields=['estado', 'proximo_intento'])]
+
+
+# Pares de clientes que parecen la misma persona (C.I. mal cargada, cargados dos veces).
+# Los detecta el comando buscar_clientes_duplicados; el dueño los fusiona o los descarta.
+class DuplicadoCliente(models.Model):
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="duplicados_clientes")
+    # Siempre cliente.id < otro.id, para no guardar el mismo par dos veces
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='+')
+    otro = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='+')
+
+    puntaje = models.FloatField()
+    motivos = models.CharField(max_length=200)
+    descartado = models.BooleanField(default=False)  # "No son la misma persona": no se vuelve a sugerir
+    creado_el = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.cliente_id} ~ {self.otro_id} ({self.puntaje:.2f})"
+
+    @property
+    def opciones(self):
+        """(el que se conserva, el que se fusiona) para cada elección posible."""
+        return [(self.cliente, self.otro), (self.otro, self.cliente)]
+
+    class Meta:
+        unique_together = [['cliente', 'otro']]
+        indexes = [models.Index(fields=['empresa', 'descartado', '-puntaje'])]
+
+
+# Lista de espera: clientes que quieren un turno antes del que consiguieron (o que no
+# consiguieron ninguno). Cuando una cita se cancela o se mueve, el horario liberado se
+# compara con las esperas vigentes de esa fecha.
+class EsperaCita(models.Model):
+    ESTADOS = [
+        ('ESPERANDO', 'Esperando'),
+        ('AVISADO', 'Avisado'),
+        ('AGENDADO', 'Agendado'),
+        ('BAJA', 'Dado de baja'),
+    ]
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="esperas")
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='esperas')
+    servicio = models.ForeignKey(Servicio, on_delete=models.CASCADE, related_name='esperas')
+    # Vacío = le sirve cualquier profesional
+    profesionales = models.ManyToManyField(Profesional, blank=True, related_name='esperas')
+
+    fecha_desde = models.DateField()
+    fecha_hasta = models.DateField()
+    hora_desde = models.TimeField(null=True, blank=True)
+    hora_hasta = models.TimeField(null=True, blank=True)
+    notas = models.CharField(max_length=200, blank=True)
+
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='ESPERANDO')
+    avisado_el = models.DateTimeField(null=True, blank=True)
+    creado_el = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.cliente} - {self.servicio} ({self.fecha_desde:%d/%m} a {self.fecha_hasta:%d/%m})"
+
+    class Meta:
+        verbose_name = "Espera de Cita"
+        verbose_name_plural = "Lista de Espera"
+        indexes = [
+            # Parcial: solo las esperas vigentes, que son las que se cruzan con cada cancelación
+            models.Index(
+                fields=['empresa', 'fecha_desde', 'fecha_hasta'],
+                condition=models.Q(estado__in=['ESPERANDO', 'AVISADO']),
+                name='espera_vigente_fechas',
+            ),
+        ]
+
+
+# Reglas de comisión: porcentaje por profesional y/o servicio, con escalones según lo
+# facturado en el mes. Sin reglas que apliquen se usa Profesional.porcentaje_comision.
+class ReglaComision(models.Model):
+
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="reglas_comision")
+    # Vacío = vale para todos los profesionales / todos los servicios
+    profesional = models.ForeignKey(Profesional, on_delete=models.CASCADE, null=True, blank=True,
+                                    related_name='reglas_comision')
+    servicio = models.ForeignKey(Servicio, on_delete=models.CASCADE, null=True, blank=True,
+                                 related_name='reglas_comision')
+
+    # Escalón: rige desde que el profesional facturó este monto en el mes (0 = desde el inicio)
+    desde_monto = models.DecimalField(max_digits=12, decimal_places=0, default=0,
+                                      verbose_name="Desde lo facturado en el mes (Gs.)")
+    porcentaje = models.DecimalField(max_digits=5, decimal_places=2, verbose_name="Porcentaje (%)")
+
+    def __str__(self):
+        profesional = self.profesional or "Todos"
+        servicio = self.servicio or "todos los servicios"
+        return f"{profesional} / {servicio} desde {self.desde_monto}: {self.porcentaje}%"
+
+    @property
+    def especificidad(self):
+        """Profesional y servicio > solo profesional > solo servicio > general."""
+        return 2 * (self.profesional_id is not None) + (self.servicio_id is not None)
+
+    class Meta:
+        verbose_name = "Regla de Comisión"
+        verbose_name_plural = "Reglas de Comisión"
+        unique_together = [['empresa', 'profesional', 'servicio', 'desde_monto']]
+
+
+# Punto de control de la corrida nocturna: un registro por noche, empresa y trabajo.
+# Si la corrida se corta, al relanzarla se saltan los trabajos que ya quedaron HECHOS.
+class EjecucionNocturna(models.Model):
+    ESTADOS = [
+        ('HECHO', 'Hecho'),
+        ('FALLIDO', 'Fallido'),
+    ]
+
+    fecha = models.DateField()  # Día que se cierra (por defecto, ayer)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name="ejecuciones_nocturnas")
+    trabajo = models.CharField(max_length=50)
+    estado = models.CharField(max_length=20, choices=ESTADOS)
+    intentos = models.PositiveIntegerField(default=1)
+    duracion_ms = models.PositiveIntegerField()
+    resultado = models.JSONField(default=dict, blank=True)  # Métricas del trabajo (uso, caja del día...)
+    error = models.TextField(blank=True)
+    terminado_el = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.fecha} {self.trabajo} - {self.empresa_id} [{self.estado}]"
+
+    class Meta:
+        verbose_name = "Ejecución Nocturna"
+        verbose_name_plural = "Ejecuciones Nocturnas"
+        unique_together = [['fecha', 'empresa', 'trabajo']]
@@ -0,0 +1,197 @@
+import logging
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import django
+from django.db import close_old_connections, connections
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .archivo import citas_en_rango
+from .duplicados import buscar_duplicados, guardar_duplicados
+from .estadisticas import recalcular_empresa
+from .models import Cita, Cliente, CorreoSaliente, EjecucionNocturna, Empresa, Gasto, Profesional
+from .transiciones import vencer_lote
+
+logger = logging.getLogger(__name__)
+
+LOTE_VENCER = 500
+
+
+# --- Trabajos ---
+# Cada uno recibe (empresa_id, fecha del día que se cierra), trabaja sobre una sola
+# empresa y devuelve un dict que queda en EjecucionNocturna.resultado.
+
+def vencer_citas(empresa_id, fecha):
+    """Pasa a VENCIDO las citas activas anteriores al día que se cierra."""
+    total = 0
+    while True:
+        movidas = vencer_lote(empresa_id, fecha, LOTE_VENCER)
+        total += movidas
+        if movidas < LOTE_VENCER:
+            return {'vencidas': total}
+
+
+def estadisticas_clientes(empresa_id, fecha):
+    return {'clientes': recalcular_empresa(empresa_id)}
+
+
+def resumen_caja(empresa_id, fecha):
+    """Caja del día con los mismos criterios que reporte_caja: ingresos por método de pago, gastos y saldo."""
+    por_metodo = {}
+    for qs in citas_en_rango(empresa_id, fecha, fecha, estado='REALIZADO'):
+        for metodo, monto in qs.values_list('metodo_pago').annotate(total=Sum('monto_cobrado')).order_by():
+            por_metodo[metodo] = por_metodo.get(metodo, 0) + int(monto or 0)
+    ingresos = sum(por_metodo.values())
+    gastos = int(Gasto.objects.filter(empresa_id=empresa_id, fecha=fecha).aggregate(total=Sum('monto'))['total'] or 0)
+    return {
+        'ingresos': ingresos,
+        'ingresos_por_metodo': por_metodo,
+        'gastos': gastos,
+        'saldo': ingresos - gastos,
+        'caja_fisica': por_metodo.get('EFECTIVO', 0) - gastos,
+    }
+
+
+def metricas_uso(empresa_id, fecha):
+    """Uso de la plataforma en el día, para la facturación y el seguimiento de cada salón."""
+    citas = Cita.objects.filter(empresa_id=empresa_id, fecha=fecha).aggregate(
+        citas=Count('id'),
+        realizadas=Count('id', filter=Q(estado='REALIZADO')),
+        canceladas=Count('id', filter=Q(estado='CANCELADO')),
+        profesionales_activos=Count('profesional_id', distinct=True),
+    )
+    return {
+        **citas,
+        'clientes': Cliente.objects.filter(empresa_id=empresa_id).count(),
+        'profesionales': Profesional.objects.filter(empresa_id=empresa_id).count(),
+        'usuarios': Profesional.objects.filter(empresa_id=empresa_id, usuario__isnull=False).count(),
+        'correos_enviados': CorreoSaliente.objects.filter(
+            empresa_id=empresa_id, estado='ENVIADO', enviado_el__date=fecha
+        ).count(),
+    }
+
+
+def clientes_duplicados(empresa_id, fecha):
+    return {'pares': guardar_duplicados(empresa_id, buscar_duplicados(empresa_id))}
+
+
+# En el orden en que se corren para cada empresa (primero se vence, después se cuenta)
+TRABAJOS = {
+    'vencer_citas': vencer_citas,
+    'estadisticas_clientes': estadisticas_clientes,
+    'resumen_caja': resumen_caja,
+    'metricas_uso': metricas_uso,
+    'clientes_duplicados': clientes_duplicados,
+}
+
+
+# --- Corrida ---
+
+def _guardar_punto(empresa_id, fecha, trabajo, estado, duracion_ms, resultado, error):
+    """Punto de control del trabajo: lo que quedó HECHO no se repite al relanzar la corrida."""
+    campos = {
+        'estado': estado, 'duracion_ms': duracion_ms, 'resultado': resultado,
+        'error': error, 'terminado_el': timezone.now(),
+    }
+    actualizados = EjecucionNocturna.objects.filter(fecha=fecha, empresa_id=empresa_id, trabajo=trabajo).update(
+        intentos=F('intentos') + 1, **campos
+    )
+    if not actualizados:
+        EjecucionNocturna.objects.create(fecha=fecha, empresa_id=empresa_id, trabajo=trabajo, **campos)
+
+
+def procesar_empresa(empresa_id, fecha, trabajos):
+    """
+    Corre los `trabajos` de una empresa, uno tras otro y cada uno aislado: si uno
+    falla se registra y se sigue con el próximo. Devuelve (empresa_id, duración en ms,
+    [(trabajo, estado, duración en ms, resultado o error)]).
+    """
+    # Si el error anterior dejó la conexión inservible, se abre una nueva
+    close_old_connections()
+    inicio_empresa = time.monotonic()
+    detalle = []
+    for trabajo in trabajos:
+        inicio = time.monotonic()
+        try:
+            resultado = TRABAJOS[trabajo](empresa_id, fecha) or {}
+        except Exception:
+            estado, resultado, error = 'FALLIDO', {}, traceback.format_exc()
+            logger.warning("Trabajo nocturno %s falló en la empresa %s", trabajo, empresa_id)
+        else:
+            estado, error = 'HECHO', ''
+        duracion_ms = int((time.monotonic() - inicio) * 1000)
+        close_old_connections()
+        _guardar_punto(empresa_id, fecha, trabajo, estado, duracion_ms, resultado, error)
+        detalle.append((trabajo, estado, duracion_ms, resultado if estado == 'HECHO' else error.strip().splitlines()[-1]))
+    return empresa_id, int((time.monotonic() - inicio_empresa) * 1000), detalle
+
+
+def pendientes(fecha, trabajos, empresa_id=None, forzar=False):
+    """
+    {empresa_id: [trabajos por hacer]} de las empresas activas, de la más grande a la
+    más chica (así la más pesada no queda para el final con los demás procesos ociosos).
+    Sin `forzar`, se saltan los trabajos que ya quedaron HECHOS para esa fecha.
+    """
+    empresas = Empresa.objects.filter(activo=True)
+    if empresa_id:
+        empresas = empresas.filter(pk=empresa_id)
+    ids = list(
+        empresas.annotate(tamano=Count('clientes')).order_by('-tamano', 'id').values_list('id', flat=True)
+    )
+
+    hechos = set()
+    if not forzar:
+        hechos = set(
+            EjecucionNocturna.objects.filter(fecha=fecha, empresa_id__in=ids, estado='HECHO')
+            .values_list('empresa_id', 'trabajo')
+        )
+    por_empresa = {}
+    for id_empresa in ids:
+        faltan = [t for t in trabajos if (id_empresa, t) not in hechos]
+        if faltan:
+            por_empresa[id_empresa] = faltan
+    return por_empresa
+
+
+def correr(fecha, por_empresa, procesos):
+    """
+    Reparte las empresas entre `procesos` procesos (una tarea por empresa, el pool
+    las va asignando a medida que se liberan) y devuelve los resultados a medida
+    que terminan. Si un proceso se cae, sus empresas se informan con el error y
+    quedan pendientes para la próxima corrida.
+    """
+    if procesos <= 1:
+        for empresa_id, trabajos in por_empresa.items():
+            yield procesar_empresa(empresa_id, fecha, trabajos)
+        return
+
+    # Cada proceso arranca Django de cero (spawn) y lee la configuración de nuevo:
+    # sin pool de conexiones, así cada uno usa una sola conexión propia
+    pool_anterior = os.environ.get('DB_POOL')
+    os.environ['DB_POOL'] = ''
+    # No se le pasa a nadie una conexión abierta del proceso principal
+    connections.close_all()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=procesos, mp_context=get_context('spawn'), initializer=django.setup
+        ) as pool:
+            futuros = {
+                pool.submit(procesar_empresa, empresa_id, fecha, trabajos): (empresa_id, trabajos)
+                for empresa_id, trabajos in por_empresa.items()
+            }
+            for futuro in as_completed(futuros):
+                try:
+                    yield futuro.result()
+                except Exception as e:
+                    empresa_id, trabajos = futuros[futuro]
+                    logger.error("La empresa %s no terminó la corrida nocturna: %s", empresa_id, e)
+                    yield empresa_id, 0, [(t, 'FALLIDO', 0, f"{type(e).__name__}: {e}") for t in trabajos]
+    finally:
+        if pool_anterior is None:
+            os.environ.pop('DB_POOL', None)
+        else:
+            os.environ['DB_POOL'] = pool_anterior
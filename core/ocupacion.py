@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+
+from .archivo import citas_en_rango
+from .cache_empresa import version
+from .models import HorarioAtencion, Profesional
+
+CACHE_SEGUNDOS = 600
+
+# Con rangos más largos la tabla día a día no se muestra (solo los agregados)
+MAX_DIAS_DETALLE = 31
+
+ESTADOS_OCUPADOS = ['PENDIENTE', 'CONFIRMADO', 'REALIZADO']
+NOMBRES_DIAS = [nombre for _, nombre in HorarioAtencion.DIAS_SEMANA]
+HORAS = np.arange(24)
+
+
+def _minutos_abiertos_por_hora(empresa):
+    """Matriz 7x24: minutos que el salón está abierto en cada hora de cada día de la semana."""
+    abiertos = np.zeros((7, 24), dtype=np.int64)
+    for h in HorarioAtencion.objects.filter(empresa=empresa, abierto=True):
+        inicio = h.hora_inicio.hour * 60 + h.hora_inicio.minute
+        fin = h.hora_fin.hour * 60 + h.hora_fin.minute
+        abiertos[h.dia_semana] = np.clip(np.minimum(fin, (HORAS + 1) * 60) - np.maximum(inicio, HORAS * 60), 0, 60)
+    return abiertos
+
+
+def _porcentaje(ocupado, disponible):
+    return np.divide(ocupado * 100.0, disponible, out=np.zeros(ocupado.shape), where=disponible > 0)
+
+
+def _celda(porcentaje):
+    # Opacidad ya formateada: el separador decimal local (coma) rompería el CSS
+    return {'valor': int(round(porcentaje)), 'alpha': f"{min(porcentaje, 100) / 100:.2f}"}
+
+
+def calcular_ocupacion(empresa, fecha_inicio, fecha_fin):
+    """
+    Minutos reservados (duración del servicio) contra minutos abiertos del salón,
+    por profesional, por día y por hora. Trae las citas del período en una sola
+    pasada como arreglos y hace todas las cuentas con NumPy.
+    """
+    profesionales = list(Profesional.objects.filter(empresa=empresa).values_list('id', 'nombre', 'apellido'))
+    indice_prof = {pk: i for i, (pk, _, _) in enumerate(profesionales)}
+    n_prof = len(profesionales)
+    n_dias = (fecha_fin - fecha_inicio).days + 1
+
+    filas = []
+    for qs in citas_en_rango(empresa, fecha_inicio, fecha_fin, estado__in=ESTADOS_OCUPADOS):
+        filas.extend(qs.values_list('profesional_id', 'fecha', 'hora', 'servicio__duracion_minutos'))
+
+    # --- Arreglos compactos: una posición por cita ---
+    filas = [f for f in filas if f[0] in indice_prof]
+    prof = np.fromiter((indice_prof[f[0]] for f in filas), dtype=np.int64, count=len(filas))
+    dia = np.fromiter(((f[1] - fecha_inicio).days for f in filas), dtype=np.int64, count=len(filas))
+    inicio = np.fromiter((f[2].hour * 60 + f[2].minute for f in filas), dtype=np.int64, count=len(filas))
+    duracion = np.fromiter((f[3] or 0 for f in filas), dtype=np.int64, count=len(filas))
+    fin = inicio + duracion
+
+    # Día de la semana de cada día del período y de cada cita
+    dia_semana_periodo = (fecha_inicio.weekday() + np.arange(n_dias)) % 7
+    dia_semana = dia_semana_periodo[dia]
+
+    # Minutos de cada cita que caen en cada hora del día (N x 24)
+    por_hora = np.clip(np.minimum(fin[:, None], (HORAS + 1) * 60) - np.maximum(inicio[:, None], HORAS * 60), 0, 60)
+
+    # --- Disponibilidad ---
+    abiertos_hora = _minutos_abiertos_por_hora(empresa)               # 7 x 24
+    abiertos_dia = abiertos_hora.sum(axis=1)[dia_semana_periodo]        # n_dias
+    dias_por_semana = np.bincount(dia_semana_periodo, minlength=7)      # cuántos lunes, martes... hay
+
+    # --- Reservado ---
+    reservado_prof_dia = np.zeros((n_prof, n_dias), dtype=np.int64)
+    np.add.at(reservado_prof_dia, (prof, dia), duracion)
+
+    reservado_prof_hora = np.zeros((n_prof, 24), dtype=np.int64)
+    np.add.at(reservado_prof_hora, prof, por_hora)
+
+    reservado_semana_hora = np.zeros((7, 24), dtype=np.int64)
+    np.add.at(reservado_semana_hora, dia_semana, por_hora)
+
+    # --- Porcentajes ---
+    disponible_prof = abiertos_dia.sum()
+    ocupacion_prof = _porcentaje(reservado_prof_dia.sum(axis=1), np.full(n_prof, disponible_prof))
+    ocupacion_prof_dia = _porcentaje(reservado_prof_dia, np.broadcast_to(abiertos_dia, (n_prof, n_dias)))
+
+    disponible_prof_hora = (abiertos_hora * dias_por_semana[:, None]).sum(axis=0)   # 24
+    ocupacion_prof_hora = _porcentaje(reservado_prof_hora, np.broadcast_to(disponible_prof_hora, (n_prof, 24)))
+
+    disponible_semana_hora = abiertos_hora * dias_por_semana[:, None] * max(n_prof, 1)
+    ocupacion_semana_hora = _porcentaje(reservado_semana_hora, disponible_semana_hora)
+
+    # Solo las horas en que el salón abre algún día
+    horas_visibles = [int(h) for h in HORAS if abiertos_hora[:, h].any()]
+
+    resultado = {
+        'horas': horas_visibles,
+        'profesionales': [
+            {
+                'nombre': f"{nombre} {apellido}",
+                'horas_reservadas': round(reservado_prof_dia[i].sum() / 60, 1),
+                'horas_disponibles': round(disponible_prof / 60, 1),
+                'ocupacion': round(float(ocupacion_prof[i]), 1),
+                'por_hora': [_celda(ocupacion_prof_hora[i, h]) for h in horas_visibles],
+                'por_dia': (
+                    [_celda(ocupacion_prof_dia[i, d]) for d in range(n_dias)]
+                    if n_dias <= MAX_DIAS_DETALLE else []
+                ),
+            }
+            for i, (_, nombre, apellido) in enumerate(profesionales)
+        ],
+        'mapa_semana': [
+            {'dia': NOMBRES_DIAS[d], 'celdas': [_celda(ocupacion_semana_hora[d, h]) for h in horas_visibles]}
+            for d in range(7) if abiertos_hora[d].any()
+        ],
+        'dias': (
+            [fecha_inicio + timedelta(days=d) for d in range(n_dias)]
+            if n_dias <= MAX_DIAS_DETALLE else []
+        ),
+        'ocupacion_total': round(float(_porcentaje(
+            np.array([reservado_prof_dia.sum()]), np.array([disponible_prof * n_prof])
+        )[0]), 1),
+        'total_citas': len(filas),
+    }
+    return resultado
+
+
+def ocupacion_periodo(empresa, fecha_inicio, fecha_fin):
+    """calcular_ocupacion() cacheado por período, hasta que cambie la agenda."""
+    clave = f"ocupacion:{empresa.pk}:{fecha_inicio}:{fecha_fin}:{version(empresa.pk, 'agenda')}"
+    resultado = cache.get(clave)
+    if resultado is None:
+        resultado = calcular_ocupacion(empresa, fecha_inicio, fecha_fin)
+        cache.set(clave, resultado, CACHE_SEGUNDOS)
+    return resultado
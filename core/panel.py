@@ -0,0 +1,92 @@
+from datetime import date
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from .models import Cita, CitaHistorica, Empresa, Gasto
+from .resultados import inicio_mes
+
+# Tablero de consulta: un minuto de atraso es aceptable y evita repetir
+# las consultas agrupadas en cada recarga.
+CACHE_SEGUNDOS = 60
+
+
+def empresas_del_usuario(usuario):
+    """Empresas activas que el usuario dirige o en las que trabaja."""
+    return (
+        Empresa.objects.filter(Q(duenos=usuario) | Q(profesionales__usuario=usuario), activo=True)
+        .distinct()
+        .order_by('nombre')
+    )
+
+
+def _por_empresa(consulta):
+    return {fila.pop('empresa_id'): fila for fila in consulta}
+
+
+def resumen_empresas(empresas, hoy=None):
+    """
+    Indicadores del día y del mes de cada empresa, uno al lado del otro.
+    Son tres consultas agrupadas por empresa (citas, archivo, gastos) sin importar
+    cuántos salones sean. Devuelve una fila por empresa en el orden recibido.
+    """
+    hoy = hoy or date.today()
+    ids = sorted(e.pk for e in empresas)
+    clave = f"panel:{hoy.isoformat()}:{','.join(map(str, ids))}"
+    datos = cache.get(clave)
+
+    if datos is None:
+        desde = inicio_mes(hoy)
+        realizada = Q(estado='REALIZADO')
+
+        citas = _por_empresa(
+            Cita.objects.filter(empresa_id__in=ids, fecha__gte=desde)
+            .values('empresa_id')
+            .annotate(
+                citas_hoy=Count('id', filter=Q(fecha=hoy) & ~Q(estado='CANCELADO')),
+                pendientes_hoy=Count('id', filter=Q(fecha=hoy, estado='PENDIENTE')),
+                # Por confirmar de acá en adelante (lo que hay que llamar)
+                pendientes=Count('id', filter=Q(fecha__gte=hoy, estado='PENDIENTE')),
+                ingresos_hoy=Sum('monto_cobrado', filter=realizada & Q(fecha=hoy)),
+                ingresos_mes=Sum('monto_cobrado', filter=realizada & Q(fecha__lte=hoy)),
+            )
+            .order_by()
+        )
+        archivadas = _por_empresa(
+            CitaHistorica.objects.filter(empresa_id__in=ids, fecha__range=[desde, hoy], estado='REALIZADO')
+            .values('empresa_id')
+            .annotate(ingresos_mes=Sum('monto_cobrado'))
+            .order_by()
+        )
+        gastos = _por_empresa(
+            Gasto.objects.filter(empresa_id__in=ids, fecha__range=[desde, hoy])
+            .values('empresa_id')
+            .annotate(gastos_hoy=Sum('monto', filter=Q(fecha=hoy)), gastos_mes=Sum('monto'))
+            .order_by()
+        )
+
+        datos = {}
+        for empresa_id in ids:
+            c = citas.get(empresa_id, {})
+            g = gastos.get(empresa_id, {})
+            ingresos_mes = (c.get('ingresos_mes') or 0) + (archivadas.get(empresa_id, {}).get('ingresos_mes') or 0)
+            gastos_mes = g.get('gastos_mes') or 0
+            datos[empresa_id] = {
+                'citas_hoy': c.get('citas_hoy', 0),
+                'pendientes_hoy': c.get('pendientes_hoy', 0),
+                'pendientes': c.get('pendientes', 0),
+                'ingresos_hoy': c.get('ingresos_hoy') or 0,
+                'gastos_hoy': g.get('gastos_hoy') or 0,
+                'ingresos_mes': ingresos_mes,
+                'gastos_mes': gastos_mes,
+                'saldo_mes': ingresos_mes - gastos_mes,
+            }
+        cache.set(clave, datos, CACHE_SEGUNDOS)
+
+    return [{'empresa': empresa, **datos[empresa.pk]} for empresa in empresas]
+
+
+def totales(filas):
+    """Suma de todas las empresas para la fila de totales."""
+    campos = [c for c in (filas[0] if filas else {}) if c != 'empresa']
+    return {campo: sum(fila[campo] for fila in filas) for campo in campos}
@@ -0,0 +1,204 @@
+import time
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+
+from .cache_empresa import version
+from .cambios import registrar_cambio_cita
+from .correos import encolar_correos
+from .disponibilidad import inicios_libres, libres_en
+from .duplicados import normalizar_nombre, normalizar_telefono
+from .espera import marcar_agendados
+from .models import Cita, Cliente, Profesional, Servicio
+
+# La página pública recibe tráfico anónimo (un posteo en Instagram puede traer miles
+# de visitas): lo que muestra sale de la caché. El catálogo cambia poco; los horarios
+# cambian con cada cita, que corrige la disponibilidad sin cambiar su versión, por
+# eso van con un TTL corto.
+CATALOGO_SEGUNDOS = 5 * 60
+HORARIOS_SEGUNDOS = 30
+
+DIAS_RESERVA = 30
+# No se reserva online con menos de esta anticipación
+ANTICIPACION_MINUTOS = 60
+PASO_MINUTOS = 15
+
+# acción: (peticiones permitidas por IP, ventana en segundos)
+LIMITES = {
+    'ver': (120, 60),
+    'reservar': (5, 10 * 60),
+}
+
+NOTA_RESERVA = "Reserva online"
+
+
+def ip_cliente(request):
+    if settings.DETRAS_DE_PROXY:
+        # La última IP de la lista es la que agregó el proxy: las anteriores las manda el cliente
+        reenviada = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if reenviada:
+            return reenviada.split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def esperar_limite(request, accion):
+    """
+    Cuenta la petición en la ventana fija de la IP. Devuelve 0 si está dentro del
+    límite o los segundos que faltan para que la ventana se renueve.
+
+    Los contadores van a la caché 'limites', compartida por todos los workers (la
+    'default' es de cada proceso y el límite valdría por worker). Ahí incr lee y
+    escribe por separado: dos peticiones simultáneas pueden contar una sola vez.
+    """
+    contadores = caches['limites']
+    maximo, ventana = LIMITES[accion]
+    ahora = int(time.time())
+    tramo = ahora // ventana
+    clave = f"limite:{accion}:{ip_cliente(request)}:{tramo}"
+    if contadores.add(clave, 1, ventana):
+        return 0
+    try:
+        cuenta = contadores.incr(clave)
+    except ValueError:
+        # Venció justo entre el add y el incr
+        contadores.add(clave, 1, ventana)
+        return 0
+    return (tramo + 1) * ventana - ahora if cuenta > maximo else 0
+
+
+def catalogo(empresa_id):
+    """Servicios y profesionales que se muestran, cacheados hasta que cambie alguno."""
+    clave = f"reserva:catalogo:{empresa_id}:{version(empresa_id, 'disponibilidad')}"
+    datos = cache.get(clave)
+    if datos is None:
+        datos = {
+            'servicios': list(
+                Servicio.objects.filter(empresa_id=empresa_id).order_by('nombre')
+                .values('id', 'nombre', 'descripcion', 'precio_estimado', 'duracion_minutos')
+            ),
+            'profesionales': list(
+                Profesional.objects.filter(empresa_id=empresa_id).order_by('nombre')
+                .values('id', 'nombre', 'apellido', 'especialidad')
+            ),
+        }
+        cache.set(clave, datos, CATALOGO_SEGUNDOS)
+    return datos
+
+
+def fechas_reservables():
+    hoy = date.today()
+    return hoy, hoy + timedelta(days=DIAS_RESERVA)
+
+
+def _minimo_para(fecha):
+    """Primer minuto del día en que todavía se puede empezar (respetando la anticipación)."""
+    limite = datetime.now() + timedelta(minutes=ANTICIPACION_MINUTOS)
+    if fecha > limite.date():
+        return 0
+    if fecha < limite.date():
+        return 24 * 60
+    return limite.hour * 60 + limite.minute
+
+
+def horarios(empresa_id, servicio, fecha, profesional_id=None):
+    """
+    [(hora 'HH:MM', [ids de profesionales libres])] para empezar el servicio ese día,
+    con uno o con cualquiera de los profesionales. Cacheado HORARIOS_SEGUNDOS.
+    """
+    clave = (
+        f"reserva:horarios:{empresa_id}:{fecha.isoformat()}:{servicio['id']}:{profesional_id or 'todos'}:"
+        f"{version(empresa_id, 'disponibilidad')}"
+    )
+    datos = cache.get(clave)
+    if datos is None:
+        ids = [profesional_id] if profesional_id else [p['id'] for p in catalogo(empresa_id)['profesionales']]
+        minimo = _minimo_para(fecha)
+        por_hora = {}
+        for id_profesional in ids:
+            for minuto in inicios_libres(empresa_id, id_profesional, fecha, servicio['duracion_minutos'], PASO_MINUTOS):
+                if minuto >= minimo:
+                    por_hora.setdefault(minuto, []).append(id_profesional)
+        datos = [(f"{m // 60:02d}:{m % 60:02d}", por_hora[m]) for m in sorted(por_hora)]
+        cache.set(clave, datos, HORARIOS_SEGUNDOS)
+    return datos
+
+
+def _coincide(cliente, datos_cliente):
+    """Si lo que escribió el visitante es lo que ya tiene la ficha (nombre y teléfono)."""
+    return (
+        normalizar_nombre(cliente.nombre, cliente.apellido)
+        == normalizar_nombre(datos_cliente['nombre'], datos_cliente['apellido'])
+        and normalizar_telefono(cliente.telefono) == normalizar_telefono(datos_cliente['telefono'])
+    )
+
+
+def reservar(empresa, servicio, profesional_id, fecha, hora, datos_cliente):
+    """
+    Crea la cita PENDIENTE de una reserva online. Lo que vio el cliente pudo salir
+    de una caché de hace unos segundos: acá se vuelve a validar contra la base, en
+    una sola transacción y con los profesionales bloqueados (dos reservas para el
+    mismo profesional se resuelven una después de la otra). Sin `profesional_id` se
+    asigna el primero libre. ValueError si el horario ya no está disponible.
+
+    Devuelve (cita, si se mandó el aviso por email al email que escribió el visitante).
+    """
+    desde, hasta = fechas_reservables()
+    if not (desde <= fecha <= hasta) or hora.hour * 60 + hora.minute < _minimo_para(fecha):
+        raise ValueError("Ese horario ya no se puede reservar online.")
+
+    with transaction.atomic():
+        candidatos = Profesional.objects.select_for_update().filter(empresa=empresa).order_by('pk')
+        if profesional_id:
+            candidatos = candidatos.filter(pk=profesional_id)
+        ids = list(candidatos.values_list('pk', flat=True))
+
+        libres = set(libres_en(empresa.pk, fecha, hora, servicio.duracion_minutos, fresco=True))
+        elegido = next((id_profesional for id_profesional in ids if id_profesional in libres), None)
+        if elegido is None:
+            raise ValueError("Ese horario se acaba de ocupar. Elegí otro, por favor.")
+
+        # Se identifica por C.I.: si ya es cliente del salón no se tocan sus datos
+        email = datos_cliente.get('email') or None
+        cliente, nuevo = Cliente.objects.get_or_create(
+            empresa=empresa,
+            ci_ruc=datos_cliente['ci_ruc'],
+            defaults={
+                'nombre': datos_cliente['nombre'],
+                'apellido': datos_cliente['apellido'],
+                'telefono': datos_cliente['telefono'],
+                'email': email,
+            },
+        )
+        # Cualquiera puede escribir una C.I. ajena: si el resto no coincide con la ficha,
+        # el salón la revisa y no se avisa nada al cliente registrado
+        revisar = not nuevo and not _coincide(cliente, datos_cliente)
+        notas = NOTA_RESERVA
+        if revisar:
+            notas += (
+                f" - REVISAR: los datos no coinciden con la ficha. Ingresó: {datos_cliente['nombre']} "
+                f"{datos_cliente['apellido']}, tel. {datos_cliente['telefono']}"
+                + (f", {email}" if email else "")
+            )
+        cita = Cita.objects.create(
+            empresa=empresa,
+            cliente=cliente,
+            profesional_id=elegido,
+            servicio=servicio,
+            fecha=fecha,
+            hora=hora,
+            estado='PENDIENTE',
+            notas_adicionales=notas,
+        )
+        registrar_cambio_cita(cita, 'CREADA')
+
+        avisado = False
+        if not revisar:
+            # Solo cuando va al email que escribió el visitante (la ficha puede tener otro)
+            avisado = bool(email) and (cliente.email or '').lower() == email.lower()
+            if avisado:
+                encolar_correos([cita], 'CONFIRMACION')
+            # Una reserva a revisar no cierra la lista de espera del cliente registrado
+            marcar_agendados(cita)
+    return cita, avisado
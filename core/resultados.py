@@ -0,0 +1,166 @@
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Cita, CitaHistorica, Empresa, Gasto, MesPendiente, ResumenMensual
+
+METODOS_PAGO = dict(Cita.METODOS_PAGO)
+
+
+def inicio_mes(fecha):
+    return fecha.replace(day=1)
+
+
+def sumar_meses(fecha, meses):
+    indice = fecha.year * 12 + fecha.month - 1 + meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def marcar_mes(empresa_id, fecha):
+    """Anota que el mes de `fecha` cambió (un INSERT que ignora duplicados)."""
+    if empresa_id and fecha:
+        MesPendiente.objects.bulk_create(
+            [MesPendiente(empresa_id=empresa_id, mes=inicio_mes(fecha))],
+            ignore_conflicts=True,
+        )
+
+
+def _filtro_meses(meses):
+    # Rangos de fechas en vez de TruncMonth en el WHERE, para que use el índice (empresa, fecha)
+    filtro = Q()
+    for mes in meses:
+        filtro |= Q(fecha__gte=mes, fecha__lt=sumar_meses(mes, 1))
+    return filtro
+
+
+def _calcular(empresa, meses):
+    """Filas del cubo para `meses`, con un GROUP BY por dimensión y tabla."""
+    filtro = _filtro_meses(meses)
+    filas = {}
+
+    def acumular(mes, dimension, clave, etiqueta, total, cantidad):
+        fila = filas.setdefault(
+            (mes, dimension, str(clave)),
+            ResumenMensual(empresa=empresa, mes=mes, dimension=dimension, clave=str(clave), etiqueta=etiqueta),
+        )
+        fila.total += total or 0
+        fila.cantidad += cantidad
+
+    for modelo in (Cita, CitaHistorica):
+        realizadas = (
+            modelo.objects.filter(filtro, empresa=empresa, estado='REALIZADO')
+            .annotate(mes=TruncMonth('fecha'))
+        )
+        for r in realizadas.values('mes', 'servicio_id', 'servicio__nombre').annotate(
+                total=Sum('monto_cobrado'), cantidad=Count('id')).order_by():
+            acumular(r['mes'], 'servicio', r['servicio_id'], r['servicio__nombre'], r['total'], r['cantidad'])
+        for r in realizadas.values('mes', 'metodo_pago').annotate(
+                total=Sum('monto_cobrado'), cantidad=Count('id')).order_by():
+            acumular(r['mes'], 'metodo_pago', r['metodo_pago'],
+                     METODOS_PAGO.get(r['metodo_pago'], r['metodo_pago']), r['total'], r['cantidad'])
+
+    gastos = (
+        Gasto.objects.filter(filtro, empresa=empresa)
+        .annotate(mes=TruncMonth('fecha'))
+        .values('mes', 'categoria_id', 'categoria__nombre')
+        .annotate(total=Sum('monto'), cantidad=Count('id'))
+        .order_by()
+    )
+    for r in gastos:
+        acumular(r['mes'], 'categoria', r['categoria_id'], r['categoria__nombre'], r['total'], r['cantidad'])
+
+    return list(filas.values())
+
+
+def actualizar_cubo(empresa, meses_historia=24):
+    """
+    Recalcula solo los meses pendientes de la empresa. La primera vez (cubo vacío)
+    arma los últimos `meses_historia` meses completos.
+    """
+    with transaction.atomic():
+        # Una actualización por empresa a la vez: dos vistas abiertas juntas no
+        # insertan las mismas filas (la segunda espera y ya no encuentra pendientes)
+        list(Empresa.objects.select_for_update().filter(pk=empresa.pk).values_list('pk', flat=True))
+
+        # Primero se borran las marcas: un cambio que llegue durante el cálculo
+        # vuelve a marcar su mes y se toma en la próxima actualización.
+        pendientes = list(
+            MesPendiente.objects.filter(empresa=empresa).values_list('mes', flat=True)
+        )
+        MesPendiente.objects.filter(empresa=empresa, mes__in=pendientes).delete()
+
+        if not ResumenMensual.objects.filter(empresa=empresa).exists():
+            hoy_mes = inicio_mes(date.today())
+            pendientes = [sumar_meses(hoy_mes, -i) for i in range(meses_historia)]
+
+        if not pendientes:
+            return 0
+
+        ResumenMensual.objects.filter(empresa=empresa, mes__in=pendientes).delete()
+        filas = _calcular(empresa, pendientes)
+        ResumenMensual.objects.bulk_create(filas)
+    return len(pendientes)
+
+
+def estado_resultados(empresa, meses=12):
+    """
+    Lee el cubo de los últimos `meses` meses y lo arma para la plantilla:
+    resultado por mes (con columnas por método de pago) y totales del período
+    por servicio y por categoría de gasto.
+    """
+    actualizar_cubo(empresa, meses_historia=max(meses, 24))
+
+    hasta = inicio_mes(date.today())
+    desde = sumar_meses(hasta, -(meses - 1))
+    filas = ResumenMensual.objects.filter(empresa=empresa, mes__gte=desde, mes__lte=hasta)
+
+    lista_meses = [sumar_meses(desde, i) for i in range(meses)]
+    por_mes = {
+        mes: {'mes': mes, 'metodos': {}, 'ingresos': 0, 'gastos': 0}
+        for mes in lista_meses
+    }
+    servicios = {}
+    categorias = {}
+
+    for fila in filas:
+        mes = por_mes[fila.mes]
+        if fila.dimension == 'metodo_pago':
+            mes['metodos'][fila.clave] = fila.total
+            mes['ingresos'] += fila.total
+        elif fila.dimension == 'categoria':
+            mes['gastos'] += fila.total
+            categorias.setdefault(fila.clave, {'etiqueta': fila.etiqueta, 'total': 0, 'cantidad': 0})
+            categorias[fila.clave]['total'] += fila.total
+            categorias[fila.clave]['cantidad'] += fila.cantidad
+        elif fila.dimension == 'servicio':
+            servicios.setdefault(fila.clave, {'etiqueta': fila.etiqueta, 'total': 0, 'cantidad': 0})
+            servicios[fila.clave]['total'] += fila.total
+            servicios[fila.clave]['cantidad'] += fila.cantidad
+
+    resumen = []
+    for mes in lista_meses:
+        datos = por_mes[mes]
+        datos['neto'] = datos['ingresos'] - datos['gastos']
+        datos['columnas_metodo'] = [datos['metodos'].get(codigo, 0) for codigo in METODOS_PAGO]
+        resumen.append(datos)
+
+    total_ingresos = sum(m['ingresos'] for m in resumen)
+    total_gastos = sum(m['gastos'] for m in resumen)
+
+    def con_porcentaje(grupo, total):
+        lista = sorted(grupo.values(), key=lambda g: g['total'], reverse=True)
+        for g in lista:
+            g['porcentaje'] = round(g['total'] * 100 / total, 1) if total else 0
+        return lista
+
+    return {
+        'meses': list(reversed(resumen)),
+        'metodos_pago': list(METODOS_PAGO.values()),
+        'servicios': con_porcentaje(servicios, total_ingresos),
+        'categorias': con_porcentaje(categorias, total_gastos),
+        'total_ingresos': total_ingresos,
+        'total_gastos': total_gastos,
+        'total_neto': total_ingresos - total_gastos,
+    }
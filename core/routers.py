@@ -0,0 +1,74 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+REPLICA = 'replica'
+
+# Cookie que marca "este navegador acaba de escribir": mientras no venza,
+# sus lecturas van al primario para que vea sus propios cambios.
+COOKIE_PRIMARIO = 'bm_primario'
+
+_usar_replica = ContextVar('usar_replica', default=False)
+
+
+def hay_replica():
+    return REPLICA in settings.DATABASES
+
+
+class ReplicaRouter:
+    """
+    Envía a la réplica solo las lecturas hechas dentro de `leer_de_replica()`
+    (o de una vista con @lectura_replica). Todo lo demás va al primario.
+    """
+
+    def db_for_read(self, model, **hints):
+        # La caché en la base (límites por IP) se cuenta leyendo y escribiendo: de
+        # la réplica llegaría atrasada
+        if model._meta.app_label == 'django_cache':
+            return None
+        if _usar_replica.get() and hay_replica():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primario y réplica tienen los mismos datos
+        return True
+
+
+@contextmanager
+def leer_de_replica():
+    token = _usar_replica.set(True)
+    try:
+        yield
+    finally:
+        _usar_replica.reset(token)
+
+
+def primario_fijado(request):
+    """True si este cliente hizo un POST hace menos de REPLICA_PIN_SEGUNDOS."""
+    try:
+        return float(request.COOKIES.get(COOKIE_PRIMARIO, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def lectura_replica(vista):
+    """
+    Decorador para vistas de solo lectura (reportes, listados).
+    Las consultas de la vista se resuelven en la réplica, salvo que el usuario
+    haya escrito recién (read-your-writes) o la petición no sea GET.
+    """
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or not hay_replica() or primario_fijado(request):
+            return vista(request, *args, **kwargs)
+        with leer_de_replica():
+            return vista(request, *args, **kwargs)
+
+    return envoltura
@@ -0,0 +1,125 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache_empresa import invalidar
+from .cambios import marcar_cambio
+from .disponibilidad import parchar_citas
+from .models import (
+    AusenciaProfesional, CategoriaGasto, Cita, Cliente, Empresa, Gasto, HorarioAtencion, Profesional,
+    ResumenMensual, Servicio, TurnoProfesional,
+)
+from .resultados import marcar_mes
+
+
+def _leido(instance):
+    # Durante post_save, _leido (ConVersion) todavía tiene los valores con que se leyó el registro
+    return getattr(instance, '_leido', {})
+
+
+def _fechas_afectadas(instance):
+    """La fecha actual y, si se cambió, la que tenía al leerlo."""
+    return {instance.fecha, _leido(instance).get('fecha', instance.fecha)}
+
+
+# Cualquier cambio en estos modelos cambia lo que muestra la agenda.
+# Ojo: QuerySet.update() no dispara señales, quien lo use debe invalidar a mano.
+@receiver(post_save, sender=Cita)
+@receiver(post_delete, sender=Cita)
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+@receiver(post_save, sender=Profesional)
+@receiver(post_delete, sender=Profesional)
+@receiver(post_save, sender=HorarioAtencion)
+@receiver(post_delete, sender=HorarioAtencion)
+def invalidar_agenda(sender, instance, **kwargs):
+    invalidar(instance.empresa_id, 'agenda')
+
+
+# Lo que cambia quién trabaja y cuánto dura cada cita: se recompilan los días de la empresa
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+@receiver(post_save, sender=Profesional)
+@receiver(post_delete, sender=Profesional)
+@receiver(post_save, sender=HorarioAtencion)
+@receiver(post_delete, sender=HorarioAtencion)
+@receiver(post_save, sender=TurnoProfesional)
+@receiver(post_delete, sender=TurnoProfesional)
+@receiver(post_save, sender=AusenciaProfesional)
+@receiver(post_delete, sender=AusenciaProfesional)
+def invalidar_disponibilidad(sender, instance, **kwargs):
+    invalidar(instance.empresa_id, 'disponibilidad')
+
+
+# Una cita solo corre sus casillas en los días ya compilados
+@receiver(post_save, sender=Cita)
+@receiver(post_delete, sender=Cita)
+def parchar_disponibilidad(sender, instance, **kwargs):
+    # Si la movieron de día, hay que liberar el anterior
+    fechas = _fechas_afectadas(instance)
+    ocupa = None
+    if kwargs.get('signal') is post_save and instance.estado != 'CANCELADO':
+        ocupa = (instance.profesional_id, instance.fecha, instance.hora, instance.servicio.duracion_minutos)
+    cambio = (instance.pk, fechas, ocupa)
+    transaction.on_commit(lambda: parchar_citas(instance.empresa_id, [cambio]))
+
+
+def _borrando_empresa(kwargs):
+    # Si se está borrando la empresa entera no hay nada que marcar
+    origen = kwargs.get('origin')
+    return isinstance(origen, Empresa) or getattr(origen, 'model', None) is Empresa
+
+
+# Marcas de último cambio por empresa, para las respuestas 304 de los listados
+@receiver(post_save, sender=Cita)
+@receiver(post_delete, sender=Cita)
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+@receiver(post_save, sender=Profesional)
+@receiver(post_delete, sender=Profesional)
+@receiver(post_save, sender=HorarioAtencion)
+@receiver(post_delete, sender=HorarioAtencion)
+@receiver(post_save, sender=Gasto)
+@receiver(post_delete, sender=Gasto)
+@receiver(post_save, sender=CategoriaGasto)
+@receiver(post_delete, sender=CategoriaGasto)
+def registrar_marca_cambio(sender, instance, **kwargs):
+    if _borrando_empresa(kwargs):
+        return
+    marcar_cambio(instance.empresa_id, sender._meta.model_name)
+
+
+# Meses que el estado de resultados tiene que recalcular
+@receiver(post_save, sender=Cita)
+def marcar_mes_cita(sender, instance, **kwargs):
+    # Solo las citas cobradas suman ingresos: cuenta si lo era al leerla o lo es ahora
+    # (cobrada y después cancelada, o movida de mes, cambia el mes anterior)
+    if 'REALIZADO' in (instance.estado, _leido(instance).get('estado')):
+        for fecha in _fechas_afectadas(instance):
+            marcar_mes(instance.empresa_id, fecha)
+
+
+@receiver(post_delete, sender=Cita)
+@receiver(post_save, sender=Gasto)
+@receiver(post_delete, sender=Gasto)
+def marcar_mes_movimiento(sender, instance, **kwargs):
+    if _borrando_empresa(kwargs):
+        return
+    for fecha in _fechas_afectadas(instance):
+        marcar_mes(instance.empresa_id, fecha)
+
+
+# Si renombran un servicio o una categoría, el cubo muestra el nombre nuevo
+@receiver(post_save, sender=Servicio)
+@receiver(post_save, sender=CategoriaGasto)
+def renombrar_en_resumen(sender, instance, created, **kwargs):
+    if created:
+        return
+    dimension = 'servicio' if sender is Servicio else 'categoria'
+    ResumenMensual.objects.filter(
+        empresa_id=instance.empresa_id, dimension=dimension, clave=str(instance.pk)
+    ).exclude(etiqueta=instance.nombre).update(etiqueta=instance.nombre)
@@ -0,0 +1,129 @@
+import logging
+import os
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Profesional, Tarea
+
+logger = logging.getLogger(__name__)
+
+# Espera antes del reintento n: REINTENTO_SEGUNDOS * 2^(n-1)
+REINTENTO_SEGUNDOS = 30
+
+# Una tarea EN_CURSO por más de esto se considera de un worker caído
+MINUTOS_COLGADA = 15
+
+
+def encolar(funcion, *, demora=None, ejecutar_desde=None, max_intentos=3, **argumentos):
+    """
+    Agrega una tarea a la cola. `funcion` tiene que ser importable a nivel de
+    módulo y los argumentos serializables a JSON (ids, no instancias).
+    Dentro de una transacción, la tarea solo existe si la transacción confirma.
+    """
+    if ejecutar_desde is None:
+        ejecutar_desde = timezone.now() + (demora or timedelta(0))
+    return Tarea.objects.create(
+        funcion=f"{funcion.__module__}.{funcion.__qualname__}",
+        argumentos=argumentos,
+        ejecutar_desde=ejecutar_desde,
+        max_intentos=max_intentos,
+    )
+
+
+def tomar_lote(cantidad):
+    """Reserva hasta `cantidad` tareas vencidas (otros workers saltan las filas bloqueadas)."""
+    ahora = timezone.now()
+    with transaction.atomic():
+        tareas = list(
+            Tarea.objects.filter(estado='PENDIENTE', ejecutar_desde__lte=ahora)
+            .order_by('ejecutar_desde', 'id')
+            .select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)[:cantidad]
+        )
+        if tareas:
+            Tarea.objects.filter(id__in=[t.id for t in tareas]).update(estado='EN_CURSO', iniciada_el=ahora)
+    for tarea in tareas:
+        tarea.estado = 'EN_CURSO'
+        tarea.iniciada_el = ahora
+    return tareas
+
+
+def ejecutar(tarea):
+    """Corre una tarea reservada y guarda el resultado, los tiempos y el próximo reintento."""
+    close_old_connections()
+    inicio = time.monotonic()
+    # Antes de correrla: si falla, el reintento cambia ejecutar_desde
+    espera_ms = max(int((tarea.iniciada_el - tarea.ejecutar_desde).total_seconds() * 1000), 0)
+    try:
+        import_string(tarea.funcion)(**tarea.argumentos)
+    except Exception:
+        tarea.intentos += 1
+        tarea.error = traceback.format_exc()
+        if tarea.intentos < tarea.max_intentos:
+            tarea.estado = 'PENDIENTE'
+            tarea.ejecutar_desde = timezone.now() + timedelta(
+                seconds=REINTENTO_SEGUNDOS * 2 ** (tarea.intentos - 1)
+            )
+        else:
+            tarea.estado = 'FALLIDA'
+        logger.warning("Tarea %s (%s) falló, intento %s", tarea.id, tarea.funcion, tarea.intentos)
+    else:
+        tarea.intentos += 1
+        tarea.estado = 'HECHA'
+        tarea.error = ''
+    finally:
+        tarea.duracion_ms = int((time.monotonic() - inicio) * 1000)
+        tarea.espera_ms = espera_ms
+        tarea.terminada_el = timezone.now()
+        tarea.save(update_fields=[
+            'estado', 'intentos', 'error', 'ejecutar_desde',
+            'duracion_ms', 'espera_ms', 'terminada_el',
+        ])
+        close_old_connections()
+    return tarea
+
+
+def rescatar_colgadas(minutos=MINUTOS_COLGADA):
+    """Devuelve a la cola las tareas que quedaron EN_CURSO (worker reiniciado o caído)."""
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return Tarea.objects.filter(estado='EN_CURSO', iniciada_el__lt=limite).update(estado='PENDIENTE')
+
+
+def purgar_hechas(dias=7):
+    limite = timezone.now() - timedelta(days=dias)
+    return Tarea.objects.filter(estado='HECHA', terminada_el__lt=limite).delete()[0]
+
+
+# --- Tareas ---
+
+def _almacen_temporal():
+    return FileSystemStorage(location=settings.TAREAS_DIR_ARCHIVOS)
+
+
+def diferir_imagen_profesional(profesional, archivo):
+    """
+    Guarda la foto subida en disco local y encola su subida a Cloudinary,
+    así la vista responde sin esperar al servicio externo.
+    """
+    _, extension = os.path.splitext(archivo.name)
+    nombre = _almacen_temporal().save(f"{uuid.uuid4().hex}{extension}", archivo)
+    encolar(subir_imagen_profesional, profesional_id=profesional.pk, archivo=nombre, nombre=archivo.name)
+
+
+def subir_imagen_profesional(profesional_id, archivo, nombre):
+    almacen = _almacen_temporal()
+    profesional = Profesional.objects.filter(pk=profesional_id).first()
+    if profesional:
+        with almacen.open(archivo) as f:
+            profesional.imagen.save(nombre, File(f), save=False)
+        # Solo la imagen: no pisa lo que se haya editado mientras esperaba en la cola
+        profesional.save(update_fields=['imagen', 'actualizado_el'])
+    almacen.delete(archivo)
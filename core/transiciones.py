@@ -0,0 +1,76 @@
+from itertools import groupby
+from operator import attrgetter
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache_empresa import invalidar
+from .cambios import marcar_cambio, registrar_cambios_citas
+from .disponibilidad import parchar_citas
+from .estadisticas import ESTADOS_AUSENCIA, sumar_ausencias
+from .models import Cita
+from .resultados import marcar_mes
+
+ESTADOS_ACTIVOS = ['PENDIENTE', 'CONFIRMADO']
+
+# acción: (estado nuevo, estados desde los que se permite)
+TRANSICIONES = {
+    'confirmar': ('CONFIRMADO', ['PENDIENTE']),
+    'cancelar': ('CANCELADO', ESTADOS_ACTIVOS),
+    'no_asistio': ('NO_ASISTIO', ESTADOS_ACTIVOS),
+}
+
+
+def cambiar_estado_en_lote(citas, nuevo_estado):
+    """
+    Pasa las `citas` (activas, ya bloqueadas con select_for_update y con cliente,
+    profesional y servicio cargados) a `nuevo_estado` con un UPDATE por empresa.
+
+    update() no dispara señales: acá se hace a mano lo que hacen para un save()
+    (marca de cambio, caché de la agenda, feed y estadística de clientes).
+    Llamarla dentro de transaction.atomic().
+    """
+    ahora = timezone.now()
+    citas = sorted(citas, key=attrgetter('empresa_id'))
+    for empresa_id, grupo in groupby(citas, key=attrgetter('empresa_id')):
+        grupo = list(grupo)
+        Cita.objects.filter(id__in=[c.pk for c in grupo]).update(
+            estado=nuevo_estado, actualizado_el=ahora, version=F('version') + 1
+        )
+        for cita in grupo:
+            # Una cita cobrada que cambia de estado deja de sumar en el estado de resultados
+            if 'REALIZADO' in (cita.estado, nuevo_estado):
+                marcar_mes(empresa_id, cita.fecha)
+            cita.estado = nuevo_estado
+            cita.actualizado_el = ahora
+            cita.version += 1
+
+        registrar_cambios_citas(grupo, 'ESTADO')
+        if nuevo_estado in ESTADOS_AUSENCIA:
+            sumar_ausencias(empresa_id, [c.cliente_id for c in grupo])
+        marcar_cambio(empresa_id, 'cita')
+        transaction.on_commit(lambda empresa_id=empresa_id: invalidar(empresa_id, 'agenda'))
+        if nuevo_estado == 'CANCELADO':
+            # Liberan su lugar en los días ya compilados de la disponibilidad
+            cambios = [(c.pk, {c.fecha}, None) for c in grupo]
+            transaction.on_commit(lambda empresa_id=empresa_id, cambios=cambios: parchar_citas(empresa_id, cambios))
+    return citas
+
+
+def vencer_lote(empresa_id, fecha_limite, lote=500):
+    """
+    Pasa a VENCIDO hasta `lote` citas activas de la empresa con fecha anterior a
+    `fecha_limite`. Transacción corta por lote; las filas que otro proceso tiene
+    bloqueadas se saltan y quedan para la próxima pasada. Devuelve cuántas cambió.
+    """
+    with transaction.atomic():
+        citas = list(
+            Cita.objects.filter(empresa_id=empresa_id, estado__in=ESTADOS_ACTIVOS, fecha__lt=fecha_limite)
+            .select_related('cliente', 'profesional', 'servicio')
+            .order_by('fecha', 'id')
+            .select_for_update(of=('self',), skip_locked=connection.features.has_select_for_update_skip_locked)[:lote]
+        )
+        if citas:
+            cambiar_estado_en_lote(citas, 'VENCIDO')
+    return len(citas)
@@ -13,21 +13,50 @@ urlpatterns = [
     path('clientes/nuevo/', views.crear_cliente, name='crear_cliente'),
     path('clientes/editar/<int:id>/', views.editar_cliente, name='editar_cliente'),
     path('clientes/eliminar/<int:id>/', views.eliminar_cliente, name='eliminar_cliente'),
+    path('clientes/duplicados/', views.clientes_duplicados, name='clientes_duplicados'),
+    path('clientes/duplicados/descartar/<int:id>/', views.descartar_duplicado, name='descartar_duplicado'),
+    path('clientes/fusionar/', views.fusionar_cliente, name='fusionar_cliente'),
     path('profesional/', views.listado_profesional, name='listado_profesional'),
     path('profesional/nuevo/', views.crear_profesional, name='crear_profesional'),
     path('profesional/editar/<int:id>/', views.editar_profesional, name='editar_profesional'),
     path('profesional/eliminar/<int:id>/', views.eliminar_profesional, name='eliminar_profesional'),
+    path('profesional/<int:id>/turnos/', views.turnos_profesional, name='turnos_profesional'),
+    path('profesional/turnos/<int:id>/borrar/', views.borrar_turno, name='borrar_turno'),
+    path('profesional/ausencias/<int:id>/borrar/', views.borrar_ausencia, name='borrar_ausencia'),
     path('caja/', views.reporte_caja, name='reporte_caja'),
+    path('caja/resultados/', views.reporte_resultados, name='reporte_resultados'),
     path('citas/editar/<int:id>/', views.editar_cita, name='editar_cita'),
     path('citas/finalizar/<int:id>/', views.finalizar_cita, name='finalizar_cita'),
     path('citas/', views.listado_citas, name='listado_citas'),
+    path('citas/calendario/', views.calendario_semana, name='calendario_semana'),
     path('citas/cancelar/<int:id>/', views.cancelar_cita, name='cancelar_cita'),
     path('citas/confirmar/<int:id>/', views.confirmar_cita, name='confirmar_cita'),
+    path('citas/acciones/', views.acciones_citas, name='acciones_citas'),
+    path('citas/cambios/', views.feed_cambios_citas, name='feed_cambios_citas'),
+    path('lista-espera/', views.lista_espera, name='lista_espera'),
+    path('lista-espera/quitar/<int:id>/', views.quitar_espera, name='quitar_espera'),
+    path('lista-espera/horario/', views.horario_libre, name='horario_libre'),
+    path('lista-espera/avisar/<int:id>/', views.avisar_espera, name='avisar_espera'),
     path('gastos/', views.lista_gastos, name='lista_gastos'),
     path('gastos/nuevo/', views.crear_gasto, name='crear_gasto'),
+    path('gastos/<int:id>/editar/', views.editar_gasto, name='editar_gasto'),
     path('gastos/categorias/', views.gestion_categorias, name='gestion_categorias'),
     path('comisiones/', views.liquidacion_comisiones, name='liquidacion_comisiones'),
     path('mis-comisiones/', views.mis_comisiones, name='mis_comisiones'),
+    path('comisiones/reglas/', views.reglas_comision, name='reglas_comision'),
+    path('comisiones/reglas/<int:id>/borrar/', views.borrar_regla_comision, name='borrar_regla_comision'),
+    path('profesional/ocupacion/', views.ocupacion_profesionales, name='ocupacion_profesionales'),
     path('horarios/', views.listado_horarios, name='listado_horarios'),
     path('horarios/editar/<int:id>/', views.editar_horario, name='editar_horario'),
+    path('panel/', views.panel_duenos, name='panel_duenos'),
+    path('panel/empresa/<int:id>/', views.cambiar_empresa, name='cambiar_empresa'),
+    path('api/citas/', views.api_citas, name='api_citas'),
+    path('api/clientes/', views.api_clientes, name='api_clientes'),
+    path('api/servicios/', views.api_servicios, name='api_servicios'),
+    path('api/gastos/', views.api_gastos, name='api_gastos'),
+    path('metricas/db/', views.metricas_db, name='metricas_db'),
+    path('reservar/<slug:slug>/', views.reserva_publica, name='reserva_publica'),
+    path('reservar/<slug:slug>/horarios/', views.reserva_horarios, name='reserva_horarios'),
+    path('reservar/<slug:slug>/confirmar/', views.reserva_confirmar, name='reserva_confirmar'),
+    path('reservar/<slug:slug>/listo/<str:token>/', views.reserva_lista, name='reserva_lista'),
 ]
\ No newline at end of file
@@ -1,63 +1,206 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required,permission_required
-from django.db.models import ProtectedError, Sum, Q, Case, When, Value, IntegerField
+from django.db import transaction
+from django.db.models import ProtectedError, Sum, Q, F, Case, When, Value, IntegerField
 from django.contrib import messages
-from datetime import date, datetime
-from .models import Servicio, Cita,  Cliente, Profesional, Gasto, HorarioAtencion, CategoriaGasto
-from .forms import CitaForm, ServicioForm, ClienteForm, ProfesionalForm, CobrarCitaForm, GastoForm, HorarioForm, CategoriaGastoForm
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import add_never_cache_headers, patch_cache_control
+from django.views.decorators.cache import cache_control, never_cache
+from django.views.decorators.http import condition
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
+import hashlib
+import json
+from .models import Empresa, Servicio, Cita,  Cliente, Profesional, Gasto, HorarioAtencion, CategoriaGasto, CambioCita, DuplicadoCliente, EsperaCita, ReglaComision, RegistroDesactualizado, TurnoProfesional, AusenciaProfesional
+from .forms import CitaForm, ServicioForm, ClienteForm, ProfesionalForm, CobrarCitaForm, GastoForm, HorarioForm, CategoriaGastoForm, EsperaCitaForm, ReglaComisionForm, TurnoProfesionalForm, AusenciaProfesionalForm, ReservaPublicaForm
+from .metricas import estadisticas_pool, estadisticas_tareas
+from .routers import lectura_replica
+from .calendario import lunes_de, datos_semana, armar_grilla
+from .cambios import ultimos_cambios, registrar_cambio_cita
+from .archivo import ESTADOS_CERRADOS, citas_en_rango, sumar, unir
+from .resultados import estado_resultados
+from .ocupacion import ocupacion_periodo
+from .estadisticas import DIAS_INACTIVO, actualizar_estadistica, recalcular_cliente
+from .tareas import diferir_imagen_profesional
+from .transiciones import TRANSICIONES, cambiar_estado_en_lote
+from .correos import encolar_aviso_espera, encolar_correos
+from .panel import empresas_del_usuario, resumen_empresas, totales
+from .api import consulta_api, generar_json
+from .duplicados import fusionar_clientes
+from .comisiones import comision_por_cita, liquidar, reglas_de
+from .reservas import HORARIOS_SEGUNDOS, catalogo, esperar_limite, fechas_reservables, horarios, reservar
+from .espera import (
+    ESTADOS_VIGENTES, candidatos_para, esperas_en_fechas, marcar_agendados, marcar_avisado, mensaje_aviso,
+)
+from .templatetags.whatsapp_filters import whatsapp_url
 
 
 # --- FUNCIÓN AUXILIAR PARA SAAS ---
 def obtener_mi_empresa(request):
     """
     Devuelve la empresa del usuario logueado.
+    Un dueño con varios salones trabaja con el que eligió en el panel (queda en la
+    sesión); si no eligió, con la de su perfil de profesional o su primer salón.
     Si es admin o no tiene empresa, devuelve None o maneja el error.
     """
-    try:
-        return request.user.profesional.empresa
-    except AttributeError:
-        return None
+    if hasattr(request, '_mi_empresa'):
+        return request._mi_empresa
 
+    empresa = None
+    if request.user.is_authenticated:
+        elegida = request.session.get('empresa_activa')
+        if elegida:
+            empresa = request.user.empresas_a_cargo.filter(pk=elegida, activo=True).first()
+        if empresa is None:
+            try:
+                empresa = request.user.profesional.empresa
+            except AttributeError:
+                empresa = request.user.empresas_a_cargo.filter(activo=True).order_by('nombre').first()
 
-@login_required
-def home(request):
-    hoy = date.today()
+    request._mi_empresa = empresa
+    return empresa
+
+
+# --- RESPUESTAS CONDICIONALES (304) ---
+MODELOS_AGENDA = ('cita', 'cliente', 'servicio', 'profesional')
+
+
+def _marcas_para(request, modelos):
+    """
+    Marcas de cambio de la empresa del usuario, o None si la página no se puede
+    reutilizar (sin empresa, o con mensajes flash pendientes de mostrar).
+    """
     mi_empresa = obtener_mi_empresa(request)
+    if not mi_empresa or len(messages.get_messages(request)):
+        return None
+    if not hasattr(request, '_marcas_cambio'):
+        request._marcas_cambio = ultimos_cambios(mi_empresa, modelos)
+    return request._marcas_cambio
 
-    orden_prioridad = Case(
-        When(estado='PENDIENTE', then=Value(1)),
-        When(estado='CONFIRMADO', then=Value(1)),
-        default=Value(2),  # cualquier otro van al fondo
-        output_field=IntegerField(),
-    )
 
-    citas_hoy = Cita.objects.filter(fecha=hoy, empresa=mi_empresa)
+def sin_cambios(*modelos):
+    """
+    Decorador: responde 304 Not Modified (con ETag/Last-Modified) antes de
+    ejecutar la vista si no cambió ninguno de los `modelos` de la empresa.
+    El ETag también depende del usuario, la empresa activa, su sesión, el día y los filtros de la URL.
+    """
+    def etag(request, *args, **kwargs):
+        marcas = _marcas_para(request, modelos)
+        if marcas is None:
+            return None
+        partes = [
+            request.user.pk,
+            obtener_mi_empresa(request).pk,
+            request.session.session_key,
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+            date.today(),
+            request.get_full_path(),
+            marcas,
+        ]
+        return hashlib.md5(repr(partes).encode()).hexdigest()
+
+    def ultima_modificacion(request, *args, **kwargs):
+        marcas = _marcas_para(request, modelos)
+        if marcas is None:
+            return None
+        # Al cambiar el día o volver a iniciar sesión la página también cambia
+        medianoche = timezone.make_aware(datetime.combine(date.today(), datetime.min.time()))
+        fechas = [fecha for _, fecha in marcas] + [medianoche]
+        if request.user.last_login:
+            fechas.append(request.user.last_login)
+        # ...o al pasar a otro salón (sus marcas pueden ser más viejas que lo que se mostró)
+        if request.session.get('empresa_activa_desde'):
+            fechas.append(datetime.fromisoformat(request.session['empresa_activa_desde']))
+        return max(fechas)
+
+    def decorador(vista):
+        # no-cache: el navegador guarda la página pero siempre pregunta antes de usarla
+        return cache_control(private=True, no_cache=True)(
+            condition(etag_func=etag, last_modified_func=ultima_modificacion)(vista)
+        )
+
+    return decorador
+
+
+# --- FRAGMENTOS (htmx) ---
+def _es_fragmento(request):
+    """Pedido hecho con htmx: se responde solo la parte de la página que cambió."""
+    return request.headers.get('HX-Request') == 'true'
+
+
+def _citas_de_hoy(request, mi_empresa):
+    citas_hoy = Cita.objects.filter(fecha=date.today(), empresa=mi_empresa)
 
     es_estilista = request.user.groups.filter(name='Profesionales').exists()
 
     if es_estilista:
         # Si es estilista, filtramos extra por SU perfil
         citas_hoy = citas_hoy.filter(profesional=request.user.profesional)
+    return citas_hoy
+
+
+def _kpis_hoy(citas_hoy):
+    return {
+        # 1. Total de citas hoy
+        'kpi_total': citas_hoy.count(),
+        # 2. Cuántas faltan confirmar (Acción urgente)
+        'kpi_pendientes': citas_hoy.filter(estado='PENDIENTE').count(),
+        # 3. Proyección de dinero (Suma de precios de servicios de hoy)
+        'kpi_proyeccion': citas_hoy.aggregate(total=Sum('servicio__precio_estimado'))['total'] or 0,
+    }
+
+
+def _fila_actualizada(request, cita, mi_empresa, url_espera=None):
+    """Fila de la cita y KPIs del día recalculados, para reemplazar en la agenda sin recargarla."""
+    contexto = {'cita': cita, 'url_espera': url_espera, **_kpis_hoy(_citas_de_hoy(request, mi_empresa))}
+    return render(request, 'core/partials/respuesta_cita.html', contexto)
 
-    citas_hoy = citas_hoy.order_by(orden_prioridad, 'hora')
 
-    # 1. Total de citas hoy
-    total_citas = citas_hoy.count()
+CITA_DESACTUALIZADA = "Esta cita cambió mientras la tenías abierta (otra persona la modificó). Recargá para ver cómo quedó."
 
-    # 2. Cuántas faltan confirmar (Acción urgente)
-    pendientes = citas_hoy.filter(estado='PENDIENTE').count()
 
-    # 3. Proyección de dinero (Suma de precios de servicios de hoy)
+def _version_enviada(request, objeto):
+    """La versión que el usuario tenía en pantalla, si el pedido la trae (botones sin formulario)."""
+    version = request.POST.get('version', '')
+    if version.isdigit():
+        objeto.version = int(version)
+
+
+def _registro_desactualizado(request, mensaje, destino, *args):
+    """Aviso de conflicto: a htmx un 409 con el mensaje (base.html lo muestra y recarga), al resto un redirect."""
+    if _es_fragmento(request):
+        respuesta = HttpResponse(status=409)
+        respuesta['HX-Trigger'] = json.dumps({'registroDesactualizado': mensaje})
+        return respuesta
+    messages.error(request, mensaje)
+    return redirect(destino, *args)
+
+
+@login_required
+@sin_cambios(*MODELOS_AGENDA)
+def home(request):
+    hoy = date.today()
+    mi_empresa = obtener_mi_empresa(request)
+
+    orden_prioridad = Case(
+        When(estado='PENDIENTE', then=Value(1)),
+        When(estado='CONFIRMADO', then=Value(1)),
+        default=Value(2),  # cualquier otro van al fondo
+        output_field=IntegerField(),
+    )
 
-    proyeccion = citas_hoy.aggregate(total=Sum('servicio__precio_estimado'))['total'] or 0
+    citas_hoy = _citas_de_hoy(request, mi_empresa).order_by(orden_prioridad, 'hora')
 
     contexto = {
         'citas': citas_hoy,
         'fecha_actual': hoy,
-        # Pasamos los datos nuevos
-        'kpi_total': total_citas,
-        'kpi_pendientes': pendientes,
-        'kpi_proyeccion': proyeccion
+        **_kpis_hoy(citas_hoy),
     }
     return render(request, 'core/home.html', contexto)
 
@@ -70,6 +213,8 @@ def home(request):
 #--- Vistas de Servicios ---
 
 @login_required
+@sin_cambios('servicio')
+@lectura_replica
 def listado_servicios(request):
 
     mi_empresa = obtener_mi_empresa(request)
@@ -158,7 +303,18 @@ def eliminar_servicio(request, id):
 
 #--- Vista Clientes ---
 
+# Orden del directorio: los de estadística usan los índices (empresa, ultima_visita / total_gastado)
+ORDENES_CLIENTES = {
+    'nombre': ['nombre', 'apellido'],
+    'recientes': [F('estadistica__ultima_visita').desc(nulls_last=True), 'nombre'],
+    'mejores': [F('estadistica__total_gastado').desc(nulls_last=True), 'nombre'],
+    'frecuentes': [F('estadistica__visitas').desc(nulls_last=True), 'nombre'],
+}
+
+
 @login_required
+@sin_cambios('cliente', 'cita')
+@lectura_replica
 def listado_clientes(request):
 
     mi_empresa = obtener_mi_empresa(request)
@@ -168,30 +324,54 @@ def listado_clientes(request):
         return render(request, 'core/lista_clientes.html', {'clientes': []})
 
     busqueda = request.GET.get('q')
+    orden = request.GET.get('orden')
+    if orden not in ORDENES_CLIENTES:
+        orden = 'nombre'
+    inactivos = request.GET.get('inactivos') == '1'
+
+    clientes = Cliente.objects.filter(empresa=mi_empresa).select_related('estadistica')
 
     if busqueda:
-        clientes = Cliente.objects.filter(
-            empresa=mi_empresa
-        ).filter(
+        clientes = clientes.filter(
             Q(nombre__icontains=busqueda) |
             Q(apellido__icontains=busqueda) |
             Q(ci_ruc__icontains=busqueda)
-        ).order_by('nombre', 'apellido')
-    else:
-        clientes = Cliente.objects.filter(empresa=mi_empresa).order_by('nombre', 'apellido')
+        )
+
+    if inactivos:
+        # Vinieron alguna vez, pero no en los últimos DIAS_INACTIVO días
+        limite = date.today() - timedelta(days=DIAS_INACTIVO)
+        clientes = clientes.filter(estadistica__ultima_visita__lt=limite)
 
-    return render(request, 'core/lista_clientes.html', {'clientes': clientes})
+    clientes = clientes.order_by(*ORDENES_CLIENTES[orden])
+
+    contexto = {
+        'clientes': clientes,
+        'orden': orden,
+        'inactivos': inactivos,
+        'dias_inactivo': DIAS_INACTIVO,
+    }
+    return render(request, 'core/lista_clientes.html', contexto)
 
 @login_required
+@lectura_replica
 def detalle_cliente(request, id):
     mi_empresa = obtener_mi_empresa(request)
-    cliente = get_object_or_404(Cliente, pk=id, empresa=mi_empresa)
-
-    historial = cliente.citas.all().order_by('-fecha')
+    cliente = get_object_or_404(Cliente.objects.select_related('estadistica'), pk=id, empresa=mi_empresa)
+
+    # Incluye las citas ya movidas al archivo histórico
+    historial = unir(
+        [
+            cliente.citas.select_related('servicio', 'profesional'),
+            cliente.citas_historicas.select_related('servicio', 'profesional'),
+        ],
+        'fecha', reverso=True
+    )
 
     contexto = {
         'cliente': cliente,
-        'historial': historial
+        'historial': historial,
+        'estadistica': getattr(cliente, 'estadistica', None),
     }
     return render(request, 'core/detalle_cliente.html', contexto)
 
@@ -258,9 +438,71 @@ def eliminar_cliente(request, id):
 
     return render(request, 'core/eliminar_cliente.html', {'cliente': cliente})
 
+LIMITE_DUPLICADOS = 100
+
+
+@login_required
+@permission_required('core.change_cliente', raise_exception=True)
+def clientes_duplicados(request):
+    """Pares sugeridos por buscar_clientes_duplicados, los más probables primero."""
+    mi_empresa = obtener_mi_empresa(request)
+
+    pares = (
+        DuplicadoCliente.objects.filter(empresa=mi_empresa, descartado=False)
+        .select_related('cliente__estadistica', 'otro__estadistica')
+        .order_by('-puntaje', 'id')[:LIMITE_DUPLICADOS]
+    )
+    return render(request, 'core/clientes_duplicados.html', {'pares': pares})
+
+
+@login_required
+@permission_required('core.delete_cliente', raise_exception=True)
+def fusionar_cliente(request):
+    if request.method != 'POST':
+        return redirect('clientes_duplicados')
+
+    mi_empresa = obtener_mi_empresa(request)
+    if not mi_empresa:
+        messages.error(request, "Tu usuario no tiene una empresa asignada.")
+        return redirect('home')
+
+    try:
+        principal_id = int(request.POST['principal'])
+        duplicado_id = int(request.POST['duplicado'])
+    except (KeyError, ValueError):
+        messages.error(request, "Elegí qué cliente conservar.")
+        return redirect('clientes_duplicados')
+
+    try:
+        principal, movidas = fusionar_clientes(mi_empresa.pk, principal_id, duplicado_id)
+    except ValueError as e:
+        messages.error(request, f"No se pudo fusionar: {e}")
+        return redirect('clientes_duplicados')
+
+    messages.success(
+        request,
+        f"Clientes fusionados en {principal.nombre} {principal.apellido}: {movidas} citas pasaron a su historial."
+    )
+    return redirect('clientes_duplicados')
+
+
+@login_required
+@permission_required('core.change_cliente', raise_exception=True)
+def descartar_duplicado(request, id):
+    mi_empresa = obtener_mi_empresa(request)
+    par = get_object_or_404(DuplicadoCliente, pk=id, empresa=mi_empresa)
+
+    if request.method == 'POST':
+        par.descartado = True
+        par.save(update_fields=['descartado'])
+        messages.info(request, "Listo, no se volverá a sugerir ese par.")
+    return redirect('clientes_duplicados')
+
 #--- Vistas Profesionales ---
 
 @login_required
+@sin_cambios('profesional')
+@lectura_replica
 def listado_profesional(request):
 
     mi_empresa = obtener_mi_empresa(request)
@@ -317,7 +559,14 @@ def crear_profesional(request):
         if form.is_valid():
             profesional = form.save(commit=False)
             profesional.empresa = mi_empresa
-            profesional.save()
+            # La foto sube a Cloudinary desde la cola de tareas, no en este request
+            imagen = request.FILES.get('imagen')
+            if imagen:
+                profesional.imagen = None
+            with transaction.atomic():
+                profesional.save()
+                if imagen:
+                    diferir_imagen_profesional(profesional, imagen)
             messages.success(request, f'¡El profesional {profesional.nombre} se creó correctamente!')
             return redirect('listado_profesional')
     else:
@@ -335,9 +584,18 @@ def editar_profesional(request, id):
 
     if request.method == 'POST':
 
+        imagen_anterior = profesional.imagen.name
         form = ProfesionalForm(request.POST, request.FILES, instance=profesional, empresa=mi_empresa)
         if form.is_valid():
-            form.save()
+            imagen = request.FILES.get('imagen')
+            profesional = form.save(commit=False)
+            if imagen:
+                # Se conserva la foto actual hasta que la cola suba la nueva
+                profesional.imagen = imagen_anterior
+            with transaction.atomic():
+                profesional.save()
+                if imagen:
+                    diferir_imagen_profesional(profesional, imagen)
             return redirect('listado_profesional')
     else:
         form = ProfesionalForm(instance=profesional, empresa=mi_empresa)
@@ -367,6 +625,65 @@ def eliminar_profesional(request, id):
     return render(request, 'core/eliminar_profesional.html', {'profesional': profesional})
 
 
+@login_required
+@permission_required('core.change_profesional', raise_exception=True)
+def turnos_profesional(request, id):
+    mi_empresa = obtener_mi_empresa(request)
+    profesional = get_object_or_404(Profesional, pk=id, empresa=mi_empresa)
+
+    form_turno = TurnoProfesionalForm(prefix='turno')
+    form_ausencia = AusenciaProfesionalForm(prefix='ausencia')
+
+    if request.method == 'POST':
+        # Cada formulario de la página manda su propio botón
+        if 'guardar_turno' in request.POST:
+            form_turno = TurnoProfesionalForm(request.POST, prefix='turno')
+            form = form_turno
+        else:
+            form_ausencia = AusenciaProfesionalForm(request.POST, prefix='ausencia')
+            form = form_ausencia
+        if form.is_valid():
+            registro = form.save(commit=False)
+            registro.empresa = mi_empresa
+            registro.profesional = profesional
+            registro.save()
+            messages.success(request, "Guardado. La agenda ya toma en cuenta el cambio.")
+            return redirect('turnos_profesional', id=profesional.id)
+
+    contexto = {
+        'profesional': profesional,
+        'form_turno': form_turno,
+        'form_ausencia': form_ausencia,
+        'turnos': profesional.turnos.all(),
+        'ausencias': profesional.ausencias.filter(fecha_hasta__gte=date.today()),
+    }
+    return render(request, 'core/turnos_profesional.html', contexto)
+
+
+@login_required
+@permission_required('core.change_profesional', raise_exception=True)
+def borrar_turno(request, id):
+    mi_empresa = obtener_mi_empresa(request)
+    turno = get_object_or_404(TurnoProfesional, pk=id, empresa=mi_empresa)
+
+    if request.method == 'POST':
+        turno.delete()
+        messages.warning(request, "Turno eliminado.")
+    return redirect('turnos_profesional', id=turno.profesional_id)
+
+
+@login_required
+@permission_required('core.change_profesional', raise_exception=True)
+def borrar_ausencia(request, id):
+    mi_empresa = obtener_mi_empresa(request)
+    ausencia = get_object_or_404(AusenciaProfesional, pk=id, empresa=mi_empresa)
+
+    if request.method == 'POST':
+        ausencia.delete()
+        messages.warning(request, "Ausencia eliminada.")
+    return redirect('turnos_profesional', id=ausencia.profesional_id)
+
+
 #---Vistas de Citas---
 
 @login_required
@@ -381,9 +698,18 @@ def agendar_cita(request):
 
             cita_nueva.empresa = obtener_mi_empresa(request)
 
-            cita_nueva.save()
-            messages.success(request, '¡La cita se creó correctamente!')
-            return redirect('listado_citas')
+            try:
+                with transaction.atomic():
+                    form.confirmar_disponibilidad()
+                    cita_nueva.save()
+                    registrar_cambio_cita(cita_nueva, 'CREADA')
+                    encolar_correos([cita_nueva], 'CONFIRMACION')
+                    marcar_agendados(cita_nueva)
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                messages.success(request, '¡La cita se creó correctamente!')
+                return redirect('listado_citas')
     else:
 
         form = CitaForm(empresa=mi_empresa)
@@ -401,11 +727,39 @@ def editar_cita(request, id):
     cita = get_object_or_404(Cita, pk=id, empresa=mi_empresa)
 
     if request.method == 'POST':
+        cliente_anterior, fecha_anterior, hora_anterior = cita.cliente_id, cita.fecha, cita.hora
+        # El horario que deja libre si se mueve (copia sin guardar, para la lista de espera)
+        horario_anterior = Cita(
+            empresa=mi_empresa, cliente_id=cita.cliente_id, profesional=cita.profesional,
+            servicio=cita.servicio, fecha=cita.fecha, hora=cita.hora,
+        )
         form = CitaForm(request.POST, instance=cita, empresa=mi_empresa)
 
         if form.is_valid():
-            form.save()
-            return redirect('home')
+            try:
+                with transaction.atomic():
+                    form.confirmar_disponibilidad()
+                    cita = form.save()
+                    registrar_cambio_cita(cita, 'MODIFICADA')
+                    # Una cita ya cerrada que cambia de cliente o de fecha mueve sus números
+                    if cita.estado in ESTADOS_CERRADOS and (
+                            cita.cliente_id != cliente_anterior or cita.fecha != fecha_anterior):
+                        recalcular_cliente(cliente_anterior, mi_empresa.pk)
+                        recalcular_cliente(cita.cliente_id, mi_empresa.pk)
+                    movida = cita.estado in ('PENDIENTE', 'CONFIRMADO') and (
+                        cita.fecha != fecha_anterior or cita.hora != hora_anterior
+                        or cita.profesional_id != horario_anterior.profesional_id)
+                    if movida and (cita.fecha != fecha_anterior or cita.hora != hora_anterior):
+                        encolar_correos([cita], 'MODIFICACION')
+            except RegistroDesactualizado:
+                return _registro_desactualizado(request, CITA_DESACTUALIZADA, 'editar_cita', id)
+            except ValidationError as e:
+                form.add_error(None, e)
+            else:
+                if movida and candidatos_para(horario_anterior, limite=1):
+                    messages.info(request, "El horario que quedó libre le sirve a clientes en lista de espera.")
+                    return redirect(_url_horario_libre(horario_anterior))
+                return redirect('home')
 
     else:
         form = CitaForm(instance=cita, empresa=mi_empresa)
@@ -419,6 +773,8 @@ def editar_cita(request, id):
 
 
 @login_required
+@sin_cambios(*MODELOS_AGENDA)
+@lectura_replica
 def listado_citas(request):
     mi_empresa = obtener_mi_empresa(request)
 
@@ -473,6 +829,7 @@ def finalizar_cita(request, id):
     cita = get_object_or_404(Cita, pk=id, empresa=mi_empresa)
 
     if request.method == 'POST':
+        estado_anterior, monto_anterior = cita.estado, cita.monto_cobrado
         form = CobrarCitaForm(request.POST, instance=cita)
         if form.is_valid():
             # 1. Guardamos el monto
@@ -484,7 +841,17 @@ def finalizar_cita(request, id):
 
             # 2. Forzamos el estado a REALIZADO
             cita_final.estado = 'REALIZADO'
-            cita_final.save()
+            try:
+                with transaction.atomic():
+                    cita_final.save()
+                    registrar_cambio_cita(cita_final, 'ESTADO')
+                    actualizar_estadistica(cita_final, estado_anterior, monto_anterior)
+            except RegistroDesactualizado:
+                return _registro_desactualizado(request, CITA_DESACTUALIZADA, 'home')
+            if _es_fragmento(request):
+                respuesta = _fila_actualizada(request, cita_final, mi_empresa)
+                respuesta['HX-Trigger'] = 'cobroRegistrado'  # cierra el modal
+                return respuesta
             messages.success(request, '¡Cobro registrado exitosamente!')
             return redirect('home')
     else:
@@ -495,6 +862,12 @@ def finalizar_cita(request, id):
         'form': form,
         'cita': cita  # Pasamos la cita para mostrar sus datos fijos
     }
+    if _es_fragmento(request):
+        # Solo el formulario, dentro del modal de la agenda (también si vuelve con errores)
+        respuesta = render(request, 'core/partials/form_cobro.html', contexto)
+        respuesta['HX-Retarget'] = '#modal-cobro-cuerpo'
+        respuesta['HX-Reswap'] = 'innerHTML'
+        return respuesta
     return render(request, 'core/finalizar_cita.html', contexto)
 
 
@@ -505,8 +878,24 @@ def cancelar_cita(request, id):
 
     if request.method == 'POST':
         # Solo si el usuario confirmó en el formulario rojo
+        estado_anterior = cita.estado
         cita.estado = 'CANCELADO'
-        cita.save()
+        _version_enviada(request, cita)
+        try:
+            with transaction.atomic():
+                cita.save()
+                registrar_cambio_cita(cita, 'ESTADO')
+                actualizar_estadistica(cita, estado_anterior)
+                if estado_anterior != 'CANCELADO':
+                    encolar_correos([cita], 'CANCELACION')
+        except RegistroDesactualizado:
+            return _registro_desactualizado(request, CITA_DESACTUALIZADA, 'listado_citas')
+        en_espera = estado_anterior in ('PENDIENTE', 'CONFIRMADO') and candidatos_para(cita, limite=1)
+        if _es_fragmento(request):
+            return _fila_actualizada(request, cita, mi_empresa, url_espera=_url_horario_libre(cita) if en_espera else None)
+        if en_espera:
+            messages.info(request, "Cita cancelada. El horario libre le sirve a clientes en lista de espera.")
+            return redirect(_url_horario_libre(cita))
         return redirect('listado_citas')
 
     # Si es GET, le mostramos la pregunta
@@ -517,14 +906,179 @@ def cancelar_cita(request, id):
 def confirmar_cita(request, id):
     mi_empresa = obtener_mi_empresa(request)
     cita = get_object_or_404(Cita, pk=id, empresa=mi_empresa)
+    estado_anterior = cita.estado
     cita.estado = 'CONFIRMADO'
-    cita.save()
+    _version_enviada(request, cita)
+    try:
+        with transaction.atomic():
+            cita.save()
+            registrar_cambio_cita(cita, 'ESTADO')
+            actualizar_estadistica(cita, estado_anterior)
+    except RegistroDesactualizado:
+        return _registro_desactualizado(request, CITA_DESACTUALIZADA, 'home')
+    if _es_fragmento(request):
+        return _fila_actualizada(request, cita, mi_empresa)
     return redirect('home')
 
+
+LIMITE_LOTE_CITAS = 500
+
+
+@login_required
+def acciones_citas(request):
+    """
+    Confirmar, cancelar o marcar "no asistió" varias citas a la vez.
+    Responde JSON compacto a pedidos AJAX y redirige al listado en el resto.
+    """
+    if request.method != 'POST':
+        return redirect('listado_citas')
+
+    mi_empresa = obtener_mi_empresa(request)
+    como_json = 'application/json' in request.headers.get('Accept', '')
+
+    accion = request.POST.get('accion')
+    ids = []
+    for valor in request.POST.getlist('ids'):
+        ids.extend(parte for parte in valor.split(',') if parte.strip())
+    try:
+        ids = sorted({int(i) for i in ids})
+    except ValueError:
+        ids = None
+
+    if accion not in TRANSICIONES or not ids or len(ids) > LIMITE_LOTE_CITAS:
+        error = f"Acción inválida o lista de citas vacía (máximo {LIMITE_LOTE_CITAS})."
+        if como_json:
+            return JsonResponse({'error': error}, status=400)
+        messages.error(request, error)
+        return redirect('listado_citas')
+
+    nuevo_estado, estados_origen = TRANSICIONES[accion]
+
+    with transaction.atomic():
+        # Una sola consulta valida empresa, permisos y estado de todas las citas
+        citas = (
+            Cita.objects.filter(empresa=mi_empresa, id__in=ids, estado__in=estados_origen)
+            .select_related('empresa', 'cliente', 'profesional', 'servicio')
+            .select_for_update(of=('self',))
+        )
+        if request.user.groups.filter(name='Profesionales').exists():
+            citas = citas.filter(profesional=request.user.profesional)
+        citas = cambiar_estado_en_lote(list(citas), nuevo_estado)
+        if nuevo_estado == 'CANCELADO':
+            encolar_correos(citas, 'CANCELACION')
+            en_espera = esperas_en_fechas(mi_empresa.pk, [c.fecha for c in citas])
+
+    actualizadas = [c.pk for c in citas]
+    ignoradas = sorted(set(ids) - set(actualizadas))
+
+    if como_json:
+        return JsonResponse({'estado': nuevo_estado, 'actualizadas': actualizadas, 'ignoradas': ignoradas})
+
+    etiqueta = dict(Cita._meta.get_field('estado').choices)[nuevo_estado]
+    messages.success(request, f"{len(actualizadas)} cita(s) pasaron a '{etiqueta}'.")
+    if ignoradas:
+        messages.warning(request, f"{len(ignoradas)} cita(s) no se modificaron (no existen o su estado no lo permite).")
+    if nuevo_estado == 'CANCELADO' and en_espera:
+        messages.info(request, f"Hay {en_espera} cliente(s) en lista de espera para esos días: revisá la Lista de Espera.")
+    return redirect('listado_citas')
+
+
+# El cursor es el id del último evento entregado. No se saltea nada: dentro de una
+# empresa los eventos se confirman en orden de id (ver cambios._turno_feed).
+LIMITE_FEED = 500
+
+
+@login_required
+def feed_cambios_citas(request):
+    """
+    Cambios de citas posteriores al cursor `desde`, en JSON.
+    Sin `desde` devuelve solo el cursor actual, para empezar a escuchar desde ahora.
+    """
+    mi_empresa = obtener_mi_empresa(request)
+
+    if not mi_empresa:
+        return JsonResponse({'error': 'Tu usuario no tiene una empresa asignada.'}, status=403)
+
+    cambios = CambioCita.objects.filter(empresa=mi_empresa)
+
+    if request.user.groups.filter(name='Profesionales').exists():
+        cambios = cambios.filter(profesional=request.user.profesional)
+
+    desde = request.GET.get('desde')
+    if desde is None:
+        ultimo = cambios.order_by('-id').values_list('id', flat=True).first()
+        return JsonResponse({'cursor': ultimo or 0, 'cambios': [], 'hay_mas': False})
+
+    try:
+        desde = int(desde)
+        limite = min(int(request.GET.get('limite', LIMITE_FEED)), LIMITE_FEED)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos.'}, status=400)
+    if limite < 1:
+        return JsonResponse({'error': 'El límite tiene que ser positivo.'}, status=400)
+
+    filas = list(
+        cambios.filter(id__gt=desde)
+        .order_by('id')
+        .values('id', 'cita_id', 'tipo', 'creado_el', 'datos')[:limite + 1]
+    )
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+
+    return JsonResponse({
+        'cursor': filas[-1]['id'] if filas else desde,
+        'cambios': filas,
+        'hay_mas': hay_mas,
+    })
+
+@login_required
+def calendario_semana(request):
+    mi_empresa = obtener_mi_empresa(request)
+
+    if not mi_empresa:
+        messages.error(request, "Tu usuario no tiene una empresa asignada.")
+        return redirect('home')
+
+    try:
+        fecha = datetime.strptime(request.GET.get('semana', ''), '%Y-%m-%d').date()
+    except ValueError:
+        fecha = date.today()
+    lunes = lunes_de(fecha)
+
+    # Sale de caché mientras nadie toque la agenda: refrescar o cambiar de semana es barato
+    datos = datos_semana(mi_empresa, lunes)
+
+    es_estilista = request.user.groups.filter(name='Profesionales').exists()
+
+    if es_estilista:
+        profesionales = [p for p in datos['profesionales'] if p[0] == request.user.profesional.pk]
+    else:
+        profesionales = datos['profesionales']
+
+    ids = [p[0] for p in profesionales]
+    try:
+        profesional_id = int(request.GET.get('profesional', ''))
+    except ValueError:
+        profesional_id = None
+    if profesional_id not in ids:
+        profesional_id = ids[0] if ids else None
+
+    contexto = {
+        'lunes': lunes,
+        'semana_anterior': lunes - timedelta(days=7),
+        'semana_siguiente': lunes + timedelta(days=7),
+        'hoy': date.today(),
+        'profesionales': profesionales,
+        'profesional_id': profesional_id,
+        'grilla': armar_grilla(datos, lunes, profesional_id) if profesional_id else None,
+    }
+    return render(request, 'core/calendario_semana.html', contexto)
+
 #---Vistas Financieras---
 
 @login_required
 @permission_required('core.view_gasto', raise_exception=True)
+@lectura_replica
 def reporte_caja(request):
     mi_empresa = obtener_mi_empresa(request)
 
@@ -538,16 +1092,13 @@ def reporte_caja(request):
         except ValueError:
             pass
 
-    # INGRESOS (Filtrados por empresa)
-    citas = Cita.objects.filter(
-        empresa=mi_empresa,
-        fecha__range=[fecha_inicio, fecha_fin],
-        estado='REALIZADO'
-    ).order_by('fecha', 'hora')
+    # INGRESOS (Filtrados por empresa, incluye el archivo si el rango llega hasta él)
+    citas_qs = citas_en_rango(mi_empresa, fecha_inicio, fecha_fin, estado='REALIZADO')
+    citas = unir([qs.select_related('cliente', 'servicio', 'profesional') for qs in citas_qs], 'fecha', 'hora')
 
-    total_ingresos = citas.aggregate(total=Sum('monto_cobrado'))['total'] or 0
+    total_ingresos = sumar(citas_qs, 'monto_cobrado')
 
-    ingresos_efectivo = citas.filter(metodo_pago='EFECTIVO').aggregate(t=Sum('monto_cobrado'))['t'] or 0
+    ingresos_efectivo = sumar(citas_qs, 'monto_cobrado', metodo_pago='EFECTIVO')
     ingresos_digital = total_ingresos - ingresos_efectivo
 
     # EGRESOS (Filtrados por empresa)
@@ -577,6 +1128,25 @@ def reporte_caja(request):
 
 @login_required
 @permission_required('core.view_gasto', raise_exception=True)
+def reporte_resultados(request):
+    mi_empresa = obtener_mi_empresa(request)
+
+    if not mi_empresa:
+        messages.error(request, "Tu usuario no tiene una empresa asignada.")
+        return redirect('home')
+
+    meses = 24 if request.GET.get('meses') == '24' else 12
+
+    # Lee el cubo mensual pre-agregado (solo recalcula los meses que cambiaron)
+    contexto = estado_resultados(mi_empresa, meses)
+    contexto['cantidad_meses'] = meses
+    return render(request, 'core/reporte_resultados.html', contexto)
+
+
+@login_required
+@permission_required('core.view_gasto', raise_exception=True)
+@sin_cambios('gasto', 'categoriagasto')
+@lectura_replica
 def lista_gastos(request):
     mi_empresa = obtener_mi_empresa(request)
 
@@ -616,6 +1186,35 @@ def crear_gasto(request):
     return render(request, 'core/form_servicio.html', contexto)
 
 
+@login_required
+def editar_gasto(request, id):
+    mi_empresa = obtener_mi_empresa(request)
+    gasto = get_object_or_404(Gasto, pk=id, empresa=mi_empresa)
+
+    if request.method == 'POST':
+        form = GastoForm(request.POST, instance=gasto, empresa=mi_empresa)
+        if form.is_valid():
+            try:
+                form.save()
+            except RegistroDesactualizado:
+                return _registro_desactualizado(
+                    request, "Este gasto cambió mientras lo editabas (otra persona lo modificó). Revisalo de nuevo.",
+                    'editar_gasto', id,
+                )
+            messages.success(request, 'Gasto actualizado correctamente.')
+            return redirect('lista_gastos')
+    else:
+        form = GastoForm(instance=gasto, empresa=mi_empresa)
+
+    contexto = {
+        'form': form,
+        'titulo': 'Editar Gasto',
+        'url_cancelar': 'lista_gastos'
+    }
+
+    return render(request, 'core/form_servicio.html', contexto)
+
+
 @login_required
 def gestion_categorias(request):
     mi_empresa = obtener_mi_empresa(request)
@@ -640,6 +1239,7 @@ def gestion_categorias(request):
 
 @login_required
 @permission_required('core.delete_gasto', raise_exception=True)  # O el permiso que uses para gerencia
+@lectura_replica
 def liquidacion_comisiones(request):
     mi_empresa = obtener_mi_empresa(request)
 
@@ -657,30 +1257,45 @@ def liquidacion_comisiones(request):
     fecha_ini_get = request.GET.get('fecha_inicio')
     fecha_fin_get = request.GET.get('fecha_fin')
 
-    if profesional_id and fecha_ini_get and fecha_fin_get:
+    if fecha_ini_get and fecha_fin_get:
         try:
             fecha_inicio = datetime.strptime(fecha_ini_get, '%Y-%m-%d').date()
             fecha_fin = datetime.strptime(fecha_fin_get, '%Y-%m-%d').date()
+        except ValueError:
+            pass
 
-            profesional_elegido = get_object_or_404(Profesional, pk=profesional_id, empresa=mi_empresa)
+    # Resumen de todo el equipo: una sola consulta con las reglas de comisión
+    liquidacion = liquidar(mi_empresa, fecha_inicio, fecha_fin)
+    equipo = [
+        {'profesional': p, **liquidacion[p.pk]}
+        for p in profesionales if p.pk in liquidacion
+    ]
 
-            citas = Cita.objects.filter(
-                empresa=mi_empresa,
-                profesional=profesional_elegido,
-                fecha__range=[fecha_inicio, fecha_fin],
-                estado='REALIZADO'
-            ).order_by('fecha', 'hora')
+    if profesional_id:
+        profesional_elegido = get_object_or_404(Profesional, pk=profesional_id, empresa=mi_empresa)
 
-            total_cobrado = citas.aggregate(total=Sum('monto_cobrado'))['total'] or 0
-            monto_comision = (total_cobrado * profesional_elegido.porcentaje_comision) / 100
+        citas_qs = citas_en_rango(
+            mi_empresa, fecha_inicio, fecha_fin,
+            profesional=profesional_elegido,
+            estado='REALIZADO'
+        )
+        citas = unir([qs.select_related('cliente', 'servicio') for qs in citas_qs], 'fecha', 'hora')
 
-        except ValueError:
-            pass
+        comisiones = comision_por_cita(mi_empresa, fecha_inicio, fecha_fin, profesional=profesional_elegido)
+        for cita in citas:
+            cita.porcentaje, cita.comision = comisiones.get(cita.pk, (0, 0))
+
+        resumen = liquidacion.get(profesional_elegido.pk, {})
+        total_cobrado = resumen.get('total', 0)
+        monto_comision = resumen.get('comision', 0)
 
     contexto = {
         'profesionales': profesionales,
         'profesional_elegido': profesional_elegido,
         'citas': citas,
+        'equipo': equipo,
+        'totales_equipo': {campo: sum(fila[campo] for fila in equipo) for campo in ('citas', 'total', 'comision')},
+        'hay_reglas': ReglaComision.objects.filter(empresa=mi_empresa).exists(),
         'fecha_inicio': fecha_inicio,
         'fecha_fin': fecha_fin,
         'total_cobrado': total_cobrado,
@@ -688,7 +1303,76 @@ def liquidacion_comisiones(request):
     }
     return render(request, 'core/liquidacion_comisiones.html', contexto)
 
+
+@login_required
+@permission_required('core.delete_gasto', raise_exception=True)
+def reglas_comision(request):
+    mi_empresa = obtener_mi_empresa(request)
+
+    if request.method == 'POST':
+        form = ReglaComisionForm(request.POST, empresa=mi_empresa)
+        if form.is_valid():
+            regla = form.save(commit=False)
+            regla.empresa = mi_empresa
+            regla.save()
+            messages.success(request, "Regla de comisión guardada.")
+            return redirect('reglas_comision')
+    else:
+        form = ReglaComisionForm(empresa=mi_empresa)
+
+    contexto = {
+        'form': form,
+        'reglas': reglas_de(mi_empresa),
+    }
+    return render(request, 'core/reglas_comision.html', contexto)
+
+
+@login_required
+@permission_required('core.delete_gasto', raise_exception=True)
+def borrar_regla_comision(request, id):
+    mi_empresa = obtener_mi_empresa(request)
+    regla = get_object_or_404(ReglaComision, pk=id, empresa=mi_empresa)
+
+    if request.method == 'POST':
+        regla.delete()
+        messages.warning(request, "Regla de comisión eliminada.")
+    return redirect('reglas_comision')
+
 @login_required
+@permission_required('core.delete_gasto', raise_exception=True)
+def ocupacion_profesionales(request):
+    mi_empresa = obtener_mi_empresa(request)
+
+    if not mi_empresa:
+        messages.error(request, "Tu usuario no tiene una empresa asignada.")
+        return redirect('home')
+
+    fecha_inicio = date.today().replace(day=1)
+    fecha_fin = date.today()
+
+    if request.GET.get('fecha_inicio') and request.GET.get('fecha_fin'):
+        try:
+            fecha_inicio = datetime.strptime(request.GET.get('fecha_inicio'), '%Y-%m-%d').date()
+            fecha_fin = datetime.strptime(request.GET.get('fecha_fin'), '%Y-%m-%d').date()
+        except ValueError:
+            pass
+
+    # Máximo un año por consulta
+    if fecha_fin < fecha_inicio or (fecha_fin - fecha_inicio).days > 366:
+        messages.warning(request, "El rango debe ser de hasta un año.")
+        fecha_inicio = date.today().replace(day=1)
+        fecha_fin = date.today()
+
+    contexto = ocupacion_periodo(mi_empresa, fecha_inicio, fecha_fin)
+    contexto.update({
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+    })
+    return render(request, 'core/ocupacion_profesionales.html', contexto)
+
+
+@login_required
+@lectura_replica
 def mis_comisiones(request):
 
     if not hasattr(request.user, 'profesional'):
@@ -705,14 +1389,20 @@ def mis_comisiones(request):
         except ValueError:
             pass
 
-    citas = Cita.objects.filter(
+    citas_qs = citas_en_rango(
+        profesional.empresa, fecha_inicio, fecha_fin,
         profesional=profesional,
-        fecha__range=[fecha_inicio, fecha_fin],
         estado='REALIZADO'
-    ).order_by('fecha')
+    )
+    citas = unir([qs.select_related('cliente', 'servicio') for qs in citas_qs], 'fecha', 'hora')
+
+    comisiones = comision_por_cita(profesional.empresa, fecha_inicio, fecha_fin, profesional=profesional)
+    for cita in citas:
+        cita.porcentaje, cita.comision = comisiones.get(cita.pk, (0, 0))
 
-    total_vendido = citas.aggregate(t=Sum('monto_cobrado'))['t'] or 0
-    mi_comision = (total_vendido * profesional.porcentaje_comision) / 100
+    resumen = liquidar(profesional.empresa, fecha_inicio, fecha_fin, profesional=profesional).get(profesional.pk, {})
+    total_vendido = resumen.get('total', 0)
+    mi_comision = resumen.get('comision', 0)
 
     contexto = {
         'citas': citas,
@@ -728,6 +1418,7 @@ def mis_comisiones(request):
 
 
 @login_required
+@lectura_replica
 def listado_horarios(request):
     mi_empresa = obtener_mi_empresa(request)
 
@@ -758,3 +1449,393 @@ def editar_horario(request, id):
 
     return render(request, 'core/form_servicio.html', contexto)
 
+
+#---Lista de Espera---
+
+def _url_horario_libre(cita):
+    """Página de candidatos para el horario de `cita` (guardada o no)."""
+    parametros = {
+        'profesional': cita.profesional_id,
+        'servicio': cita.servicio_id,
+        'fecha': cita.fecha.isoformat(),
+        'hora': cita.hora.strftime('%H:%M'),
+    }
+    if cita.cliente_id:
+        # Para no ofrecerle el lugar al mismo cliente que lo dejó
+        parametros['cliente'] = cita.cliente_id
+    return f"{reverse('horario_libre')}?{urlencode(parametros)}"
+
+
+def _horario_desde_parametros(datos, mi_empresa):
+    """Arma (sin guardar) la cita que representa el horario libre, o None si los datos no sirven."""
+    try:
+        fecha = datetime.strptime(datos.get('fecha', ''), '%Y-%m-%d').date()
+        hora = datetime.strptime(datos.get('hora', ''), '%H:%M').time()
+        profesional = Profesional.objects.get(pk=int(datos.get('profesional', '')), empresa=mi_empresa)
+        servicio = Servicio.objects.get(pk=int(datos.get('servicio', '')), empresa=mi_empresa)
+    except (ValueError, Profesional.DoesNotExist, Servicio.DoesNotExist):
+        return None
+    cliente_id = datos.get('cliente')
+    return Cita(
+        empresa=mi_empresa, profesional=profesional, servicio=servicio, fecha=fecha, hora=hora,
+        cliente_id=int(cliente_id) if cliente_id and cliente_id.isdigit() else None,
+    )
+
+
+@login_required
+def lista_espera(request):
+    mi_empresa = obtener_mi_empresa(request)
+
+    if request.method == 'POST':
+        form = EsperaCitaForm(request.POST, empresa=mi_empresa)
+        if form.is_valid():
+            espera = form.save(commit=False)
+            espera.empresa = mi_empresa
+            espera.save()
+            form.save_m2m()
+            messages.success(request, f"{espera.cliente} quedó en la lista de espera.")
+            return redirect('lista_espera')
+    else:
+        form = EsperaCitaForm(empresa=mi_empresa, initial={
+            'fecha_desde': date.today(), 'fecha_hasta': date.today() + timedelta(days=7),
+        })
+
+    esperas = (
+        EsperaCita.objects.filter(empresa=mi_empresa, estado__in=ESTADOS_VIGENTES, fecha_hasta__gte=date.today())
+        .select_related('cliente', 'servicio')
+        .prefetch_related('profesionales')
+        .order_by('fecha_desde', 'creado_el')
+    )
+    return render(request, 'core/lista_espera.html', {'form': form, 'esperas': esperas})
+
+
+@login_required
+def quitar_espera(request, id):
+    mi_empresa = obtener_mi_empresa(request)
+    espera = get_object_or_404(EsperaCita, pk=id, empresa=mi_empresa)
+
+    if request.method == 'POST':
+        espera.estado = 'BAJA'
+        espera.save(update_fields=['estado'])
+        messages.warning(request, f"{espera.cliente} salió de la lista de espera.")
+    return redirect('lista_espera')
+
+
+@login_required
+def horario_libre(request):
+    """Clientes en espera a los que les sirve un horario que quedó libre, con el aviso listo."""
+    mi_empresa = obtener_mi_empresa(request)
+    horario = _horario_desde_parametros(request.GET, mi_empresa)
+
+    if horario is None:
+        messages.error(request, "Horario inválido.")
+        return redirect('lista_espera')
+
+    candidatos = list(candidatos_para(horario))
+    for espera in candidatos:
+        espera.mensaje = mensaje_aviso(espera, horario)
+
+    contexto = {
+        'horario': horario,
+        'candidatos': candidatos,
+    }
+    return render(request, 'core/horario_libre.html', contexto)
+
+
+@login_required
+def avisar_espera(request, id):
+    """Marca al cliente como avisado y envía el aviso por email (a la cola) o abre WhatsApp."""
+    mi_empresa = obtener_mi_empresa(request)
+    espera = get_object_or_404(EsperaCita.objects.select_related('cliente', 'servicio'), pk=id, empresa=mi_empresa)
+    horario = _horario_desde_parametros(request.POST, mi_empresa)
+
+    if request.method != 'POST' or horario is None:
+        return redirect('lista_espera')
+
+    mensaje = mensaje_aviso(espera, horario)
+    canal = request.POST.get('canal')
+
+    with transaction.atomic():
+        marcar_avisado(espera)
+        if canal == 'email' and espera.cliente.email:
+            encolar_aviso_espera(espera, horario, mensaje)
+
+    if canal == 'whatsapp':
+        return redirect(f"https://wa.me/{whatsapp_url(espera.cliente.telefono)}?{urlencode({'text': mensaje})}")
+
+    messages.success(request, f"Aviso por email a {espera.cliente} en camino.")
+    return redirect(_url_horario_libre(horario))
+
+
+#---Panel de Dueños---
+
+@login_required
+@permission_required('core.view_gasto', raise_exception=True)
+@lectura_replica
+def panel_duenos(request):
+    """Todos los salones del usuario lado a lado: agenda del día, pendientes, ingresos y gastos."""
+    empresas = list(empresas_del_usuario(request.user))
+    filas = resumen_empresas(empresas)
+
+    contexto = {
+        'filas': filas,
+        'totales': totales(filas),
+        'empresa_activa': obtener_mi_empresa(request),
+        'fecha_actual': date.today(),
+    }
+    return render(request, 'core/panel_duenos.html', contexto)
+
+
+@login_required
+def cambiar_empresa(request, id):
+    if request.method != 'POST':
+        return redirect('panel_duenos')
+
+    empresa = get_object_or_404(empresas_del_usuario(request.user), pk=id)
+    request.session['empresa_activa'] = empresa.pk
+    request.session['empresa_activa_desde'] = timezone.now().isoformat()
+    messages.success(request, f"Ahora estás trabajando en {empresa.nombre}.")
+    return redirect('home')
+
+
+#---API de solo lectura (JSON)---
+
+def _respuesta_api(request, recurso, archivo=False, **filtros):
+    """
+    Página de `recurso` de la empresa del usuario, escrita en la respuesta
+    a medida que se lee (memoria constante aunque se pidan miles de filas).
+    """
+    mi_empresa = obtener_mi_empresa(request)
+
+    if not mi_empresa:
+        return JsonResponse({'error': 'Tu usuario no tiene una empresa asignada.'}, status=403)
+
+    try:
+        qs, campos, limite, desde = consulta_api(recurso, mi_empresa, request.GET, archivo=archivo, **filtros)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # La lectura ocurre después de que la vista retorna: se fija ya la base
+    # (réplica o primario) que eligió @lectura_replica.
+    qs = qs.using(qs.db)
+    return StreamingHttpResponse(generar_json(qs, campos, limite, desde), content_type='application/json')
+
+
+@login_required
+@permission_required('core.view_cita', raise_exception=True)
+@sin_cambios('cita')
+@lectura_replica
+def api_citas(request):
+    filtros = {}
+    if request.user.groups.filter(name='Profesionales').exists():
+        filtros['profesional'] = request.user.profesional
+    # ?archivo=1 lee las citas viejas ya archivadas
+    return _respuesta_api(request, 'citas', archivo=request.GET.get('archivo') == '1', **filtros)
+
+
+@login_required
+@permission_required('core.view_cliente', raise_exception=True)
+@sin_cambios('cliente')
+@lectura_replica
+def api_clientes(request):
+    return _respuesta_api(request, 'clientes')
+
+
+@login_required
+@permission_required('core.view_servicio', raise_exception=True)
+@sin_cambios('servicio')
+@lectura_replica
+def api_servicios(request):
+    return _respuesta_api(request, 'servicios')
+
+
+@login_required
+@permission_required('core.view_gasto', raise_exception=True)
+@sin_cambios('gasto')
+@lectura_replica
+def api_gastos(request):
+    return _respuesta_api(request, 'gastos')
+
+
+#---Vistas de Monitoreo---
+
+@staff_member_required
+def metricas_db(request):
+    """Métricas del pool de conexiones y de la cola de tareas en JSON, para el sistema de monitoreo."""
+    reiniciar = request.GET.get('reiniciar') == '1'
+    datos = {alias: estadisticas_pool(alias, reiniciar=reiniciar) for alias in settings.DATABASES}
+    datos['tareas'] = estadisticas_tareas()
+    return JsonResponse(datos)
+
+
+#---Reservas Online (públicas, sin login)---
+# Reciben tráfico anónimo: la página y los horarios se sirven de la caché (y las
+# cabeceras dejan que el navegador o un CDN los reutilicen), con un límite por IP.
+# Solo la confirmación escribe, y vuelve a validar todo en reservas.reservar().
+
+def _empresa_publica(slug):
+    return get_object_or_404(Empresa, slug=slug, activo=True, reserva_online=True)
+
+
+def _demasiadas_solicitudes(segundos):
+    respuesta = HttpResponse("Demasiadas solicitudes. Probá de nuevo en unos minutos.", status=429)
+    respuesta['Retry-After'] = str(segundos)
+    # Es de una sola IP: que ninguna caché compartida se la sirva a los demás
+    add_never_cache_headers(respuesta)
+    patch_cache_control(respuesta, private=True)
+    return respuesta
+
+
+def _publica(respuesta, segundos):
+    """Cacheable por el navegador y un CDN, solo si salió bien."""
+    if respuesta.status_code == 200:
+        patch_cache_control(respuesta, public=True, max_age=segundos)
+    return respuesta
+
+
+def _elegido(lista, valor):
+    """El elemento del catálogo con ese id (de la URL), o None."""
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        return None
+    return next((item for item in lista if item['id'] == valor), None)
+
+
+def _fecha_reservable(valor):
+    try:
+        fecha = date.fromisoformat(valor or '')
+    except ValueError:
+        return None
+    desde, hasta = fechas_reservables()
+    return fecha if desde <= fecha <= hasta else None
+
+
+@lectura_replica
+def reserva_publica(request, slug):
+    segundos = esperar_limite(request, 'ver')
+    if segundos:
+        return _demasiadas_solicitudes(segundos)
+    empresa = _empresa_publica(slug)
+
+    desde, hasta = fechas_reservables()
+    contexto = {
+        'empresa': empresa,
+        'catalogo': catalogo(empresa.pk),
+        'fecha_desde': desde,
+        'fecha_hasta': hasta,
+    }
+    return _publica(render(request, 'core/publico/reserva.html', contexto), 60)
+
+
+@lectura_replica
+def reserva_horarios(request, slug):
+    segundos = esperar_limite(request, 'ver')
+    if segundos:
+        return _demasiadas_solicitudes(segundos)
+    empresa = _empresa_publica(slug)
+    datos = catalogo(empresa.pk)
+
+    servicio = _elegido(datos['servicios'], request.GET.get('servicio'))
+    profesional = _elegido(datos['profesionales'], request.GET.get('profesional'))
+    fecha = _fecha_reservable(request.GET.get('fecha'))
+    if not (servicio and fecha):
+        return _publica(render(request, 'core/publico/horarios.html', {'incompleto': True}), HORARIOS_SEGUNDOS)
+
+    nombres = {p['id']: f"{p['nombre']} {p['apellido']}" for p in datos['profesionales']}
+    opciones = []
+    for hora, libres in horarios(empresa.pk, servicio, fecha, profesional['id'] if profesional else None):
+        parametros = {'servicio': servicio['id'], 'fecha': fecha.isoformat(), 'hora': hora}
+        if profesional:
+            parametros['profesional'] = profesional['id']
+        opciones.append({
+            'hora': hora,
+            'profesionales': ', '.join(nombres[p] for p in libres),
+            'url': reverse('reserva_confirmar', args=[empresa.slug]) + '?' + urlencode(parametros),
+        })
+
+    contexto = {
+        'servicio': servicio,
+        'profesional': profesional,
+        'fecha': fecha,
+        'opciones': opciones,
+    }
+    return _publica(render(request, 'core/publico/horarios.html', contexto), HORARIOS_SEGUNDOS)
+
+
+@never_cache
+def reserva_confirmar(request, slug):
+    empresa = _empresa_publica(slug)
+    datos = catalogo(empresa.pk)
+
+    parametros = request.POST if request.method == 'POST' else request.GET
+    servicio = _elegido(datos['servicios'], parametros.get('servicio'))
+    profesional = _elegido(datos['profesionales'], parametros.get('profesional'))
+    fecha = _fecha_reservable(parametros.get('fecha'))
+    try:
+        hora = datetime.strptime(parametros.get('hora', ''), '%H:%M').time()
+    except ValueError:
+        hora = None
+    if not (servicio and fecha and hora):
+        return redirect('reserva_publica', slug=empresa.slug)
+
+    if request.method == 'POST':
+        segundos = esperar_limite(request, 'reservar')
+        if segundos:
+            return _demasiadas_solicitudes(segundos)
+        form = ReservaPublicaForm(request.POST)
+        if form.is_valid():
+            try:
+                cita, avisado = reservar(
+                    empresa, Servicio.objects.get(pk=servicio['id'], empresa=empresa),
+                    profesional['id'] if profesional else None, fecha, hora, form.cleaned_data,
+                )
+            except ValueError as e:
+                form.add_error(None, str(e))
+            else:
+                # La página de confirmación muestra lo que escribió el visitante, nunca la ficha
+                # guardada. Va en la sesión: la URL queda en logs, historial y Referer, y el
+                # token solo firma (no oculta) lo que lleva.
+                reservas = request.session.get('reservas_online', {})
+                reservas[str(cita.pk)] = {
+                    'nombre': form.cleaned_data['nombre'],
+                    'email': form.cleaned_data['email'] if avisado else '',
+                }
+                request.session['reservas_online'] = reservas
+                token = signing.dumps(cita.pk, salt='reserva_online')
+                return redirect('reserva_lista', slug=empresa.slug, token=token)
+    else:
+        form = ReservaPublicaForm()
+
+    contexto = {
+        'empresa': empresa,
+        'form': form,
+        'servicio': servicio,
+        'profesional': profesional,
+        'fecha': fecha,
+        'hora': hora,
+    }
+    return render(request, 'core/publico/confirmar.html', contexto)
+
+
+@never_cache
+def reserva_lista(request, slug, token):
+    empresa = _empresa_publica(slug)
+    try:
+        # Solo quien acaba de reservar tiene el enlace firmado
+        cita_id = signing.loads(token, salt='reserva_online', max_age=24 * 60 * 60)
+    except signing.BadSignature:
+        return redirect('reserva_publica', slug=empresa.slug)
+    # Y lo que escribió quedó en su sesión: con el enlace solo, en otro navegador, no se ve
+    reserva = request.session.get('reservas_online', {}).get(str(cita_id))
+    if reserva is None:
+        return redirect('reserva_publica', slug=empresa.slug)
+    cita = get_object_or_404(Cita.objects.select_related('servicio', 'profesional'), pk=cita_id, empresa=empresa)
+    contexto = {
+        'empresa': empresa,
+        'cita': cita,
+        'nombre': reserva['nombre'],
+        'email': reserva['email'],
+    }
+    return render(request, 'core/publico/reserva_lista.html', contexto)
+